@@ -0,0 +1,14 @@
+import os
+
+import django
+from django.core.management import call_command
+
+
+def setup():
+    """
+    Configure Django with the test settings, and create the (in memory) database, so a benchmark can be run as a
+    module, e.g. `python -m benchmarks.feedback_indexes`
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'tests.settings'
+    django.setup()
+    call_command('migrate', verbosity=0)
@@ -0,0 +1,119 @@
+"""
+Compare the query plans and timings of the common Feedback queries with and without the Feedback table's indexes, on a
+large synthetic table, e.g.
+
+    $ python -m benchmarks.feedback_indexes --rows 500000
+"""
+
+import argparse
+import datetime
+import random
+import time
+
+from . import setup
+
+
+def build_feedback(rows, views, sessions):
+    from django.utils import timezone
+
+    from thumber.models import Feedback
+
+    now = timezone.now()
+    batch = []
+    for ind in range(rows):
+        batch.append(
+            Feedback(
+                satisfied=random.random() < 0.7,
+                url='http://example.com/view-{0}'.format(ind % views),
+                view_name='app:view-{0}'.format(ind % views),
+                view_args={'args': [], 'kwargs': {}},
+                session='session-{0}'.format(random.randrange(sessions)),
+                reference='ref-{0}'.format(ind),
+            )
+        )
+        if len(batch) == 10000:
+            Feedback.objects.bulk_create(batch)
+            batch = []
+    Feedback.objects.bulk_create(batch)
+
+    # auto_now_add means created can only be spread over the past year with an update
+    Feedback.objects.update(created=now, keep_counts=True)
+    for days in range(365):
+        Feedback.objects.filter(pk__gt=days * rows // 365).update(
+            created=now - datetime.timedelta(days=days), keep_counts=True
+        )
+
+
+def common_queries():
+    from django.utils import timezone
+
+    from thumber.models import Feedback
+
+    last_week = timezone.now() - datetime.timedelta(days=7)
+    return {
+        'latest feedback (Meta.ordering)': Feedback.objects.all()[:100],
+        'latest feedback for a view': Feedback.objects.filter(
+            view__view_name='app:view-1'
+        )[:100],
+        'average for a view over a week': Feedback.objects.filter(
+            view__view_name='app:view-1', created__gte=last_week
+        ).average_for_views(),
+        'feedback for a session': Feedback.objects.filter(session='session-1'),
+    }
+
+
+def run_queries(repeat):
+    results = {}
+    for name, queryset in common_queries().items():
+        plan = queryset.explain()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append(time.perf_counter() - start)
+        results[name] = (plan, min(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--views', type=int, default=200)
+    parser.add_argument('--sessions', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.db import connection
+
+    from thumber.models import Feedback
+
+    build_feedback(args.rows, args.views, args.sessions)
+    indexes = Feedback._meta.indexes
+
+    with connection.schema_editor() as schema_editor:
+        for index in indexes:
+            schema_editor.remove_index(Feedback, index)
+    without_indexes = run_queries(args.repeat)
+
+    with connection.schema_editor() as schema_editor:
+        for index in indexes:
+            schema_editor.add_index(Feedback, index)
+    with_indexes = run_queries(args.repeat)
+
+    print('{0} Feedback rows, {1} views\n'.format(args.rows, args.views))
+    for name in without_indexes:
+        print(name)
+        for label, results in (
+            ('without indexes', without_indexes),
+            ('with indexes', with_indexes),
+        ):
+            plan, timing = results[name]
+            print('  {0:<16} {1:9.2f}ms'.format(label + ':', timing * 1000))
+            for line in plan.splitlines():
+                print('      {0}'.format(line))
+
+
+if __name__ == '__main__':
+    main()
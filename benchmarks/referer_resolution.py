@@ -0,0 +1,81 @@
+"""
+Measure the per-submission cost of resolving the referer to a view name, with and without thumber's cache, against a
+large URLconf, e.g.
+
+    $ python -m benchmarks.referer_resolution --patterns 5000
+"""
+import argparse
+import sys
+import time
+import types
+
+from . import setup
+
+
+def build_urlconf(patterns):
+    from django.urls import re_path
+    from django.views.generic import TemplateView
+
+    urlconf = types.ModuleType('benchmark_urls')
+    view = TemplateView.as_view(template_name='example.html')
+    urlconf.urlpatterns = [
+        re_path(
+            r'^section-{0}/(?P<slug>[\w-]+)$'.format(ind),
+            view,
+            name='view-{0}'.format(ind),
+        )
+        for ind in range(patterns)
+    ]
+    sys.modules[urlconf.__name__] = urlconf
+    return urlconf.__name__
+
+
+def time_per_call(func, paths, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for path in paths:
+            func(path)
+    return (time.perf_counter() - start) / (repeat * len(paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--patterns', type=int, default=2000)
+    parser.add_argument('--paths', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.test import override_settings
+    from django.urls import resolve
+
+    from thumber.views import _get_view_name_resolver
+
+    with override_settings(ROOT_URLCONF=build_urlconf(args.patterns)):
+        # Spread the paths across the URLconf, so some match early patterns and some late ones
+        step = max(args.patterns // args.paths, 1)
+        paths = [
+            '/section-{0}/item'.format(ind) for ind in range(0, args.patterns, step)
+        ]
+        resolver = _get_view_name_resolver()
+
+        uncached = time_per_call(
+            lambda path: resolve(path).view_name, paths, args.repeat
+        )
+        # The first submission from each path fills the cache, after which it's a lookup
+        first = time_per_call(lambda path: resolver(path, None), paths, 1)
+        cached = time_per_call(lambda path: resolver(path, None), paths, args.repeat)
+
+    print(
+        '{0} URL patterns, {1} distinct referer paths'.format(
+            args.patterns, len(paths)
+        )
+    )
+    print('  resolve():            {0:9.2f}us per submission'.format(uncached * 1e6))
+    print('  cache miss:           {0:9.2f}us per submission'.format(first * 1e6))
+    print('  cache hit:            {0:9.2f}us per submission'.format(cached * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+"""
+Measure the latency, queries and memory allocated for each of thumber's request paths, driving the example views in
+the tests through the test client, and fail if any path exceeds its budget, e.g.
+
+    $ python -m benchmarks.request_paths
+    $ python -m benchmarks.request_paths --record
+
+The budgets are kept in benchmarks/budgets.json.  Query counts must be within budget exactly, while the latency and
+allocation budgets allow some tolerance, since they vary from run to run (and machine to machine).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from . import setup
+
+BUDGETS_FILE = os.path.join(os.path.dirname(__file__), 'budgets.json')
+
+# The view that the request paths are measured against
+VIEW_NAME = 'thumber_tests:example'
+
+
+class RequestPaths:
+    """
+    Each request path as a function of the iteration number, with the client and any Feedback it needs set up in
+    `prepare`, outside of the measurements
+    """
+
+    names = ['get', 'sync_post', 'ajax_post', 'comment_post', 'endpoint_post']
+
+    def __init__(self):
+        from django.test import Client
+        from django.urls import reverse
+
+        self.client = Client()
+        self.path = reverse(VIEW_NAME)
+        self.submit_path = reverse('thumber:submit')
+        self.referer = 'http://testserver{0}'.format(self.path)
+
+    def prepare(self, name, iterations):
+        # Get the view, so that the client has its session cookie
+        self.client.get(self.path)
+        if name == 'endpoint_post':
+            from django.test import override_settings
+
+            # The page only signs its view for the submission endpoint when it's enabled
+            with override_settings(THUMBER_SUBMIT_ENDPOINT=True):
+                response = self.client.get(self.path)
+            self.view_token = response.context['thumber_widget'].initial['thumber_view']
+        elif name == 'comment_post':
+            self.feedback_ids = [
+                self.ajax_post(ind).json()['id'] for ind in range(iterations)
+            ]
+
+    def get(self, ind):
+        return self.client.get(self.path)
+
+    def sync_post(self, ind):
+        data = {'satisfied': 'True', 'thumber_token': 'sync'}
+        return self.client.post(self.path, data, HTTP_REFERER=self.referer)
+
+    def ajax_post(self, ind):
+        data = {'satisfied': 'False', 'thumber_token': 'ajax'}
+        return self.client.post(self.path, data, HTTP_REFERER=self.referer)
+
+    def comment_post(self, ind):
+        data = {
+            'thumber_token': 'ajax',
+            'id': self.feedback_ids[ind],
+            'comment': 'Comment {0}'.format(ind),
+        }
+        return self.client.post(self.path, data, HTTP_REFERER=self.referer)
+
+    def endpoint_post(self, ind):
+        data = {
+            'satisfied': 'False',
+            'thumber_token': 'ajax',
+            'thumber_view': self.view_token,
+        }
+        return self.client.post(self.submit_path, data)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(int(round(percent / 100 * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+def measure(paths, name, iterations, warmup):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    func = getattr(paths, name)
+
+    # Warm up (e.g. fill thumber's caches) before anything is measured
+    paths.prepare(name, warmup)
+    for ind in range(warmup):
+        func(ind)
+
+    paths.prepare(name, iterations)
+    timings = []
+    for ind in range(iterations):
+        start = time.perf_counter()
+        response = func(ind)
+        timings.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(
+                '{0} returned a {1} response'.format(name, response.status_code)
+            )
+
+    # Counting queries and tracing allocations slow the requests down, so they're measured separately from latency
+    paths.prepare(name, iterations)
+    queries = 0
+    allocated = []
+    tracemalloc.start()
+    try:
+        for ind in range(iterations):
+            tracemalloc.clear_traces()
+            with CaptureQueriesContext(connection) as captured:
+                func(ind)
+            queries = max(queries, len(captured))
+            allocated.append(tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'queries': queries,
+        'p50_ms': round(percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 99) * 1000, 3),
+        'allocated_kb': round(percentile(allocated, 50) / 1024, 1),
+    }
+
+
+def check(results, budgets, latency_tolerance, allocation_tolerance):
+    """
+    The ways in which the results exceed the budgets
+    """
+    tolerances = {'p95_ms': latency_tolerance, 'allocated_kb': allocation_tolerance}
+    failures = []
+    for name, result in results.items():
+        budget = budgets.get(name)
+        if budget is None:
+            failures.append('{0}: no budget recorded'.format(name))
+            continue
+
+        if result['queries'] > budget['queries']:
+            failures.append(
+                '{0}: {1} queries, budget is {2}'.format(
+                    name, result['queries'], budget['queries']
+                )
+            )
+        for key, tolerance in tolerances.items():
+            if result[key] > budget[key] * (1 + tolerance):
+                failures.append(
+                    '{0}: {1} is {2}, budget is {3} (+{4:.0%})'.format(
+                        name, key, result[key], budget[key], tolerance
+                    )
+                )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument(
+        '--latency-tolerance',
+        type=float,
+        default=1.0,
+        help='How far (as a fraction) the 95th percentile latency may exceed its budget',
+    )
+    parser.add_argument(
+        '--allocation-tolerance',
+        type=float,
+        default=0.25,
+        help='How far (as a fraction) the memory allocated may exceed its budget',
+    )
+    parser.add_argument(
+        '--record',
+        action='store_true',
+        help='Record the results as the new budgets, rather than checking them',
+    )
+    parser.add_argument('--budgets', default=BUDGETS_FILE)
+    parser.add_argument(
+        '--path',
+        action='append',
+        choices=RequestPaths.names,
+        help='Only measure the given request path, can be given more than once',
+    )
+    args = parser.parse_args()
+
+    setup()
+
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    paths = RequestPaths()
+
+    results = {}
+    for name in args.path or RequestPaths.names:
+        results[name] = measure(paths, name, args.iterations, args.warmup)
+        print(
+            '{0:14} {queries:3} queries  p50 {p50_ms:8.3f}ms  p95 {p95_ms:8.3f}ms  '
+            'p99 {p99_ms:8.3f}ms  {allocated_kb:9.1f}KB allocated'.format(
+                name, **results[name]
+            )
+        )
+
+    if args.record:
+        budgets = {}
+        if os.path.exists(args.budgets):
+            with open(args.budgets) as budgets_file:
+                budgets = json.load(budgets_file)
+        budgets.update(results)
+        with open(args.budgets, 'w') as budgets_file:
+            json.dump(budgets, budgets_file, indent=4, sort_keys=True)
+            budgets_file.write('\n')
+        print('Recorded budgets in {0}'.format(args.budgets))
+        return
+
+    with open(args.budgets) as budgets_file:
+        budgets = json.load(budgets_file)
+    failures = check(
+        results, budgets, args.latency_tolerance, args.allocation_tolerance
+    )
+    for failure in failures:
+        print('OVER BUDGET {0}'.format(failure), file=sys.stderr)
+    sys.exit(bool(failures))
+
+
+if __name__ == '__main__':
+    main()
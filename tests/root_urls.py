@@ -1,5 +1,8 @@
+from django.contrib import admin
 from django.urls import include, re_path
 
 urlpatterns = [
+    re_path(r'^admin/', admin.site.urls),
+    re_path(r'^thumber/', include('thumber.urls')),
     re_path(r'^', include('tests.urls')),
 ]
@@ -1,28 +1,42 @@
 # Required to define a secret key
 SECRET_KEY = 'fake-key'
 
-# We also need the sessions app, staticfiles (used in templates), and thumber itself installed
+# We also need the sessions app, staticfiles (used in templates), and thumber itself installed, along with the admin
+# (and the apps it needs) to test the Feedback admin
 INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.messages',
     'django.contrib.sessions',
     'django.contrib.staticfiles',
     'tests.apps.TestConfig',
     'thumber.apps.ThumberConfig',
 ]
 
-# Need a DB (use sqlite in memory) for storing models
+# Need a DB (use sqlite in memory) for storing models, and a second to test routing thumber's queries to
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
     },
+    'feedback': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
 
+# The router only sends thumber's queries elsewhere when THUMBER_DATABASE is set
+DATABASE_ROUTERS = ['thumber.routers.ThumberRouter']
+
 # Load our test-specific url conf
 ROOT_URLCONF = 'tests.root_urls'
 
 # We need the session middlewre, since it's used by thumber
 MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
 ]
 
 # Must specify STATIC_URL if installing staticfiles app
@@ -37,6 +51,13 @@ TEMPLATES = [
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
     },
 ]
 
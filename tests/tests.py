@@ -1,12 +1,93 @@
-import ast
+import csv
+import datetime
+import importlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from unittest.mock import ANY
 
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
 from django.core.exceptions import ImproperlyConfigured
-from django.test import TestCase
-from django.urls import reverse
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.template.loader import select_template
+from django.urls import resolve, reverse
+from django.utils import timezone
+from django.utils import translation
+from django.utils.autoreload import file_changed
+from django.views.generic import TemplateView
 
-from thumber import thumber_feedback
-from thumber.models import Feedback
+from thumber import metrics, thumber_feedback
+from thumber.buffer import feedback_buffer
+from thumber.forms import _render_widget_fields, clear_widget_cache, get_form_class
+from thumber.metrics import registry
+from thumber.models import (
+    Feedback,
+    FeedbackDailyRollup,
+    FeedbackSessionSketch,
+    FeedbackView,
+)
+from thumber.routers import ThumberRouter
+from thumber.signals import feedback_failed, feedback_submitted, stage_timed
+from thumber.spool import feedback_spool, read_segment
+from thumber.views import (
+    AsyncThumberView,
+    clear_resolve_cache,
+    clear_template_caches,
+)
+
+from .views import (
+    AsyncExampleView,
+    ExampleOverrideTemplateView,
+    ExampleTemplateView,
+)
+
+
+class FeedbackClientMixin:
+    """
+    Posts feedback to `view_name` (or another view) from its own page, as the widget's Javascript does
+    """
+
+    view_name = 'thumber_tests:example'
+    # The site the pages are on, a referer from another host isn't resolved, and the posted-to view is used instead
+    referer_origin = 'http://example.com'
+
+    def setUp(self):
+        super().setUp()
+        self.path = reverse(self.view_name)
+        self.http_referer = self.referer_origin + self.path
+
+    def visit(self, view_name=None):
+        # Get the view, and 'follow' so that the session cookie gets set on the client
+        return self.client.get(reverse(view_name or self.view_name), follow=True)
+
+    def post_feedback(self, view_name=None, extra=None, **data):
+        # Posted as AJAX, for a JSON response, unless another thumber_token is given
+        path = reverse(view_name or self.view_name)
+        data.setdefault('thumber_token', 'ajax')
+        http_referer = self.referer_origin + path
+        return self.client.post(path, data, HTTP_REFERER=http_referer, **(extra or {}))
+
+    async def apost_feedback(self, **data):
+        data.setdefault('thumber_token', 'ajax')
+        return await self.async_client.post(
+            self.path, data, HTTP_REFERER=self.http_referer
+        )
 
 
 class ThumberTests(TestCase):
@@ -115,6 +196,24 @@ class ThumberTests(TestCase):
         feedback = Feedback.objects.all()[0]
         self.assertEquals(feedback.comment, 'test comment')
 
+    def test_comment_keeps_created_timestamp(self):
+        """Adding a comment to feedback should only change its updated timestamp, not when it was created"""
+        view_name = 'thumber_tests:example'
+        path = reverse(view_name)
+        http_referer = 'http://example.com{0}'.format(path)
+        self.client.get(path, follow=True)
+
+        data = {'satisfied': 'False', 'thumber_token': 'ajax'}
+        pk = self.client.post(path, data, HTTP_REFERER=http_referer).json()['id']
+        feedback = Feedback.objects.get(pk=pk)
+
+        data = {'thumber_token': 'ajax', 'id': pk, 'comment': 'test comment'}
+        self.client.post(path, data, HTTP_REFERER=http_referer)
+        commented = Feedback.objects.get(pk=pk)
+
+        self.assertEquals(commented.created, feedback.created)
+        self.assertGreater(commented.updated, feedback.updated)
+
     def test_view_with_args(self):
         """Dedicated test to ensure that views with args work"""
         view_name = 'thumber_tests:args_example'
@@ -133,9 +232,7 @@ class ThumberTests(TestCase):
         # Check a Feedback model was created
         self.assertEquals(Feedback.objects.count(), 1)
         feedback = Feedback.objects.all()[0]
-        view_args = ast.literal_eval(feedback.view_args)
-        self.assertEquals(view_args[0], args)
-        self.assertEquals(view_args[1], {})
+        self.assertEquals(feedback.view_args, {'args': list(args), 'kwargs': {}})
 
     def test_view_with_kwargs(self):
         """Dedicated test to ensure that views with kwargs work, and the kwargs get stored in the model"""
@@ -155,9 +252,31 @@ class ThumberTests(TestCase):
         # Check a Feedback model was created
         self.assertEquals(Feedback.objects.count(), 1)
         feedback = Feedback.objects.all()[0]
-        view_args = ast.literal_eval(feedback.view_args)
-        self.assertEquals(view_args[1], kwargs)
-        self.assertEquals(view_args[0], ())
+        self.assertEquals(feedback.view_args, {'args': [], 'kwargs': kwargs})
+
+    def test_view_with_unserialisable_kwargs(self):
+        """View arguments that JSON can't represent are stored as strings, rather than failing the submission"""
+        path = reverse('thumber_tests:extra_kwargs_example')
+        http_referer = 'http://example.com{0}'.format(path)
+        view_args = {'args': [], 'kwargs': {'section': 'news'}}
+        self.client.get(path)
+
+        data = {'satisfied': 'True', 'thumber_token': 'ajax'}
+        response = self.client.post(path, data, HTTP_REFERER=http_referer)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(Feedback.objects.get().view_args, view_args)
+
+        # Posted to the submission endpoint, with the view arguments signed into the form
+        with override_settings(THUMBER_SUBMIT_ENDPOINT=True):
+            response = self.client.get(path)
+            data['thumber_view'] = response.context['thumber_widget'].initial[
+                'thumber_view'
+            ]
+            response = self.client.post(reverse('thumber:submit'), data)
+        self.assertEquals(response.status_code, 200)
+        self.assertEquals(
+            Feedback.objects.get(pk=response.json()['id']).view_args, view_args
+        )
 
     def test_basic_template_override(self):
         # Check that the example views (the good ones) correctly get the app-level feedback.html overrides
@@ -198,6 +317,294 @@ class ThumberTests(TestCase):
                 pass
 
 
+@override_settings(THUMBER_IDENTITY='signed')
+class ThumberSignedIdentityTests(FeedbackClientMixin, TestCase):
+    def post_feedback(self, **data):
+        data.setdefault('satisfied', 'True')
+        pk = super().post_feedback(**data).json()['id']
+        return Feedback.objects.get(pk=pk)
+
+    def test_get_does_not_touch_session(self):
+        with mock.patch(
+            'django.contrib.sessions.backends.file.SessionStore.save'
+        ) as save:
+            response = self.client.get(self.path)
+            self.client.get(self.path)
+        save.assert_not_called()
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertIn('thumber_id', response.cookies)
+        self.assertIn('thumber_identity', response.context['thumber_form'].initial)
+
+    def test_identity_stable_per_visitor(self):
+        self.client.get(self.path)
+        first = self.post_feedback()
+        second = self.post_feedback()
+        self.assertEquals(first.session, second.session)
+        self.assertEquals(len(first.session), 32)
+
+        # A different visitor gets a different identity
+        self.client.cookies.clear()
+        self.client.get(self.path)
+        self.assertNotEquals(self.post_feedback().session, first.session)
+
+    def test_identity_from_form_token(self):
+        """Without the cookie, the signed token embedded in the form identifies the visitor"""
+        response = self.client.get(self.path)
+        token = response.context['thumber_form'].initial['thumber_identity']
+        from_cookie = self.post_feedback()
+
+        self.client.cookies.clear()
+        from_token = self.post_feedback(thumber_identity=token)
+        self.assertEquals(from_token.session, from_cookie.session)
+
+        # A tampered token is ignored
+        tampered = self.post_feedback(thumber_identity=token + 'x')
+        self.assertNotEquals(tampered.session, from_cookie.session)
+
+    def test_cookie_preferred_to_form_token(self):
+        """The cookie identifies the visitor even if another visitor's token is posted"""
+        response = self.client.get(self.path)
+        other_token = response.context['thumber_form'].initial['thumber_identity']
+        other = self.post_feedback()
+
+        self.client.cookies.clear()
+        self.client.get(self.path)
+        feedback = self.post_feedback(thumber_identity=other_token)
+        self.assertNotEquals(feedback.session, other.session)
+        self.assertEquals(feedback.session, self.post_feedback().session)
+
+    @override_settings(THUMBER_IDENTITY_COOKIE_AGE=60)
+    def test_expired_form_token(self):
+        """A token older than the cookie's lifetime is ignored"""
+        response = self.client.get(self.path)
+        token = response.context['thumber_form'].initial['thumber_identity']
+        from_cookie = self.post_feedback()
+
+        self.client.cookies.clear()
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 61):
+            expired = self.post_feedback(thumber_identity=token)
+        self.assertNotEquals(expired.session, from_cookie.session)
+
+
+class ThumberRefererResolutionTests(TestCase):
+    def setUp(self):
+        clear_resolve_cache()
+        self.addCleanup(clear_resolve_cache)
+
+    def post_feedback(self, view_name, http_referer=None):
+        path = reverse(view_name)
+        self.client.get(path)
+
+        extra = {} if http_referer is None else {'HTTP_REFERER': http_referer}
+        data = {'satisfied': 'True', 'thumber_token': 'ajax'}
+        response = self.client.post(path, data, **extra)
+        self.assertEquals(response.status_code, 200)
+        return Feedback.objects.get(pk=response.json()['id'])
+
+    def test_referer_resolved_once(self):
+        view_name = 'thumber_tests:example_form'
+        http_referer = 'http://testserver{0}'.format(reverse('thumber_tests:example'))
+
+        with mock.patch('thumber.views.resolve', wraps=resolve) as resolver:
+            for _ in range(3):
+                feedback = self.post_feedback(view_name, http_referer)
+                # The referer's view is recorded, rather than the view that was posted to
+                self.assertEquals(feedback.view_name, 'thumber_tests:example')
+        self.assertEquals(resolver.call_count, 1)
+
+        # Changing the URLconf means the referers need resolving again
+        with mock.patch('thumber.views.resolve', wraps=resolve) as resolver:
+            with override_settings(ROOT_URLCONF='tests.root_urls'):
+                self.post_feedback(view_name, http_referer)
+        self.assertEquals(resolver.call_count, 1)
+
+    def test_unusable_referers(self):
+        """Referers that can't be resolved fall back to the view that the feedback was posted to"""
+        view_name = 'thumber_tests:example'
+        referers = [
+            'http://testserver/does-not-exist',
+            'http://another-host.com/form',
+            'not a url',
+        ]
+        for http_referer in referers:
+            feedback = self.post_feedback(view_name, http_referer)
+            self.assertEquals(feedback.view_name, view_name)
+            self.assertEquals(feedback.url, http_referer)
+
+        feedback = self.post_feedback(view_name)
+        self.assertEquals(feedback.view_name, view_name)
+        self.assertEquals(
+            feedback.url, 'http://testserver{0}'.format(reverse(view_name))
+        )
+
+
+class ThumberIdempotencyTests(FeedbackClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        response = self.client.get(self.path)
+        self.reference = response.context['thumber_form'].initial['thumber_reference']
+
+    def test_repeated_ajax_submission(self):
+        data = {
+            'satisfied': 'False',
+            'thumber_token': 'ajax',
+            'thumber_reference': self.reference,
+        }
+        pk = self.post_feedback(**data).json()['id']
+        self.assertEquals(
+            self.post_feedback(**data).json(), {'success': True, 'id': pk}
+        )
+
+        self.assertEquals(Feedback.objects.count(), 1)
+        self.assertEquals(Feedback.objects.get().reference, self.reference)
+        self.assertEquals(FeedbackDailyRollup.objects.get().no_count, 1)
+
+    def test_repeated_non_js_submission(self):
+        data = {
+            'satisfied': 'True',
+            'comment': 'test comment',
+            'thumber_token': 'sync',
+            'thumber_reference': self.reference,
+        }
+        self.assertContains(self.post_feedback(**data), 'Thank you for your feedback')
+        self.assertContains(self.post_feedback(**data), 'Thank you for your feedback')
+        self.assertEquals(Feedback.objects.count(), 1)
+
+    def test_reference_used_by_another_session(self):
+        data = {
+            'satisfied': 'True',
+            'thumber_token': 'ajax',
+            'thumber_reference': 'foo',
+        }
+        pk = self.post_feedback(**data).json()['id']
+
+        self.client.cookies.clear()
+        self.client.get(self.path)
+        other_pk = self.post_feedback(**data).json()['id']
+
+        self.assertNotEquals(pk, other_pk)
+        self.assertNotEquals(Feedback.objects.get(pk=other_pk).reference, 'foo')
+
+    def test_invalid_form(self):
+        """A form that isn't valid (e.g. with an overlong reference) is rejected, without saving anything"""
+        receiver = mock.Mock()
+        feedback_failed.connect(receiver)
+        self.addCleanup(feedback_failed.disconnect, receiver)
+
+        for data in [
+            {'satisfied': 'True', 'thumber_reference': 'x' * 65},
+            {'comment': 'test comment'},
+        ]:
+            data['thumber_token'] = 'ajax'
+            response = self.post_feedback(**data)
+            self.assertEquals(response.status_code, 400)
+            self.assertEquals(response.json()['success'], False)
+            self.assertEquals(receiver.call_args.kwargs['stage'], 'form')
+        self.assertEquals(set(response.json()['errors']), {'satisfied'})
+        self.assertFalse(Feedback.objects.exists())
+
+    def test_invalid_comment(self):
+        """A comment that isn't posted, or an id that can't be a PK, is rejected rather than failing"""
+        data = {'satisfied': 'False', 'thumber_token': 'ajax'}
+        pk = self.post_feedback(**data).json()['id']
+
+        response = self.post_feedback(id=pk)
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(set(response.json()['errors']), {'comment'})
+
+        for invalid_pk in ['²', '9' * 30]:
+            data = {'thumber_token': 'ajax', 'id': invalid_pk, 'comment': 'test'}
+            self.assertEquals(self.post_feedback(**data).status_code, 404)
+        self.assertEquals(Feedback.objects.get().comment, '')
+
+    def test_comment_is_a_single_update(self):
+        data = {'satisfied': 'False', 'thumber_token': 'ajax'}
+        pk = self.post_feedback(**data).json()['id']
+
+        # One UPDATE of the Feedback's comment, and one of the rollup's comment count
+        data = {'thumber_token': 'ajax', 'id': pk, 'comment': 'test comment'}
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEquals(self.post_feedback(**data).json()['success'], True)
+        self.assertEquals(len(queries), 2)
+        self.assertTrue(
+            queries[0]['sql'].startswith('UPDATE "thumber_feedback" SET "comment"')
+        )
+        self.assertEquals(FeedbackDailyRollup.objects.get().comment_count, 1)
+
+        # Replacing the comment leaves the rollup alone
+        data['comment'] = 'new comment'
+        with self.assertNumQueries(2):
+            self.post_feedback(**data)
+        self.assertEquals(Feedback.objects.get().comment, 'new comment')
+        self.assertEquals(FeedbackDailyRollup.objects.get().comment_count, 1)
+
+    def test_comment_only_from_same_session(self):
+        data = {'satisfied': 'False', 'thumber_token': 'ajax'}
+        pk = self.post_feedback(**data).json()['id']
+
+        self.client.cookies.clear()
+        self.client.get(self.path)
+        data = {'thumber_token': 'ajax', 'id': pk, 'comment': 'test comment'}
+        response = self.post_feedback(**data)
+        self.assertEquals(response.status_code, 404)
+        self.assertEquals(response.json(), {'success': False})
+        self.assertEquals(Feedback.objects.get().comment, '')
+
+    @override_settings(THUMBER_WRITE_MODE='buffered', THUMBER_BUFFER_TIMEOUT=60)
+    def test_repeated_buffered_submission(self):
+        self.addCleanup(feedback_buffer.flush)
+        data = {
+            'satisfied': 'True',
+            'thumber_token': 'ajax',
+            'thumber_reference': self.reference,
+        }
+        self.post_feedback(**data)
+        self.post_feedback(**data)
+        self.assertEquals(len(feedback_buffer), 1)
+        feedback_buffer.flush()
+
+        # Repeated again after the first submission was written
+        self.post_feedback(**data)
+        feedback_buffer.flush()
+        self.assertEquals(Feedback.objects.count(), 1)
+        self.assertEquals(FeedbackDailyRollup.objects.get().yes_count, 1)
+
+
+class ThumberTemplateCacheTests(TestCase):
+    def setUp(self):
+        clear_template_caches()
+        self.addCleanup(clear_template_caches)
+
+    def test_templates_resolved_once_per_view(self):
+        """The feedback and parent templates should only be looked up on the first request to a view"""
+        with mock.patch(
+            'thumber.views.select_template', wraps=select_template
+        ) as lookup:
+            response = self.client.get(reverse('thumber_tests:multiexample'))
+            self.assertContains(response, 'test before form', status_code=200)
+            self.assertEquals(lookup.call_count, 2)
+
+            response = self.client.get(reverse('thumber_tests:multiexample'))
+            self.assertContains(response, 'test before form', status_code=200)
+            self.assertEquals(lookup.call_count, 2)
+
+            # A different view, with different candidate templates, needs its own lookups
+            response = self.client.get(
+                reverse('thumber_tests:override_template_example')
+            )
+            self.assertContains(response, 'new test before form', status_code=200)
+            self.assertEquals(lookup.call_count, 4)
+
+    def test_cache_cleared_on_template_change(self):
+        with mock.patch(
+            'thumber.views.select_template', wraps=select_template
+        ) as lookup:
+            self.client.get(reverse('thumber_tests:example'))
+            file_changed.send(sender=None, file_path=Path('example.html'))
+            self.client.get(reverse('thumber_tests:example'))
+            self.assertEquals(lookup.call_count, 4)
+
+
 class ThumberAggregationTests(TestCase):
     def test_simple_view_averages(self):
         """Submit a mix of feedback to a view, and then ask the model manager for average feedback"""
@@ -285,7 +692,7 @@ class ThumberAggregationTests(TestCase):
 
         # Get the average of feedbacks for the first view
         average_feedback1 = Feedback.objects.filter(
-            view_name=view_name1
+            view__view_name=view_name1
         ).average_for_views()
 
         # The view name should be our app's example_view, and the average should be 50% positive, with 2 votes
@@ -295,10 +702,1790 @@ class ThumberAggregationTests(TestCase):
 
         # Get the average of feedbacks for the second view
         average_feedback2 = Feedback.objects.filter(
-            view_name=view_name2
+            view__view_name=view_name2
         ).average_for_views()
 
         # The view name should be our app's example_view, and the average should be 100% positive, with 1 vote
         self.assertEquals(average_feedback2[0]['count'], 1)
         self.assertEquals(average_feedback2[0]['view_name'], view_name2)
         self.assertEquals(average_feedback2[0]['average'], 1.0)
+
+
+class ThumberRollupTests(FeedbackClientMixin, TestCase):
+    view_names = ['thumber_tests:example', 'thumber_tests:example_form']
+
+    def give_feedback(self, view_name, satisfied, comment=None):
+        self.visit(view_name)
+        pk = self.post_feedback(view_name, satisfied=satisfied).json()['id']
+        if comment is not None:
+            self.post_feedback(view_name, id=pk, comment=comment)
+        return pk
+
+    def assert_rollups_match_feedback(self, **kwargs):
+        # Filtering the queryset means the averages are calculated directly from the Feedback table
+        from_feedback = Feedback.objects.filter(view__view_name__in=self.view_names)
+        self.assertEquals(
+            list(Feedback.objects.average_for_views(**kwargs)),
+            list(from_feedback.average_for_views(**kwargs)),
+        )
+
+    def test_rollups_kept_up_to_date(self):
+        self.give_feedback(self.view_names[0], 'True')
+        self.give_feedback(self.view_names[0], 'False', comment='test comment')
+        self.give_feedback(self.view_names[0], 'False')
+        self.give_feedback(self.view_names[1], 'True')
+
+        rollup = FeedbackDailyRollup.objects.get(view_name=self.view_names[0])
+        self.assertEquals(rollup.yes_count, 1)
+        self.assertEquals(rollup.no_count, 2)
+        self.assertEquals(rollup.comment_count, 1)
+
+        self.assert_rollups_match_feedback()
+        average_feedback = Feedback.objects.average_for_views()
+        self.assertEquals(average_feedback[0]['average'], 1 / 3)
+        self.assertEquals(average_feedback[1]['count'], 1)
+
+    def test_rollups_follow_changes_to_feedback(self):
+        pk = self.give_feedback(self.view_names[0], 'False', comment='test comment')
+
+        feedback = Feedback.objects.get(pk=pk)
+        feedback.satisfied = True
+        feedback.comment = ''
+        feedback.save()
+
+        rollup = FeedbackDailyRollup.objects.get()
+        self.assertEquals(rollup.yes_count, 1)
+        self.assertEquals(rollup.no_count, 0)
+        self.assertEquals(rollup.comment_count, 0)
+
+    def test_rollups_follow_deletes(self):
+        """Deleting Feedback, one at a time or with a queryset, takes it out of the rollups"""
+        first = self.give_feedback(self.view_names[0], 'True')
+        self.give_feedback(self.view_names[0], 'False', comment='test comment')
+        self.give_feedback(self.view_names[0], 'False')
+        self.give_feedback(self.view_names[1], 'True', comment='test comment')
+
+        Feedback.objects.get(pk=first).delete()
+        self.assert_rollups_match_feedback()
+
+        Feedback.objects.filter(comment='test comment').delete()
+        self.assert_rollups_match_feedback()
+        rollup = FeedbackDailyRollup.objects.get(view_name=self.view_names[0])
+        self.assertEquals((rollup.yes_count, rollup.no_count), (0, 1))
+        self.assertEquals(rollup.comment_count, 0)
+
+        # Unless the counts are kept
+        Feedback.objects.all().delete(keep_counts=True)
+        rollup.refresh_from_db()
+        self.assertEquals(rollup.no_count, 1)
+
+    def test_rollups_follow_updates(self):
+        """Updating a queryset adjusts the rollups by the changes to what the Feedback counts towards"""
+        last_week = datetime.date.today() - datetime.timedelta(days=7)
+        self.give_feedback(self.view_names[0], 'True')
+        self.give_feedback(self.view_names[0], 'False', comment='test comment')
+        older = self.give_feedback(self.view_names[1], 'False')
+
+        Feedback.objects.filter(satisfied=False).update(satisfied=True, comment='')
+        self.assert_rollups_match_feedback()
+        Feedback.objects.filter(pk=older).update(
+            created=datetime.datetime.combine(last_week, datetime.time(12))
+        )
+        self.assert_rollups_match_feedback()
+        self.assert_rollups_match_feedback(since=last_week, until=last_week)
+
+        # Read back in batches of one after the update
+        with mock.patch(
+            'django.db.backends.sqlite3.operations.DatabaseOperations.bulk_batch_size',
+            return_value=1,
+        ):
+            Feedback.objects.update(satisfied=False)
+        self.assert_rollups_match_feedback()
+
+    def test_rollups_follow_saves_of_deferred_feedback(self):
+        """Feedback loaded without the fields the rollups need is read again when it's saved"""
+        first = self.give_feedback(self.view_names[0], 'False', comment='test comment')
+        second = self.give_feedback(self.view_names[0], 'False')
+
+        feedback = Feedback.objects.only('satisfied').get(pk=first)
+        feedback.satisfied = True
+        feedback.save()
+        self.assert_rollups_match_feedback()
+
+        feedback = Feedback.objects.defer('comment', 'created').get(pk=second)
+        feedback.comment = 'test comment'
+        feedback.save()
+        self.assert_rollups_match_feedback()
+        rollup = FeedbackDailyRollup.objects.get()
+        self.assertEquals((rollup.yes_count, rollup.no_count), (1, 1))
+        self.assertEquals(rollup.comment_count, 2)
+
+    def test_rollups_follow_bulk_changes(self):
+        """Bulk creating and updating Feedback adjusts the rollups and sketches, unless the counts are kept"""
+        feedback = Feedback.objects.bulk_create(
+            Feedback(view_name=view_name, satisfied=False, session=view_name)
+            for view_name in self.view_names
+        )
+        self.assert_rollups_match_feedback()
+        self.assertEquals(
+            round(FeedbackSessionSketch.objects.total_distinct_sessions()), 2
+        )
+
+        for f in feedback:
+            f.satisfied = True
+            f.comment = 'test comment'
+        Feedback.objects.bulk_update(feedback, ['satisfied', 'comment'])
+        self.assert_rollups_match_feedback()
+        self.assertEquals(
+            FeedbackDailyRollup.objects.get(view_name=self.view_names[0]).comment_count,
+            1,
+        )
+
+        Feedback.objects.bulk_update(feedback, ['comment'], keep_counts=True)
+        Feedback.objects.bulk_create(
+            [Feedback(view_name=self.view_names[0], satisfied=True, session='new')],
+            keep_counts=True,
+        )
+        self.assertEquals(FeedbackDailyRollup.objects.count(), 2)
+        self.assertEquals(
+            sum(FeedbackDailyRollup.objects.values_list('yes_count', flat=True)), 2
+        )
+
+        # Which conflicting Feedback is inserted isn't known, so the counts can't be kept up to date
+        with self.assertRaises(ValueError):
+            Feedback.objects.bulk_create(feedback, ignore_conflicts=True)
+
+    @override_settings(USE_TZ=True, TIME_ZONE='UTC')
+    def test_rollup_days_in_project_time_zone(self):
+        """Feedback is counted on its day in TIME_ZONE, whichever time zone is active"""
+        given = datetime.datetime(2026, 1, 1, 20, tzinfo=datetime.timezone.utc)
+        with timezone.override('Asia/Tokyo'):
+            feedback = Feedback.objects.create(
+                satisfied=True, view_name=self.view_names[0], session='session'
+            )
+            Feedback.objects.filter(pk=feedback.pk).update(created=given)
+            Feedback.objects.get().delete()
+            feedback = Feedback.objects.create(
+                satisfied=False, view_name=self.view_names[0], session='session'
+            )
+            feedback.created = given
+            feedback.save()
+            Feedback.objects.filter(pk=feedback.pk).set_comment('test comment')
+
+        rollup = FeedbackDailyRollup.objects.filter(no_count=1).get()
+        self.assertEquals(rollup.day, datetime.date(2026, 1, 1))
+        self.assertEquals(rollup.comment_count, 1)
+        counts = list(FeedbackDailyRollup.objects.filter(no_count__gt=0).values())
+        with timezone.override('Asia/Tokyo'):
+            FeedbackDailyRollup.objects.rebuild()
+        self.assertEquals(
+            list(FeedbackDailyRollup.objects.values()),
+            [dict(row, id=ANY) for row in counts],
+        )
+
+    def test_filtered_date_ranges_use_created(self):
+        """Date ranges on a filtered queryset compare created with when the days start, so its indexes can be used"""
+        last_week = datetime.date.today() - datetime.timedelta(days=7)
+        self.give_feedback(self.view_names[0], 'True')
+        end_of_day = self.give_feedback(self.view_names[0], 'False')
+        next_day = self.give_feedback(self.view_names[0], 'False')
+        Feedback.objects.filter(pk=end_of_day).update(
+            created=datetime.datetime.combine(last_week, datetime.time.max)
+        )
+        Feedback.objects.filter(pk=next_day).update(
+            created=datetime.datetime.combine(
+                last_week + datetime.timedelta(days=1), datetime.time.min
+            )
+        )
+        self.assert_rollups_match_feedback(since=last_week, until=last_week)
+
+        queryset = Feedback.objects.filter(view__view_name=self.view_names[0])
+        with CaptureQueriesContext(connection) as queries:
+            averages = list(
+                queryset.average_for_views(since=last_week, until=last_week)
+            )
+            list(queryset.satisfaction_by_period(since=last_week, until=last_week))
+            list(queryset.distinct_sessions(since=last_week, until=last_week))
+        self.assertEquals(averages[0]['count'], 1)
+        for query in queries:
+            self.assertNotIn('django_datetime_cast_date', query['sql'])
+
+    def test_averages_answered_from_rollups(self):
+        for _ in range(5):
+            self.give_feedback(self.view_names[0], 'True')
+
+        with self.assertNumQueries(1):
+            average_feedback = list(Feedback.objects.average_for_views())
+        self.assertEquals(average_feedback[0]['count'], 5)
+
+    def test_rebuild_and_date_ranges(self):
+        today = datetime.date.today()
+        last_week = today - datetime.timedelta(days=7)
+
+        self.give_feedback(self.view_names[0], 'True')
+        self.give_feedback(self.view_names[0], 'False', comment='test comment')
+        self.give_feedback(self.view_names[1], 'False')
+        older = self.give_feedback(self.view_names[1], 'True')
+
+        # Move some feedback into the past, bypassing the rollups, and then rebuild them
+        Feedback.objects.filter(pk=older).update(
+            created=datetime.datetime.combine(last_week, datetime.time(12)),
+            keep_counts=True,
+        )
+        call_command('thumber_rebuild_rollups', stdout=StringIO())
+        self.assertEquals(FeedbackDailyRollup.objects.count(), 3)
+
+        self.assert_rollups_match_feedback()
+        self.assert_rollups_match_feedback(since=today)
+        self.assert_rollups_match_feedback(until=today - datetime.timedelta(days=1))
+        self.assert_rollups_match_feedback(since=last_week, until=last_week)
+
+        average_feedback = Feedback.objects.average_for_views(since=today)
+        self.assertEquals(average_feedback[1]['count'], 1)
+        self.assertEquals(average_feedback[1]['average'], 0.0)
+
+
+class ThumberExportTests(TestCase):
+    def setUp(self):
+        for ind in range(5):
+            Feedback.objects.create(
+                satisfied=ind % 2 == 0,
+                comment='comment, with "quotes"\nand lines' if ind == 1 else '',
+                url='http://example.com/',
+                view_name='thumber_tests:example{0}'.format(ind % 2),
+                view_args={'args': [], 'kwargs': {}},
+                session='session',
+            )
+        self.ids = list(Feedback.objects.order_by('pk').values_list('pk', flat=True))
+
+    def export(self, **options):
+        stdout = StringIO()
+        call_command('thumber_export', stdout=stdout, stderr=StringIO(), **options)
+        return stdout.getvalue()
+
+    def test_csv_export(self):
+        rows = list(csv.DictReader(StringIO(self.export())))
+        self.assertEquals([int(row['id']) for row in rows], self.ids)
+        self.assertEquals(rows[1]['comment'], 'comment, with "quotes"\nand lines')
+        self.assertEquals(rows[0]['satisfied'], 'True')
+
+    def test_exported_in_chunks(self):
+        # Three queries fetch the three chunks of 2, and a fourth finds there's nothing left
+        with self.assertNumQueries(4):
+            output = self.export(format='ndjson', chunk_size=2)
+        rows = [json.loads(line) for line in output.splitlines()]
+        self.assertEquals([row['id'] for row in rows], self.ids)
+
+    def test_filtered_export(self):
+        today = datetime.date.today()
+        Feedback.objects.filter(pk=self.ids[0]).update(
+            created=datetime.datetime.combine(
+                today - datetime.timedelta(days=3), datetime.time(12)
+            )
+        )
+
+        output = self.export(format='ndjson', view_names=['thumber_tests:example0'])
+        self.assertEquals(len(output.splitlines()), 3)
+
+        output = self.export(format='ndjson', since=today)
+        self.assertEquals(len(output.splitlines()), 4)
+
+        output = self.export(format='ndjson', until=today - datetime.timedelta(days=1))
+        self.assertEquals(json.loads(output)['id'], self.ids[0])
+
+    def test_incremental_export(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cursor = os.path.join(directory, 'cursor.json')
+            output = self.export(format='ndjson', cursor=cursor)
+            self.assertEquals(len(output.splitlines()), 5)
+
+            # Nothing new to export
+            self.assertEquals(self.export(format='ndjson', cursor=cursor), '')
+
+            new = Feedback.objects.create(
+                satisfied=True,
+                url='http://example.com/',
+                view_name='thumber_tests:example',
+                session='session',
+            )
+            output = self.export(format='ndjson', cursor=cursor)
+            self.assertEquals(json.loads(output)['id'], new.pk)
+
+            # Feedback that's changed after it was exported, e.g. given a comment, is exported again
+            Feedback.objects.filter(pk=self.ids[0]).set_comment('later comment')
+            output = self.export(format='ndjson', cursor=cursor)
+            self.assertEquals(json.loads(output)['id'], self.ids[0])
+            self.assertEquals(json.loads(output)['comment'], 'later comment')
+            self.assertEquals(self.export(format='ndjson', cursor=cursor), '')
+
+
+@override_settings(
+    THUMBER_WRITE_MODE='buffered', THUMBER_BUFFER_SIZE=10, THUMBER_BUFFER_TIMEOUT=60
+)
+class ThumberBufferedWriteTests(FeedbackClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(feedback_buffer.flush)
+        self.visit()
+
+    def test_burst_is_written_in_one_insert(self):
+        """Submit a burst of feedback, and ensure that nothing touches the DB until the buffer fills, at which point
+        all of the feedback is written with a single insert
+        """
+        with self.assertNumQueries(0):
+            for _ in range(9):
+                self.post_feedback(satisfied='True')
+        self.assertEquals(Feedback.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.post_feedback(satisfied='False')
+        inserts = [
+            query
+            for query in queries.captured_queries
+            if query['sql'].startswith('INSERT INTO "thumber_feedback"')
+        ]
+        self.assertEquals(len(inserts), 1)
+
+        self.assertEquals(Feedback.objects.count(), 10)
+        self.assertEquals(Feedback.objects.filter(satisfied=True).count(), 9)
+        feedback = Feedback.objects.get(satisfied=False)
+        self.assertEquals(feedback.view_name, self.view_name)
+        self.assertEquals(FeedbackDailyRollup.objects.get().yes_count, 9)
+
+        # The same burst without buffering needs far more queries
+        with override_settings(THUMBER_WRITE_MODE='sync'):
+            with CaptureQueriesContext(connection) as sync_queries:
+                for _ in range(10):
+                    self.post_feedback(satisfied='True')
+        self.assertGreaterEqual(len(sync_queries), 10)
+        self.assertLess(len(queries), len(sync_queries))
+
+    def test_comment_on_queued_feedback(self):
+        """Add a comment to Feedback that hasn't yet been flushed, it should be written along with the Feedback"""
+        reference = self.post_feedback(satisfied='False').json()['id']
+
+        data = {'thumber_token': 'ajax', 'id': reference, 'comment': 'test comment'}
+        with self.assertNumQueries(0):
+            response = self.client.post(self.path, data, HTTP_REFERER=self.http_referer)
+        self.assertEquals(response.json(), {'success': True, 'id': reference})
+
+        self.assertEquals(feedback_buffer.flush(), 1)
+        feedback = Feedback.objects.get()
+        self.assertEquals(feedback.reference, reference)
+        self.assertEquals(feedback.comment, 'test comment')
+
+    def test_comment_on_flushed_feedback(self):
+        """Add a comment to Feedback that has already been flushed, the row should be updated directly"""
+        reference = self.post_feedback(satisfied='False').json()['id']
+        feedback_buffer.flush()
+
+        data = {'thumber_token': 'ajax', 'id': reference, 'comment': 'test comment'}
+        self.client.post(self.path, data, HTTP_REFERER=self.http_referer)
+
+        self.assertEquals(len(feedback_buffer), 0)
+        feedback = Feedback.objects.get(reference=reference)
+        self.assertEquals(feedback.comment, 'test comment')
+
+    def test_comment_on_feedback_queued_by_another_process(self):
+        """A comment on Feedback that another process has queued is set once that process has written it"""
+        reference = self.post_feedback(satisfied='False').json()['id']
+        # Take the Feedback out of this process's buffer, as if it were queued in another process
+        queued = list(feedback_buffer._pending.values())
+        feedback_buffer._pending.clear()
+
+        data = {'thumber_token': 'ajax', 'id': reference, 'comment': 'test comment'}
+        response = self.client.post(self.path, data, HTTP_REFERER=self.http_referer)
+        self.assertEquals(response.json(), {'success': True, 'id': reference})
+
+        # Flushing before the other process has written the Feedback keeps the comment queued
+        feedback_buffer.flush()
+        Feedback.objects.bulk_create(queued)
+        self.assertEquals(Feedback.objects.get().comment, '')
+
+        feedback_buffer.flush()
+        self.assertEquals(Feedback.objects.get().comment, 'test comment')
+        self.assertEquals(FeedbackDailyRollup.objects.get().comment_count, 1)
+
+        # Comments are dropped once they've waited too long
+        data['id'] = uuid.uuid4().hex
+        self.client.post(self.path, data, HTTP_REFERER=self.http_referer)
+        with mock.patch('thumber.buffer.COMMENT_TIMEOUTS', -1):
+            feedback_buffer.flush()
+        self.assertEquals(feedback_buffer._comments, {})
+
+
+class ThumberAdminTests(TestCase):
+    path = '/admin/thumber/feedback/'
+
+    def setUp(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+    def create_feedback(self, count, **kwargs):
+        feedback = [
+            Feedback(
+                view_name=kwargs.get('view_name', 'thumber_tests:example'),
+                satisfied=kwargs.get('satisfied', True),
+                comment=kwargs.get('comment', ''),
+                session='session',
+            )
+            for _ in range(count)
+        ]
+        Feedback.objects.bulk_create(feedback)
+        FeedbackDailyRollup.objects.rebuild()
+
+    def get_changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.path, params)
+        self.assertEquals(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_constant(self):
+        """The changelist should make the same number of queries, however much Feedback there is"""
+        self.create_feedback(5)
+        _, small_queries = self.get_changelist()
+
+        self.create_feedback(250)
+        _, large_queries = self.get_changelist()
+        self.assertEquals(small_queries, large_queries)
+
+    def test_comment_is_truncated(self):
+        """Only the start of long comments should be loaded and shown"""
+        self.create_feedback(1, comment='x' * 1000)
+        response, _ = self.get_changelist()
+        self.assertContains(response, 'x' * 99 + '…')
+        self.assertNotContains(response, 'x' * 101)
+
+    @override_settings(THUMBER_ADMIN_COUNT_LIMIT=150)
+    def test_count_is_capped(self):
+        """The count should stop at the limit, with older Feedback reached with the keyset link"""
+        self.create_feedback(250)
+        response, _ = self.get_changelist()
+        self.assertEquals(response.context['cl'].result_count, 150)
+
+        older_url = response.context['cl'].older_url
+        self.assertIn('before=', older_url)
+        older = self.client.get(self.path + older_url)
+        last_shown = response.context['cl'].result_list[-1]
+        for feedback in older.context['cl'].result_list:
+            self.assertLess(feedback.pk, last_shown.pk)
+
+    def test_filters(self):
+        """Filter on view name and satisfaction"""
+        self.create_feedback(3, view_name='thumber_tests:example')
+        self.create_feedback(2, view_name='thumber_tests:example_form', satisfied=False)
+
+        response, _ = self.get_changelist(view_name='thumber_tests:example_form')
+        self.assertContains(response, '?view_name=thumber_tests%3Aexample_form')
+        self.assertEquals(len(response.context['cl'].result_list), 2)
+
+        response, _ = self.get_changelist(satisfied__exact='1')
+        self.assertEquals(len(response.context['cl'].result_list), 3)
+        self.assertIsNone(response.context['cl'].older_url)
+
+    def test_month_filter(self):
+        """Filter on the month, with the months taken from the rollups"""
+        self.create_feedback(3)
+        this_month = datetime.date.today().replace(day=1)
+        last_month = (this_month - datetime.timedelta(days=1)).replace(day=1)
+        Feedback.objects.filter(pk=Feedback.objects.first().pk).update(
+            created=datetime.datetime.combine(last_month, datetime.time(12))
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response, _ = self.get_changelist(month=last_month.strftime('%Y-%m'))
+        self.assertEquals(len(response.context['cl'].result_list), 1)
+        self.assertContains(response, '?month={0}'.format(this_month.strftime('%Y-%m')))
+        self.assertContains(response, last_month.strftime('%B %Y'))
+        for query in queries:
+            if 'thumber_feedback"' in query['sql']:
+                self.assertNotIn('django_datetime_trunc', query['sql'])
+
+    def test_delete_selected(self):
+        """Deleting Feedback with the admin action takes it out of the rollups"""
+        self.create_feedback(3, view_name='thumber_tests:example')
+        self.create_feedback(2, view_name='thumber_tests:example', satisfied=False)
+        selected = Feedback.objects.filter(satisfied=True).values_list('pk', flat=True)
+
+        data = {
+            'action': 'delete_selected',
+            '_selected_action': list(selected),
+            'post': 'yes',
+        }
+        response = self.client.post(self.path, data)
+        self.assertEquals(response.status_code, 302)
+
+        self.assertEquals(Feedback.objects.count(), 2)
+        rollup = FeedbackDailyRollup.objects.get()
+        self.assertEquals((rollup.yes_count, rollup.no_count), (0, 2))
+
+
+@override_settings(USE_TZ=True, TIME_ZONE='UTC')
+class ThumberStatsTests(TestCase):
+    path = '/thumber/stats'
+
+    def setUp(self):
+        caches['default'].clear()
+        user = User.objects.create_user('staff', password='password', is_staff=True)
+        self.client.force_login(user)
+
+        self.today = datetime.date.today()
+        self.create_feedback('thumber_tests:example', [True, True, False], days_ago=0)
+        self.create_feedback('thumber_tests:example', [False], days_ago=1)
+        self.create_feedback('thumber_tests:example_form', [False, False], days_ago=0)
+        self.create_feedback('thumber_tests:multiexample', [True], days_ago=8)
+
+    def create_feedback(self, view_name, votes, days_ago):
+        for satisfied in votes:
+            feedback = Feedback.objects.create(
+                view_name=view_name, satisfied=satisfied, session='session'
+            )
+            created = timezone.now() - datetime.timedelta(days=days_ago)
+            Feedback.objects.filter(pk=feedback.pk).update(created=created)
+        FeedbackDailyRollup.objects.rebuild()
+
+    def test_daily_buckets_from_rollups(self):
+        """Daily buckets for all feedback should come from the rollups, and match the Feedback table"""
+        since = self.today - datetime.timedelta(days=1)
+        with self.assertNumQueries(1):
+            buckets = list(Feedback.objects.satisfaction_by_period('day', since=since))
+
+        self.assertEquals(
+            [
+                (bucket['period'], bucket['view_name'], bucket['count'])
+                for bucket in buckets
+            ],
+            [
+                (since, 'thumber_tests:example', 1),
+                (self.today, 'thumber_tests:example', 3),
+                (self.today, 'thumber_tests:example_form', 2),
+            ],
+        )
+        self.assertAlmostEqual(buckets[1]['average'], 2 / 3)
+
+        raw = Feedback.objects.exclude(pk=None).satisfaction_by_period(
+            'day', since=since
+        )
+        self.assertEquals(
+            [
+                (bucket['period'], bucket['view_name'], bucket['count'])
+                for bucket in raw
+            ],
+            [
+                (bucket['period'], bucket['view_name'], bucket['count'])
+                for bucket in buckets
+            ],
+        )
+
+    def test_weekly_and_hourly_buckets(self):
+        """Weekly buckets are truncated to the start of the week, and hourly buckets to the hour"""
+        weeks = Feedback.objects.satisfaction_by_period('week')
+        self.assertTrue(all(bucket['period'].weekday() == 0 for bucket in weeks))
+        self.assertEquals(sum(bucket['count'] for bucket in weeks), 7)
+
+        hours = Feedback.objects.satisfaction_by_period('hour', since=self.today)
+        self.assertEquals(sum(bucket['count'] for bucket in hours), 5)
+        self.assertTrue(all(bucket['period'].minute == 0 for bucket in hours))
+
+        with self.assertRaises(ValueError):
+            Feedback.objects.satisfaction_by_period('month')
+
+    def test_worst_views(self):
+        """The worst views are ordered by their average satisfaction, and can require a minimum number of votes"""
+        worst = Feedback.objects.worst_views(limit=2)
+        self.assertEquals(
+            [view['view_name'] for view in worst],
+            ['thumber_tests:example_form', 'thumber_tests:example'],
+        )
+
+        worst = Feedback.objects.worst_views(min_count=3)
+        self.assertEquals(
+            [view['view_name'] for view in worst], ['thumber_tests:example']
+        )
+
+    def test_endpoint(self):
+        """The endpoint should return buckets and the worst views as JSON, and be cached"""
+        response = self.client.get(self.path, {'period': 'day', 'top': 1})
+        self.assertEquals(response.status_code, 200)
+        stats = response.json()
+        self.assertEquals(stats['period'], 'day')
+        self.assertEquals(stats['until'], self.today.isoformat())
+        self.assertEquals(len(stats['buckets']), 4)
+        self.assertEquals(stats['worst'][0]['view_name'], 'thumber_tests:example_form')
+        self.assertEquals(stats['worst'][0]['average'], 0)
+        self.assertEquals(len(stats['worst']), 1)
+
+        with self.assertNumQueries(1):
+            # Just the user lookup, the statistics come from the cache
+            cached = self.client.get(self.path, {'period': 'day', 'top': 1})
+        self.assertEquals(cached.json(), stats)
+
+        response = self.client.get(
+            self.path, {'view_name': 'thumber_tests:multiexample', 'period': 'week'}
+        )
+        self.assertEquals(
+            [bucket['count'] for bucket in response.json()['buckets']], [1]
+        )
+
+    def test_endpoint_errors(self):
+        """Bad options give a 400, and anyone but staff a 403"""
+        response = self.client.get(self.path, {'period': 'month'})
+        self.assertEquals(response.status_code, 400)
+        self.assertIn('period', response.json()['errors'])
+
+        response = self.client.get(
+            self.path, {'since': '2020-02-01', 'until': '2020-01-01'}
+        )
+        self.assertEquals(response.status_code, 400)
+
+        self.client.logout()
+        response = self.client.get(self.path)
+        self.assertEquals(response.status_code, 403)
+
+
+@override_settings(THUMBER_METRICS=True)
+class ThumberMetricsTests(FeedbackClientMixin, TestCase):
+    referer_origin = 'http://testserver'
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        self.visit()
+
+    def test_submissions_and_stages_are_recorded(self):
+        """Count submissions by view and satisfaction, and time each stage of handling them"""
+        feedback_id = self.post_feedback(satisfied='True').json()['id']
+        self.post_feedback(satisfied='False')
+        self.post_feedback(satisfied='False')
+        self.post_feedback(id=feedback_id, comment='test comment')
+
+        self.assertEquals(
+            metrics.submissions.get(view_name=self.view_name, satisfied=False), 2
+        )
+        self.assertEquals(
+            metrics.submissions.get(view_name=self.view_name, satisfied=True), 1
+        )
+        self.assertEquals(metrics.comments.get(), 1)
+        self.assertEquals(metrics.stage_seconds.get_count(stage='post'), 4)
+        self.assertEquals(metrics.stage_seconds.get_count(stage='resolve'), 3)
+
+        self.client.get(self.path)
+        self.assertGreater(metrics.stage_seconds.get_count(stage='template'), 0)
+
+    def test_errors_are_recorded(self):
+        """Comments on Feedback that can't be found are counted as errors, and signalled"""
+        receiver = mock.Mock()
+        feedback_failed.connect(receiver)
+        self.addCleanup(feedback_failed.disconnect, receiver)
+
+        self.post_feedback(id='12345', comment='test comment')
+        self.assertEquals(metrics.errors.get(stage='comment'), 1)
+        self.assertEquals(receiver.call_args[1]['stage'], 'comment')
+        self.assertIsNone(receiver.call_args[1]['exception'])
+
+    def test_signals(self):
+        """Receivers get the submitted Feedback, and the stage timings even if metrics are disabled"""
+        submitted = mock.Mock()
+        feedback_submitted.connect(submitted)
+        self.addCleanup(feedback_submitted.disconnect, submitted)
+        timings = mock.Mock()
+        stage_timed.connect(timings)
+        self.addCleanup(stage_timed.disconnect, timings)
+
+        with override_settings(THUMBER_METRICS=False):
+            self.post_feedback(satisfied='True')
+
+        self.assertEquals(submitted.call_args[1]['feedback'].view_name, self.view_name)
+        stages = [call[1]['stage'] for call in timings.call_args_list]
+        self.assertEquals(sorted(stages), ['post', 'resolve'])
+        self.assertEquals(metrics.stage_seconds.get_count(stage='post'), 0)
+
+    def test_endpoint(self):
+        """The metrics are exposed in the Prometheus text format, only while enabled"""
+        self.post_feedback(satisfied='True')
+
+        response = self.client.get('/thumber/metrics')
+        self.assertEquals(response.status_code, 200)
+        self.assertTrue(
+            response['Content-Type'].startswith('text/plain; version=0.0.4')
+        )
+        content = response.content.decode()
+        self.assertIn('# TYPE thumber_submissions counter', content)
+        self.assertIn(
+            'thumber_submissions_total{{view_name="{0}",satisfied="True"}} 1.0'.format(
+                self.view_name
+            ),
+            content,
+        )
+        self.assertIn('thumber_stage_seconds_bucket{stage="post",le="+Inf"} 1', content)
+        self.assertIn('thumber_stage_seconds_count{stage="post"} 1', content)
+
+        with override_settings(THUMBER_METRICS=False):
+            self.assertEquals(self.client.get('/thumber/metrics').status_code, 404)
+
+
+@override_settings(THUMBER_THROTTLE_VISITOR_LIMIT=3, THUMBER_THROTTLE_WINDOW=60)
+class ThumberThrottlingTests(FeedbackClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        self.visit()
+
+    def post_feedback(self, **extra):
+        return super().post_feedback(satisfied='True', extra=extra)
+
+    def test_visitor_is_throttled(self):
+        """Submissions over the limit get a 429 without touching the database, other visitors are unaffected"""
+        for _ in range(3):
+            self.assertEquals(self.post_feedback().status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.post_feedback()
+        self.assertEquals(response.status_code, 429)
+        self.assertEquals(response.json(), {'success': False})
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEquals(Feedback.objects.count(), 3)
+
+        self.client.cookies.clear()
+        self.client.get(self.path, follow=True)
+        self.assertEquals(self.post_feedback().status_code, 200)
+
+    @override_settings(
+        THUMBER_THROTTLE_VISITOR_LIMIT=None,
+        THUMBER_THROTTLE_IP_LIMIT=2,
+        THUMBER_THROTTLE_IP_HEADER='HTTP_X_FORWARDED_FOR',
+    )
+    def test_ip_is_throttled(self):
+        """Submissions are limited per IP address, the one the proxy appended to the configured header"""
+        for _ in range(2):
+            response = self.post_feedback(HTTP_X_FORWARDED_FOR='10.0.0.1, 10.0.0.2')
+            self.assertEquals(response.status_code, 200)
+        # Addresses the client sent itself don't give it a new limit
+        response = self.post_feedback(HTTP_X_FORWARDED_FOR='10.0.0.3, 10.0.0.2')
+        self.assertEquals(response.status_code, 429)
+        response = self.post_feedback(HTTP_X_FORWARDED_FOR='10.0.0.1')
+        self.assertEquals(response.status_code, 200)
+
+        # Behind two proxies, the address the furthest one appended
+        with override_settings(THUMBER_THROTTLE_PROXY_COUNT=2):
+            response = self.post_feedback(
+                HTTP_X_FORWARDED_FOR='10.0.0.4, 10.0.0.2, 10.0.0.5'
+            )
+            self.assertEquals(response.status_code, 429)
+            response = self.post_feedback(HTTP_X_FORWARDED_FOR='10.0.0.3')
+            self.assertEquals(response.status_code, 200)
+
+    def test_window_slides(self):
+        """Submissions in the previous window count towards the limit in proportion to their overlap with the
+        sliding window
+        """
+        with mock.patch('thumber.throttling.time.time', return_value=600.0):
+            for _ in range(3):
+                self.post_feedback()
+
+        # Half way through the next window, half of the previous window's submissions still count
+        with mock.patch('thumber.throttling.time.time', return_value=690.0):
+            self.assertEquals(self.post_feedback().status_code, 200)
+            response = self.post_feedback()
+            self.assertEquals(response.status_code, 429)
+            self.assertEquals(response['Retry-After'], '30')
+
+    @override_settings(THUMBER_THROTTLE_VISITOR_LIMIT=None)
+    def test_disabled(self):
+        """Without limits, nothing is read from or written to the cache"""
+        with mock.patch('thumber.throttling.caches') as throttle_caches:
+            for _ in range(5):
+                self.assertEquals(self.post_feedback().status_code, 200)
+        throttle_caches.__getitem__.assert_not_called()
+
+
+class ThumberPruneTests(TestCase):
+    def setUp(self):
+        today = datetime.date.today()
+        for days_ago in [40, 35, 31, 5, 0]:
+            feedback = Feedback.objects.create(
+                satisfied=days_ago > 30,
+                comment='old' if days_ago == 35 else '',
+                url='http://example.com/',
+                view_name='thumber_tests:example',
+                session='session',
+            )
+            created = datetime.datetime.combine(
+                today - datetime.timedelta(days=days_ago), datetime.time(12)
+            )
+            Feedback.objects.filter(pk=feedback.pk).update(created=created)
+        FeedbackDailyRollup.objects.rebuild()
+
+    def prune(self, **options):
+        stdout = StringIO()
+        call_command('thumber_prune', stdout=stdout, sleep=0, **options)
+        return stdout.getvalue()
+
+    def test_pruned_in_batches(self):
+        """Old Feedback is deleted in batches, and the rollups still count it"""
+        averages = list(Feedback.objects.average_for_views())
+
+        with CaptureQueriesContext(connection) as queries:
+            output = self.prune(days=30, batch_size=2)
+        self.assertIn('Deleted 3 Feedback', output)
+        deletes = [query for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEquals(len(deletes), 2)
+
+        self.assertEquals(Feedback.objects.count(), 2)
+        self.assertFalse(Feedback.objects.filter(satisfied=True).exists())
+        self.assertEquals(list(Feedback.objects.average_for_views()), averages)
+
+    def test_archive_and_discard_counts(self):
+        """Deleted Feedback is archived, and can be removed from the rollups too"""
+        with tempfile.TemporaryDirectory() as directory:
+            archive = os.path.join(directory, 'archive.ndjson')
+            self.prune(days=32, archive=archive, discard_counts=True)
+            self.prune(days=30, archive=archive, discard_counts=True)
+
+            with open(archive) as archive_file:
+                rows = [json.loads(line) for line in archive_file]
+
+        self.assertEquals(len(rows), 3)
+        self.assertEquals([row['comment'] for row in rows], ['', 'old', ''])
+        average = Feedback.objects.average_for_views()[0]
+        self.assertEquals((average['count'], average['average']), (2, 0))
+
+    @override_settings(THUMBER_RETENTION_DAYS=10)
+    def test_retention_setting(self):
+        """The retention period defaults to the setting, and a dry run deletes nothing"""
+        self.assertIn('Would delete 3 Feedback', self.prune(dry_run=True))
+        self.assertEquals(Feedback.objects.count(), 5)
+
+        with override_settings(THUMBER_RETENTION_DAYS=None):
+            with self.assertRaises(CommandError):
+                self.prune()
+
+
+class ThumberAsyncTests(FeedbackClientMixin, TestCase):
+    view_name = 'thumber_tests:async_example'
+
+    def test_async_view_gets_async_thumber_view(self):
+        """Decorating a view with async handlers gives async handlers for the thumber form too"""
+        self.assertTrue(AsyncExampleView.view_is_async)
+        self.assertTrue(issubclass(AsyncExampleView, AsyncThumberView))
+        self.assertFalse(ExampleTemplateView.view_is_async)
+
+    async def test_get_has_thumber_form(self):
+        response = await self.async_client.get(self.path)
+        self.assertContains(response, 'Example Template!', status_code=200)
+        self.assertContains(response, 'Was this service useful?')
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    @override_settings(THUMBER_IDENTITY='signed')
+    async def test_get_signed_identity(self):
+        response = await self.async_client.get(self.path)
+        self.assertIn('thumber_id', response.cookies)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    async def test_ajax_feedback_and_comment(self):
+        await self.async_client.get(self.path)
+
+        response = await self.apost_feedback(satisfied='False')
+        feedback_id = response.json()['id']
+        feedback = await Feedback.objects.select_related('view').aget(pk=feedback_id)
+        self.assertEquals(feedback.view_name, self.view_name)
+        self.assertFalse(feedback.satisfied)
+
+        data = {'id': feedback_id, 'comment': 'test comment'}
+        response = await self.apost_feedback(**data)
+        self.assertEquals(response.json(), {'success': True, 'id': str(feedback_id)})
+        feedback = await Feedback.objects.aget(pk=feedback_id)
+        self.assertEquals(feedback.comment, 'test comment')
+
+        data['id'] = 'missing'
+        response = await self.apost_feedback(**data)
+        self.assertEquals(response.status_code, 404)
+
+    async def test_sync_feedback(self):
+        await self.async_client.get(self.path)
+
+        response = await self.apost_feedback(satisfied='True', thumber_token='sync')
+        self.assertContains(response, 'Thank you for your feedback', status_code=200)
+        self.assertEquals(await Feedback.objects.filter(satisfied=True).acount(), 1)
+
+    @override_settings(THUMBER_THROTTLE_VISITOR_LIMIT=1)
+    async def test_throttled(self):
+        await caches['default'].aclear()
+        await self.async_client.get(self.path)
+
+        data = {'satisfied': 'True', 'thumber_token': 'ajax'}
+        response = await self.async_client.post(self.path, data)
+        self.assertEquals(response.status_code, 200)
+        response = await self.async_client.post(self.path, data)
+        self.assertEquals(response.status_code, 429)
+
+    async def test_no_original_post_method(self):
+        response = await self.async_client.post(self.path, {})
+        self.assertEquals(response.status_code, 405)
+
+
+class ThumberWidgetCacheTests(TestCase):
+    def setUp(self):
+        clear_widget_cache()
+        self.addCleanup(clear_widget_cache)
+
+    def test_widget_rendered_once(self):
+        """The widget's fields are rendered once, without building a form, with each response getting its own
+        reference
+        """
+        path = reverse('thumber_tests:example')
+        with mock.patch('thumber.views.ThumberForm') as form_class:
+            first = self.client.get(path)
+            second = self.client.get(path)
+        form_class.assert_not_called()
+
+        self.assertEquals(_render_widget_fields.cache_info().misses, 1)
+        self.assertEquals(_render_widget_fields.cache_info().hits, 1)
+        for response in (first, second):
+            self.assertContains(response, 'Was this service useful?')
+            self.assertContains(response, 'name="csrfmiddlewaretoken"')
+        self.assertNotEquals(
+            first.context['thumber_widget'].initial['thumber_reference'],
+            second.context['thumber_widget'].initial['thumber_reference'],
+        )
+        self.assertContains(
+            second,
+            'name="thumber_reference" value="{0}"'.format(
+                second.context['thumber_widget'].initial['thumber_reference']
+            ),
+        )
+
+    def test_widget_varies_by_wording_and_language(self):
+        """Views with different wording, and different languages, get their own rendering"""
+        response = self.client.get(reverse('thumber_tests:example'))
+        self.assertEquals(_render_widget_fields.cache_info().misses, 1)
+
+        # This view's template renders the form itself, rather than the widget
+        override = self.client.get(reverse('thumber_tests:override_template_example'))
+        self.assertContains(override, 'Did you find what you were looking for?')
+        self.assertEquals(_render_widget_fields.cache_info().misses, 1)
+        str(override.context['thumber_widget'])
+        self.assertEquals(_render_widget_fields.cache_info().misses, 2)
+
+        widget = response.context['thumber_widget']
+        for language in ('fr', 'fr'):
+            with translation.override(language):
+                str(widget)
+        self.assertEquals(_render_widget_fields.cache_info().misses, 3)
+
+    def test_form_matches_widget(self):
+        """The form built from the context has the same values as the widget"""
+        response = self.client.get(reverse('thumber_tests:example'))
+        widget = response.context['thumber_widget']
+        form = response.context['thumber_form']
+        self.assertEquals(form.initial, widget.initial)
+        self.assertInHTML(str(form['satisfied']), str(widget))
+
+
+class ThumberCompactStorageTests(TestCase):
+    view_names = ['thumber_tests:example', 'thumber_tests:example_form']
+
+    def setUp(self):
+        FeedbackView.objects.clear_cache()
+
+    def tearDown(self):
+        FeedbackView.objects.clear_cache()
+
+    def create_feedback(self, view_name, **kwargs):
+        return Feedback.objects.create(
+            view_name=view_name, satisfied=True, session='session', **kwargs
+        )
+
+    def test_view_names_are_stored_once(self):
+        self.create_feedback(self.view_names[0])
+        self.create_feedback(self.view_names[0])
+        Feedback.objects.bulk_create(
+            [
+                Feedback(view_name=view_name, satisfied=False, session='session')
+                for view_name in self.view_names
+            ]
+        )
+
+        self.assertEquals(
+            sorted(FeedbackView.objects.values_list('view_name', flat=True)),
+            self.view_names,
+        )
+        self.assertEquals(
+            Feedback.objects.filter(view__view_name=self.view_names[0]).count(), 3
+        )
+        self.assertEquals(
+            Feedback.objects.exclude(view__view_name__in=self.view_names[:1]).count(),
+            1,
+        )
+
+        feedback = Feedback.objects.select_related('view').filter(
+            view__view_name=self.view_names[1]
+        )
+        with self.assertNumQueries(1):
+            self.assertEquals(feedback[0].view_name, self.view_names[1])
+
+    def test_views_are_cached_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_feedback(self.view_names[0])
+
+        # Only the Feedback, its rollup and session sketch are written, without looking up the view
+        with self.assertNumQueries(3):
+            feedback = self.create_feedback(self.view_names[0])
+
+        feedback = Feedback.objects.get(pk=feedback.pk)
+        with self.assertNumQueries(0):
+            self.assertEquals(feedback.view_name, self.view_names[0])
+
+    def test_views_are_not_cached_before_commit(self):
+        self.create_feedback(self.view_names[0])
+        with self.assertNumQueries(4):
+            self.create_feedback(self.view_names[0])
+
+    def test_data_migration(self):
+        migration = importlib.import_module(
+            'thumber.migrations.0008_feedback_view_data'
+        )
+
+        view_args = migration.parse_view_args("(('2024',), {'slug': 'news'})")
+        self.assertEquals(view_args, {'args': ['2024'], 'kwargs': {'slug': 'news'}})
+        self.assertEquals(
+            migration.format_view_args(view_args), "(('2024',), {'slug': 'news'})"
+        )
+
+        # Anything else is kept as it was
+        self.assertEquals(migration.parse_view_args('utm_source=x'), 'utm_source=x')
+        self.assertEquals(migration.format_view_args('utm_source=x'), 'utm_source=x')
+        self.assertIsNone(migration.parse_view_args(None))
+
+
+class ThumberViewMigrationTests(TransactionTestCase):
+    before = [('thumber', '0007_feedbackview')]
+    after = [('thumber', '0008_feedback_view_data')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes('thumber'))
+
+    def test_migration_forwards_and_backwards(self):
+        apps = self.migrate(self.before)
+        OldFeedback = apps.get_model('thumber', 'Feedback')
+        for ind in range(5):
+            OldFeedback.objects.create(
+                satisfied=True,
+                url='http://example.com/',
+                view_name='app:view' if ind % 2 else 'app:other',
+                view_args="(('2024',), {'slug': 'news'})" if ind else 'unparseable',
+                session='session',
+            )
+
+        # The view names are found with a DISTINCT over the names alone, not over each Feedback's created time too
+        migration = importlib.import_module(
+            'thumber.migrations.0008_feedback_view_data'
+        )
+        with mock.patch.object(migration, 'BATCH_SIZE', 1):
+            with CaptureQueriesContext(connection) as queries:
+                apps = self.migrate(self.after)
+        distinct = [query['sql'] for query in queries if 'DISTINCT' in query['sql']]
+        self.assertTrue(distinct)
+        self.assertTrue(all('created' not in sql for sql in distinct))
+
+        Feedback = apps.get_model('thumber', 'Feedback')
+        FeedbackView = apps.get_model('thumber', 'FeedbackView')
+        self.assertEquals(
+            sorted(FeedbackView.objects.values_list('view_name', flat=True)),
+            ['app:other', 'app:view'],
+        )
+        migrated = Feedback.objects.order_by('pk')
+        self.assertEquals(
+            [feedback.view.view_name for feedback in migrated],
+            ['app:other', 'app:view', 'app:other', 'app:view', 'app:other'],
+        )
+        self.assertEquals(migrated[0].view_arguments, 'unparseable')
+        self.assertEquals(
+            migrated[1].view_arguments, {'args': ['2024'], 'kwargs': {'slug': 'news'}}
+        )
+
+        apps = self.migrate(self.before)
+        restored = apps.get_model('thumber', 'Feedback').objects.order_by('pk')
+        self.assertEquals(
+            [(feedback.view_name, feedback.view_args) for feedback in restored][:2],
+            [
+                ('app:other', 'unparseable'),
+                ('app:view', "(('2024',), {'slug': 'news'})"),
+            ],
+        )
+
+
+@override_settings(THUMBER_SUBMIT_ENDPOINT=True)
+class ThumberSubmitEndpointTests(TestCase):
+    view_name = 'thumber_tests:kwargs_example'
+    kwargs = {'slug': 'news'}
+
+    def setUp(self):
+        self.path = reverse(self.view_name, kwargs=self.kwargs)
+        self.submit_path = reverse('thumber:submit')
+        response = self.client.get(self.path)
+        self.token = response.context['thumber_widget'].initial['thumber_view']
+
+    def test_form_posts_to_endpoint(self):
+        response = self.client.get(self.path)
+        self.assertContains(response, 'action="{0}"'.format(self.submit_path))
+        self.assertContains(response, 'name="thumber_view"')
+
+        with override_settings(THUMBER_SUBMIT_ENDPOINT=False):
+            response = self.client.get(self.path)
+        self.assertContains(response, 'action="{0}"'.format(self.path))
+        self.assertIsNone(
+            response.context['thumber_widget'].initial.get('thumber_view')
+        )
+
+    def test_ajax_feedback_and_comment(self):
+        data = {
+            'satisfied': 'False',
+            'thumber_token': 'ajax',
+            'thumber_view': self.token,
+        }
+        # Posted from another page, which the feedback isn't recorded against
+        response = self.client.post(
+            self.submit_path, data, HTTP_REFERER='http://testserver/example'
+        )
+        self.assertEquals(response.status_code, 200)
+
+        feedback = Feedback.objects.get(pk=response.json()['id'])
+        self.assertEquals(feedback.view_name, self.view_name)
+        self.assertEquals(feedback.view_args, {'args': [], 'kwargs': self.kwargs})
+        self.assertEquals(feedback.url, 'http://testserver{0}'.format(self.path))
+
+        data.update(id=feedback.pk, comment='A comment')
+        response = self.client.post(self.submit_path, data)
+        self.assertEquals(response.json(), {'success': True, 'id': str(feedback.pk)})
+        self.assertEquals(Feedback.objects.get().comment, 'A comment')
+
+    def test_sync_feedback_redirects_to_page(self):
+        data = {
+            'satisfied': 'True',
+            'thumber_token': 'sync',
+            'thumber_view': self.token,
+        }
+        response = self.client.post(self.submit_path, data)
+        self.assertRedirects(
+            response,
+            'http://testserver{0}?thumber=thanks'.format(self.path),
+            status_code=303,
+        )
+        self.assertEquals(Feedback.objects.get().view_name, self.view_name)
+
+        response = self.client.get(response['Location'])
+        self.assertContains(response, 'Thank you for your feedback')
+        self.assertNotContains(response, 'thumber-form')
+
+    def test_invalid_view_token(self):
+        for token in ('', self.token[:-1], 'not a token'):
+            data = {'satisfied': 'True', 'thumber_token': 'ajax', 'thumber_view': token}
+            response = self.client.post(self.submit_path, data)
+            self.assertEquals(response.status_code, 400)
+        self.assertFalse(Feedback.objects.exists())
+
+        self.assertEquals(self.client.get(self.submit_path).status_code, 405)
+
+    def test_no_session(self):
+        """A post from a visitor without a session (in session mode) can't be identified, so it's rejected"""
+        self.client.cookies.clear()
+        data = {
+            'satisfied': 'True',
+            'thumber_token': 'ajax',
+            'thumber_view': self.token,
+        }
+        response = self.client.post(self.submit_path, data)
+        self.assertEquals(response.status_code, 400)
+        self.assertEquals(response.json(), {'success': False})
+
+        data.update(id='1', comment='A comment')
+        self.assertEquals(self.client.post(self.submit_path, data).status_code, 400)
+        self.assertFalse(Feedback.objects.exists())
+
+
+class ThumberCompiledWordingTests(TestCase):
+    def test_fixed_wording_is_compiled(self):
+        """Wording that's the same for every request is set on the decorated class, along with the form options"""
+        self.assertEquals(
+            vars(ExampleOverrideTemplateView)['satisfied_wording'],
+            'Did you find what you were looking for?',
+        )
+        self.assertEquals(
+            vars(ExampleOverrideTemplateView)['yes_wording'], 'Yes, thanks'
+        )
+        self.assertEquals(
+            dict(ExampleOverrideTemplateView._thumber_options)['satisfied_wording'],
+            'Did you find what you were looking for?',
+        )
+
+        # While the submit wording comes from a method, so is looked up per request
+        view = ExampleOverrideTemplateView()
+        self.assertEquals(view.submit_wording, 'Send feedback!')
+
+    def test_dynamic_form_options(self):
+        @thumber_feedback
+        class DynamicView(TemplateView):
+            template_name = 'example.html'
+
+            @property
+            def no_wording(self):
+                return 'No, {0}'.format(self.request.GET['name'])
+
+        self.assertIsNone(DynamicView._thumber_options)
+
+        view = DynamicView()
+        view.request = RequestFactory().get('/', {'name': 'thanks'})
+        options = dict(view._get_thumber_options())
+        self.assertEquals(options['no_wording'], 'No, thanks')
+        self.assertEquals(options['yes_wording'], 'Yes, thanks')
+
+    def test_subclasses_are_compiled(self):
+        class FixedView(ExampleOverrideTemplateView):
+            yes_wording = 'Yes'
+
+        class DynamicView(ExampleOverrideTemplateView):
+            def get_satisfied_wording(self):
+                return 'Any good?'
+
+        self.assertEquals(dict(FixedView._thumber_options)['yes_wording'], 'Yes')
+        self.assertEquals(
+            dict(FixedView._thumber_options)['satisfied_wording'],
+            'Did you find what you were looking for?',
+        )
+        self.assertIsNone(DynamicView._thumber_options)
+        self.assertEquals(DynamicView().satisfied_wording, 'Any good?')
+        self.assertEquals(DynamicView().submit_wording, 'Send feedback!')
+
+    def test_form_class_is_configured_once(self):
+        options = ExampleOverrideTemplateView._thumber_options
+        form_class = get_form_class(options)
+        self.assertIs(get_form_class(options), form_class)
+        self.assertEquals(
+            form_class().fields['satisfied'].label,
+            'Did you find what you were looking for?',
+        )
+
+        response = self.client.get(reverse('thumber_tests:override_template_example'))
+        self.assertIsInstance(response.context['thumber_form'], form_class)
+
+
+class ThumberDatabaseRoutingTests(TestCase):
+    databases = {'default', 'feedback'}
+    view_name = 'thumber_tests:example'
+
+    def create_feedback(self, using, satisfied):
+        return Feedback.objects.using(using).create(
+            view_name=self.view_name, satisfied=satisfied, session='session'
+        )
+
+    @override_settings(THUMBER_DATABASE='feedback')
+    def test_feedback_is_written_to_thumber_database(self):
+        path = reverse(self.view_name)
+        self.client.get(path)
+        data = {'satisfied': 'False', 'thumber_token': 'ajax'}
+        response = self.client.post(path, data)
+        data.update(id=response.json()['id'], comment='A comment')
+        self.client.post(path, data)
+
+        self.assertFalse(Feedback.objects.using('default').exists())
+        self.assertFalse(FeedbackDailyRollup.objects.using('default').exists())
+        feedback = Feedback.objects.using('feedback').get()
+        self.assertEquals(feedback.comment, 'A comment')
+        rollup = FeedbackDailyRollup.objects.using('feedback').get()
+        self.assertEquals((rollup.no_count, rollup.comment_count), (1, 1))
+
+        # Reads are routed to the same database
+        self.assertEquals(Feedback.objects.get(), feedback)
+
+    @override_settings(THUMBER_READ_DATABASE='feedback')
+    def test_analytics_are_read_from_read_database(self):
+        self.create_feedback('default', True)
+        self.create_feedback('feedback', False)
+        self.create_feedback('feedback', False)
+
+        for averages in (
+            Feedback.objects.average_for_views(),
+            Feedback.objects.filter(satisfied=False).average_for_views(),
+            Feedback.objects.worst_views(),
+        ):
+            self.assertEquals(averages[0]['count'], 2)
+            self.assertEquals(averages[0]['average'], 0)
+        self.assertEquals(len(Feedback.objects.satisfaction_by_period('hour')), 1)
+
+        # Unless the queryset has a database of its own
+        averages = Feedback.objects.using('default').average_for_views()
+        self.assertEquals(averages[0]['count'], 1)
+
+        # Everything else is read from the database thumber is routed to
+        self.assertEquals(Feedback.objects.count(), 1)
+
+        stdout = StringIO()
+        call_command(
+            'thumber_export', format='ndjson', stdout=stdout, stderr=StringIO()
+        )
+        self.assertEquals(len(stdout.getvalue().splitlines()), 2)
+
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        response = self.client.get('/admin/thumber/feedback/')
+        self.assertEquals(len(response.context['cl'].result_list), 2)
+
+    def test_migrations(self):
+        thumber_router = ThumberRouter()
+        self.assertIsNone(thumber_router.allow_migrate('default', 'thumber'))
+        with self.settings(THUMBER_DATABASE='feedback'):
+            self.assertFalse(thumber_router.allow_migrate('default', 'thumber'))
+            self.assertTrue(thumber_router.allow_migrate('feedback', 'thumber'))
+            self.assertIsNone(thumber_router.allow_migrate('feedback', 'auth'))
+
+
+class ThumberSearchTests(FeedbackClientMixin, TestCase):
+    def give_feedback(self, comment):
+        self.visit()
+        pk = self.post_feedback(satisfied='False').json()['id']
+        self.post_feedback(id=pk, comment=comment)
+        return Feedback.objects.get(pk=pk)
+
+    def search(self, query):
+        return list(Feedback.objects.search(query))
+
+    def test_comments_are_searchable(self):
+        """Comments added through the view are indexed as they are given"""
+        broken = self.give_feedback('The link to the form is broken')
+        slow = self.give_feedback('The page was very slow to load')
+
+        self.assertEquals(self.search('broken'), [broken])
+        self.assertEquals(self.search('Broken  LINK'), [broken])
+        self.assertEquals(self.search('the'), [slow, broken])
+        self.assertEquals(self.search('broken slow'), [])
+        self.assertEquals(self.search('brok'), [])
+        self.assertEquals(self.search('"OR broken*'), [])
+        self.assertEquals(self.search(''), [])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.search('broken')
+        self.assertIn('thumber_feedback_fts', queries[-1]['sql'])
+
+    def test_index_is_kept_in_sync(self):
+        feedback = self.give_feedback('The link is broken')
+        Feedback.objects.filter(pk=feedback.pk).set_comment('Fixed now')
+        self.assertEquals(self.search('broken'), [])
+        self.assertEquals(self.search('fixed'), [feedback])
+
+        Feedback.objects.all().delete()
+        self.assertEquals(self.search('fixed'), [])
+
+    def test_search_without_index(self):
+        feedback = self.give_feedback('The link is broken')
+        with mock.patch('thumber.search._has_fts_table', return_value=False):
+            self.assertEquals(self.search('BROKEN link'), [feedback])
+            self.assertEquals(self.search('broken form'), [])
+
+    def test_admin_search(self):
+        broken = self.give_feedback('The link is broken')
+        self.give_feedback('Too slow')
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+
+        response = self.client.get('/admin/thumber/feedback/', {'q': 'broken'})
+        self.assertEquals(list(response.context['cl'].result_list), [broken])
+        response = self.client.get('/admin/thumber/feedback/', {'q': ' '})
+        self.assertEquals(len(response.context['cl'].result_list), 2)
+
+
+class ThumberSessionSketchTests(TestCase):
+    view_names = ['thumber_tests:example', 'thumber_tests:example_form']
+
+    def create_feedback(self, view_name, sessions, days_ago=0):
+        created = timezone.now() - datetime.timedelta(days=days_ago)
+        feedback = Feedback.objects.bulk_create(
+            (
+                Feedback(
+                    satisfied=True,
+                    url='http://example.com/',
+                    view_name=view_name,
+                    session=session,
+                    created=created,
+                )
+                for session in sessions
+            ),
+            keep_counts=True,
+        )
+        # The creation time is set when the Feedback is saved, so it's moved afterwards, before it's recorded
+        Feedback.objects.filter(pk__in=[f.pk for f in feedback]).update(
+            created=created, keep_counts=True
+        )
+        for f in feedback:
+            f.created = created
+        FeedbackSessionSketch.objects.record(feedback)
+
+    def assert_close(self, estimate, exact):
+        # The standard error of the estimate is about 3%
+        self.assertLess(abs(estimate - exact), exact * 0.1)
+
+    def test_sketches_kept_up_to_date(self):
+        for session in ['a', 'b', 'a']:
+            Feedback.objects.create(
+                satisfied=True,
+                url='http://example.com/',
+                view_name=self.view_names[0],
+                session=session,
+            )
+        feedback = Feedback.objects.create(
+            satisfied=False,
+            url='http://example.com/',
+            view_name=self.view_names[1],
+            session='a',
+        )
+        feedback.comment = 'test comment'
+        feedback.save()
+
+        self.assertEquals(
+            list(Feedback.objects.distinct_sessions()),
+            [
+                {'view_name': self.view_names[0], 'sessions': 2},
+                {'view_name': self.view_names[1], 'sessions': 1},
+            ],
+        )
+        self.assertEquals(FeedbackSessionSketch.objects.total_distinct_sessions(), 2)
+
+    def test_estimates_merged_over_date_ranges(self):
+        sessions = ['session-{0}'.format(ind) for ind in range(3000)]
+        self.create_feedback(self.view_names[0], sessions[:2000], days_ago=1)
+        self.create_feedback(self.view_names[0], sessions[1000:], days_ago=0)
+        self.create_feedback(self.view_names[1], sessions[:500], days_ago=0)
+
+        today = datetime.date.today()
+        estimates = Feedback.objects.distinct_sessions()
+        self.assert_close(estimates[0]['sessions'], 3000)
+        self.assert_close(estimates[1]['sessions'], 500)
+
+        estimates = Feedback.objects.distinct_sessions(since=today)
+        self.assert_close(estimates[0]['sessions'], 2000)
+        estimates = Feedback.objects.distinct_sessions(
+            until=today - datetime.timedelta(days=1)
+        )
+        self.assertEquals(len(estimates), 1)
+        self.assert_close(estimates[0]['sessions'], 2000)
+
+        sketches = FeedbackSessionSketch.objects
+        self.assert_close(sketches.total_distinct_sessions(), 3000)
+        self.assert_close(sketches.total_distinct_sessions(since=today), 2500)
+
+    def test_filtered_queryset_counts_exactly(self):
+        self.create_feedback(self.view_names[0], ['a', 'b', 'a', 'c'])
+        self.create_feedback(self.view_names[1], ['a'], days_ago=2)
+
+        queryset = Feedback.objects.filter(satisfied=True)
+        with self.assertNumQueries(1):
+            counts = list(queryset.distinct_sessions())
+        self.assertEquals(
+            counts,
+            [
+                {'view_name': self.view_names[0], 'sessions': 3},
+                {'view_name': self.view_names[1], 'sessions': 1},
+            ],
+        )
+        counts = queryset.distinct_sessions(since=datetime.date.today())
+        self.assertEquals(len(counts), 1)
+
+    def test_rebuild_and_prune(self):
+        sessions = ['session-{0}'.format(ind) for ind in range(100)]
+        self.create_feedback(self.view_names[0], sessions, days_ago=40)
+        self.create_feedback(self.view_names[0], sessions[:10])
+        estimates = list(Feedback.objects.distinct_sessions())
+
+        FeedbackSessionSketch.objects.all().delete()
+        call_command('thumber_rebuild_rollups', stdout=StringIO())
+        self.assertEquals(list(Feedback.objects.distinct_sessions()), estimates)
+
+        call_command(
+            'thumber_prune', days=30, discard_counts=True, sleep=0, stdout=StringIO()
+        )
+        self.assertEquals(
+            list(Feedback.objects.distinct_sessions()),
+            [{'view_name': self.view_names[0], 'sessions': 10}],
+        )
+
+
+class ThumberSpoolTests(FeedbackClientMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool_path = os.path.join(directory.name, 'spool.jsonl')
+        spool_settings = override_settings(THUMBER_SPOOL_PATH=self.spool_path)
+        spool_settings.enable()
+        self.addCleanup(spool_settings.disable)
+
+        self.client.get(self.path)
+
+    def database_unavailable(self, *methods):
+        unavailable = mock.Mock(side_effect=OperationalError('unavailable'))
+        return mock.patch.multiple(
+            'thumber.models.FeedbackQuerySet',
+            **{method: unavailable for method in methods}
+        )
+
+    def replay(self, **options):
+        stdout = StringIO()
+        call_command('thumber_replay', stdout=stdout, stderr=StringIO(), **options)
+        return stdout.getvalue()
+
+    def test_database_errors_without_spool(self):
+        with self.database_unavailable('save_once'):
+            with self.assertRaises(OperationalError):
+                self.post_feedback(satisfied='True')
+
+    @override_settings(THUMBER_SPOOL_MODE='fallback')
+    def test_spooled_when_database_unavailable(self):
+        failures = []
+
+        def on_failed(sender, stage, exception, **kwargs):
+            failures.append((stage, exception))
+
+        feedback_failed.connect(on_failed)
+        self.addCleanup(feedback_failed.disconnect, on_failed)
+
+        with self.database_unavailable('save_once', 'set_comment'):
+            reference = self.post_feedback(satisfied='False').json()['id']
+            response = self.post_feedback(id=reference, comment='test comment')
+        self.assertEquals(response.json(), {'success': True, 'id': reference})
+        self.assertEquals([stage for stage, _ in failures], ['database', 'database'])
+        self.assertFalse(Feedback.objects.exists())
+
+        self.assertIn('Replayed 1 Feedback and 1 comments', self.replay())
+        feedback = Feedback.objects.get()
+        self.assertEquals(feedback.reference, reference)
+        self.assertEquals(feedback.view_name, self.view_name)
+        self.assertEquals(feedback.comment, 'test comment')
+        rollup = FeedbackDailyRollup.objects.get()
+        self.assertEquals((rollup.no_count, rollup.comment_count), (1, 1))
+        self.assertEquals(feedback_spool.segments(), [])
+
+        # A comment on spooled Feedback is accepted, and written once the Feedback has been replayed
+        with self.database_unavailable('save_once'):
+            reference = self.post_feedback(satisfied='True').json()['id']
+        self.post_feedback(id=reference, comment='late comment')
+        self.assertIn('Replayed 1 Feedback and 1 comments', self.replay())
+        self.assertEquals(
+            Feedback.objects.get(reference=reference).comment, 'late comment'
+        )
+
+    @override_settings(THUMBER_SPOOL_MODE='always')
+    def test_always_spooled(self):
+        with self.assertNumQueries(0):
+            reference = self.post_feedback(satisfied='False').json()['id']
+            self.post_feedback(id=reference, comment='test comment')
+        self.assertFalse(Feedback.objects.exists())
+
+        self.replay()
+        feedback = Feedback.objects.get()
+        self.assertEquals(
+            (feedback.reference, feedback.comment), (reference, 'test comment')
+        )
+
+    @override_settings(THUMBER_SPOOL_MODE='always', THUMBER_SPOOL_MAX_BYTES=1)
+    def test_replay_is_idempotent(self):
+        references = [
+            self.post_feedback(satisfied='True').json()['id'] for _ in range(3)
+        ]
+        # Each record fills the spool file, so is rotated into a segment of its own
+        segments = feedback_spool.segments()
+        self.assertEquals(len(segments), 3)
+
+        # The Feedback keeps the time it was given
+        Feedback.objects.create(
+            satisfied=True,
+            url='http://example.com/',
+            view_name=self.view_name,
+            session='session',
+            reference=references[0],
+        )
+        given = datetime.datetime.now() - datetime.timedelta(days=3)
+        with mock.patch('django.utils.timezone.now', return_value=given):
+            self.post_feedback(satisfied='True')
+
+        with open(segments[1], 'ab') as segment:
+            segment.write(b'{"type": "feedback", "refer')
+
+        self.assertIn(
+            'Replayed 3 Feedback and 0 comments from 4 spool segments',
+            self.replay(keep=True),
+        )
+        self.assertIn(
+            'Replayed 0 Feedback and 0 comments from 4 spool segments', self.replay()
+        )
+        self.assertEquals(Feedback.objects.count(), 4)
+        self.assertEquals(feedback_spool.segments(), [])
+        self.assertEquals(
+            Feedback.objects.filter(created__date=given.date()).count(), 1
+        )
+        self.assertEquals(
+            list(FeedbackDailyRollup.objects.values_list('day', 'yes_count')),
+            [(datetime.date.today(), 3), (given.date(), 1)],
+        )
+
+    @override_settings(THUMBER_SPOOL_MODE='always')
+    def test_incomplete_records_are_skipped(self):
+        self.post_feedback(satisfied='True')
+        with open(self.spool_path, 'ab') as spool_file:
+            spool_file.write(b'{"type": "feedback", "refer')
+        self.post_feedback(satisfied='False')
+
+        feedback_spool.rotate()
+        records, skipped = read_segment(feedback_spool.segments()[0])
+        self.assertEquals([record['satisfied'] for record in records], [True, False])
+        self.assertEquals(skipped, 1)
+
+    def test_spool_path_required(self):
+        with override_settings(THUMBER_SPOOL_MODE='always', THUMBER_SPOOL_PATH=None):
+            with self.assertRaises(ImproperlyConfigured):
+                self.post_feedback(satisfied='True')
+        with override_settings(THUMBER_SPOOL_MODE='unknown'):
+            with self.assertRaises(ImproperlyConfigured):
+                self.post_feedback(satisfied='True')
+        with self.assertRaises(CommandError):
+            with override_settings(THUMBER_SPOOL_PATH=None):
+                self.replay()
+
+    @override_settings(THUMBER_SPOOL_MODE='always')
+    async def test_async_view_spooled(self):
+        path = reverse('thumber_tests:async_example')
+        await self.async_client.get(path)
+        data = {'satisfied': 'False', 'thumber_token': 'ajax'}
+        reference = (await self.async_client.post(path, data)).json()['id']
+        data = {'id': reference, 'comment': 'test comment', 'thumber_token': 'ajax'}
+        await self.async_client.post(path, data)
+
+        records, _ = read_segment(self.spool_path)
+        self.assertEquals(
+            [(record['type'], record.get('reference')) for record in records],
+            [('feedback', reference), ('comment', None)],
+        )
+        self.assertEquals(records[1]['id'], reference)
+
+
+@override_settings(THUMBER_ONE_VOTE_PER_VIEW=True)
+class ThumberOneVoteTests(FeedbackClientMixin, TestCase):
+    view_names = ['thumber_tests:example', 'thumber_tests:example_form']
+
+    def setUp(self):
+        super().setUp()
+        self.client.get(self.path)
+
+    def post(self, view_name, **data):
+        return self.post_feedback(view_name, **data).json()['id']
+
+    def assert_rollups_match_feedback(self):
+        from_feedback = Feedback.objects.filter(view__view_name__in=self.view_names)
+        self.assertEquals(
+            list(Feedback.objects.average_for_views()),
+            list(from_feedback.average_for_views()),
+        )
+
+    def test_revote_replaces_vote(self):
+        pk = self.post(self.view_names[0], satisfied='False')
+        self.post(self.view_names[0], id=pk, comment='test comment')
+        created = Feedback.objects.get().created
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEquals(self.post(self.view_names[0], satisfied='True'), pk)
+        writes = [
+            query['sql']
+            for query in queries
+            if query['sql'].startswith(
+                ('INSERT INTO "thumber_feedback"', 'UPDATE "thumber_feedback"')
+            )
+        ]
+        self.assertEquals(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0])
+
+        feedback = Feedback.objects.get()
+        self.assertEquals((feedback.satisfied, feedback.comment), (True, ''))
+        self.assertEquals(feedback.created, created)
+        rollup = FeedbackDailyRollup.objects.get()
+        self.assertEquals(
+            (rollup.yes_count, rollup.no_count, rollup.comment_count), (1, 0, 0)
+        )
+
+    def test_revote_statements(self):
+        """A revote is saved with a locking read, the upsert, and the rollup and session sketch writes"""
+        self.post(self.view_names[0], satisfied='False')
+        earlier = Feedback.objects.select_related('view').get()
+        feedback = Feedback(
+            view=earlier.view,
+            satisfied=True,
+            url='http://example.com/',
+            session=earlier.session,
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEquals(Feedback.objects.save_vote(feedback), earlier.pk)
+        statements = [
+            query['sql'].split()[0]
+            for query in queries
+            if 'SAVEPOINT' not in query['sql']
+        ]
+        # SQLite has no SELECT ... FOR UPDATE, the whole database is locked for the write instead
+        self.assertEquals(statements, ['SELECT', 'INSERT', 'UPDATE', 'UPDATE'])
+
+    def test_one_vote_per_session_per_view(self):
+        self.post(self.view_names[0], satisfied='True')
+        self.post(self.view_names[1], satisfied='False')
+        self.post(self.view_names[0], satisfied='False')
+
+        self.client.cookies.clear()
+        self.client.get(reverse(self.view_names[0]))
+        self.post(self.view_names[0], satisfied='True')
+
+        self.assertEquals(Feedback.objects.count(), 3)
+        self.assert_rollups_match_feedback()
+        average_feedback = Feedback.objects.average_for_views()
+        self.assertEquals(average_feedback[0]['count'], 2)
+        self.assertEquals(average_feedback[0]['average'], 0.5)
+
+        # Feedback saved without the mode isn't limited
+        with override_settings(THUMBER_ONE_VOTE_PER_VIEW=False):
+            self.post(self.view_names[0], satisfied='True')
+        self.assertEquals(Feedback.objects.count(), 4)
+
+    @override_settings(THUMBER_WRITE_MODE='buffered')
+    def test_buffered_votes(self):
+        self.post(self.view_names[0], satisfied='True')
+        self.post(self.view_names[0], satisfied='False')
+        self.post(self.view_names[1], satisfied='True')
+        feedback_buffer.flush()
+        self.post(self.view_names[1], satisfied='False')
+        feedback_buffer.flush()
+
+        self.assertEquals(
+            sorted(Feedback.objects.values_list('view__view_name', 'satisfied')),
+            [(self.view_names[0], False), (self.view_names[1], False)],
+        )
+        self.assert_rollups_match_feedback()
+
+    @override_settings(THUMBER_SPOOL_MODE='always')
+    def test_replayed_votes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(THUMBER_SPOOL_PATH=os.path.join(directory, 'spool')):
+                self.post(self.view_names[0], satisfied='False')
+                self.post(self.view_names[0], satisfied='True')
+                call_command('thumber_replay', keep=True, stdout=StringIO())
+                self.assertEquals(Feedback.objects.get().satisfied, True)
+
+                # Replaying again doesn't undo votes given since
+                with override_settings(THUMBER_SPOOL_MODE=None):
+                    self.post(self.view_names[0], satisfied='False')
+                call_command('thumber_replay', stdout=StringIO())
+
+        self.assertEquals(Feedback.objects.get().satisfied, False)
+        self.assert_rollups_match_feedback()
@@ -23,6 +23,13 @@ urlpatterns = [
         views.KwargsExampleView.as_view(),
         name='kwargs_example',
     ),
+    re_path(
+        r'^extra_kwargs_example$',
+        views.ExtraKwargsExampleView.as_view(),
+        {'section': views.Section('news')},
+        name='extra_kwargs_example',
+    ),
+    re_path(r'^async_example$', views.AsyncExampleView.as_view(), name='async_example'),
     re_path(r'^form$', views.ExampleFormView.as_view(), name='example_form'),
     re_path(
         r'^form_success$',
@@ -41,6 +41,23 @@ class KwargsExampleView(TemplateView):
         return super().get(request)
 
 
+class Section:
+    # A view argument that JSON can't represent
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+@thumber_feedback
+class ExtraKwargsExampleView(TemplateView):
+    template_name = 'example.html'
+
+    def get(self, request, **kwargs):
+        return super().get(request)
+
+
 @thumber_feedback
 class ExampleOverrideTemplateView(TemplateView):
     template_name = 'example.html'
@@ -64,3 +81,11 @@ class ExampleFormView(FormView):
 
 class ExampleFormSuccessView(TemplateView):
     template_name = 'example.html'
+
+
+@thumber_feedback
+class AsyncExampleView(TemplateView):
+    template_name = 'example.html'
+
+    async def get(self, request, *args, **kwargs):
+        return self.render_to_response(self.get_context_data(**kwargs))
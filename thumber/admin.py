@@ -1,11 +1,202 @@
+import datetime
+
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.db.models.functions import Substr
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.text import Truncator
+
+from .conf import get_setting
+from .export import start_of_day
+from .models import Feedback, FeedbackDailyRollup
+
+# The number of characters of each comment shown in the changelist
+COMMENT_PREVIEW_LENGTH = 100
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator that never counts more than THUMBER_ADMIN_COUNT_LIMIT rows, older Feedback is reached with the keyset
+    filter instead.  On PostgreSQL, an unfiltered changelist uses the planner's estimate of the table size to skip
+    counting when the table is larger than the limit.
+    """
+
+    @cached_property
+    def count(self):
+        limit = get_setting('THUMBER_ADMIN_COUNT_LIMIT')
+        queryset = self.object_list
+
+        if not queryset.query.where:
+            estimate = self._estimate_count(queryset)
+            if estimate is not None and estimate > limit:
+                return limit
+
+        return queryset[:limit].count()
+
+    def _estimate_count(self, queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
+
+
+class KeysetFilter(admin.SimpleListFilter):
+    """
+    Limits the changelist to Feedback older than a given (created, id) position, so that paging back through the
+    Feedback uses the created index rather than an ever growing OFFSET.  It's only displayed while it's being used.
+    """
+
+    title = 'position'
+    parameter_name = 'before'
+
+    def lookups(self, request, model_admin):
+        position = self.parse(self.value())
+        if position is None:
+            return []
+        return [(self.value(), 'Older than {0}'.format(position[0]))]
+
+    def queryset(self, request, queryset):
+        position = self.parse(self.value())
+        if position is None:
+            return queryset
+
+        created, pk = position
+        return queryset.filter(Q(created__lt=created) | Q(created=created, pk__lt=pk))
+
+    @staticmethod
+    def parse(value):
+        try:
+            created, pk = value.rsplit('|', 1)
+            created = parse_datetime(created)
+            pk = int(pk)
+        except (AttributeError, TypeError, ValueError):
+            return None
+        return None if created is None else (created, pk)
+
+    @staticmethod
+    def format(feedback):
+        return '{0}|{1}'.format(feedback.created.isoformat(), feedback.pk)
+
 
-from .models import Feedback
+class ViewNameFilter(admin.SimpleListFilter):
+    """
+    Filter on view name, with the choices taken from the (much smaller) daily rollups, rather than finding the
+    distinct view names in the Feedback table
+    """
+
+    title = 'view name'
+    parameter_name = 'view_name'
+
+    def lookups(self, request, model_admin):
+        view_names = (
+            FeedbackDailyRollup.objects.for_analytics()
+            .order_by('view_name')
+            .values_list('view_name', flat=True)
+            .distinct()
+        )
+        return [(view_name, view_name) for view_name in view_names]
+
+    def queryset(self, request, queryset):
+        if self.value() is None:
+            return queryset
+        return queryset.filter(view__view_name=self.value())
+
+
+class MonthFilter(admin.SimpleListFilter):
+    """
+    Filter on the month the Feedback was given, with the choices taken from the daily rollups, rather than the date
+    hierarchy's scans of the Feedback table for the dates that have Feedback
+    """
+
+    title = 'month'
+    parameter_name = 'month'
+
+    def lookups(self, request, model_admin):
+        months = (
+            FeedbackDailyRollup.objects.for_analytics()
+            .filter(Q(yes_count__gt=0) | Q(no_count__gt=0))
+            .dates('day', 'month', order='DESC')
+        )
+        return [(month.strftime('%Y-%m'), month.strftime('%B %Y')) for month in months]
+
+    def queryset(self, request, queryset):
+        month = self.parse(self.value())
+        if month is None:
+            return queryset
+
+        next_month = (month + datetime.timedelta(days=31)).replace(day=1)
+        return queryset.filter(
+            created__gte=start_of_day(month), created__lt=start_of_day(next_month)
+        )
+
+    @staticmethod
+    def parse(value):
+        try:
+            return datetime.datetime.strptime(value, '%Y-%m').date()
+        except (TypeError, ValueError):
+            return None
+
+
+class FeedbackChangeList(ChangeList):
+    def get_queryset(self, request, *args, **kwargs):
+        queryset = super().get_queryset(request, *args, **kwargs)
+        # Only load the listed columns, and just the start of each comment
+        return (
+            queryset.select_related('view')
+            .only('id', 'created', 'satisfied', 'view__view_name')
+            .annotate(comment_preview=Substr('comment', 1, COMMENT_PREVIEW_LENGTH + 1))
+        )
+
+    def get_results(self, request):
+        # The list is read from THUMBER_READ_DATABASE, though actions on the selected Feedback use the queryset as is
+        self.queryset = self.queryset.for_analytics()
+        super().get_results(request)
+        self.result_list = list(self.result_list)
+
+        # A full page means there may be older Feedback, which is reached with a keyset filter rather than an offset
+        self.older_url = None
+        if len(self.result_list) >= self.list_per_page:
+            position = KeysetFilter.format(self.result_list[-1])
+            self.older_url = self.get_query_string(
+                {KeysetFilter.parameter_name: position}, [PAGE_VAR]
+            )
 
 
 class FeedbackAdmin(admin.ModelAdmin):
-    list_display = ['created', 'satisfied', 'view_name', 'comment']
-    ordering = ['created']
+    list_display = ['created', 'satisfied', 'view_name', 'comment_preview']
+    list_filter = [KeysetFilter, 'satisfied', ViewNameFilter, MonthFilter]
+    # Shows the search box, see get_search_results
+    search_fields = ['comment']
+    search_help_text = 'Search the comments for feedback containing all of the words'
+    ordering = ['-created', '-id']
+    sortable_by = []
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_changelist(self, request, **kwargs):
+        return FeedbackChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        # Comments are searched with the full-text index, rather than the scans of `search_fields`
+        if not search_term.strip():
+            return queryset, False
+        return queryset.search(search_term), False
+
+    def comment_preview(self, feedback):
+        return Truncator(feedback.comment_preview or '').chars(COMMENT_PREVIEW_LENGTH)
+
+    comment_preview.short_description = 'comment'
 
 
 if not admin.site.is_registered(Feedback):
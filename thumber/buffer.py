@@ -0,0 +1,176 @@
+import atexit
+import threading
+import time
+
+from django.db import connections, router, transaction
+
+from .conf import get_setting
+from .models import Feedback
+
+# How many THUMBER_BUFFER_TIMEOUTs a queued comment waits for its Feedback to be written (by another process) before
+# it's dropped
+COMMENT_TIMEOUTS = 10
+
+
+class FeedbackBuffer:
+    """
+    An in-process queue of unsaved Feedback objects, which are written to the database with a single `bulk_create`
+    (and an update of the daily rollups and session sketches) once the queue reaches THUMBER_BUFFER_SIZE items, or the
+    oldest item has waited THUMBER_BUFFER_TIMEOUT seconds.  Anything still queued is flushed when the interpreter shuts
+    down.
+
+    Queued Feedback is keyed on its `reference`, since it has no primary key until it has been written.  Comments on
+    Feedback that another process has queued are queued too, keyed on the same reference, and set by each flush once
+    the Feedback has been written.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._comments = {}
+        self._timer = None
+        self._registered = False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, feedback):
+        with self._lock:
+            if feedback.reference in self._pending:
+                # The same submission has been repeated, so the queued Feedback is kept rather than replaced
+                return
+            self._pending[feedback.reference] = feedback
+            full = len(self._pending) >= get_setting('THUMBER_BUFFER_SIZE')
+            if not full:
+                self._queued()
+
+        if full:
+            self.flush()
+
+    def set_comment(self, reference, session, comment):
+        """
+        Set the comment on a queued Feedback object from the same session, returns False if the Feedback is not (or no
+        longer) queued, in which case it must be updated in the database instead.
+        """
+        with self._lock:
+            feedback = self._pending.get(reference)
+            if feedback is not None and feedback.session == session:
+                feedback.comment = comment
+                return True
+
+        # Wait for any flush in progress to complete, so the caller's update finds the written row
+        with self._flush_lock:
+            return False
+
+    def add_comment(self, reference, session, comment):
+        """
+        Queue a comment on Feedback that is neither queued in this process nor written yet, since it may be queued by
+        another process.  Each flush sets the comment once the Feedback has been written, until it has waited
+        COMMENT_TIMEOUTS * THUMBER_BUFFER_TIMEOUT seconds.
+        """
+        with self._lock:
+            self._comments[reference] = (session, comment, time.monotonic())
+            self._queued()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending = list(self._pending.values())
+                self._pending = {}
+                comments = self._comments
+                self._comments = {}
+                self._cancel_timer()
+
+            if pending:
+                try:
+                    using = router.db_for_write(Feedback)
+                    with transaction.atomic(using=using, savepoint=False):
+                        # Drop any repeated submissions of Feedback that was written by an earlier flush
+                        written = set(
+                            Feedback.objects.using(using)
+                            .filter(reference__in=[f.reference for f in pending])
+                            .values_list('reference', flat=True)
+                        )
+                        new = [f for f in pending if f.reference not in written]
+                        if get_setting('THUMBER_ONE_VOTE_PER_VIEW'):
+                            # Adjusts the rollups and sketches itself
+                            Feedback.objects.using(using).upsert_votes(new)
+                        else:
+                            # Adds the Feedback to the rollups and sketches
+                            Feedback.objects.using(using).bulk_create(new)
+                except Exception:
+                    # Put the Feedback back at the front of the queue, so nothing is lost if the database is
+                    # unavailable.  Its views may have been created in the rolled back transaction, so they're looked
+                    # up again
+                    for feedback in pending:
+                        feedback.view_name = feedback.view_name
+                    with self._lock:
+                        pending.extend(self._pending.values())
+                        self._pending = {
+                            feedback.reference: feedback for feedback in pending
+                        }
+                        if self._timer is None:
+                            self._start_timer()
+                    self._requeue_comments(comments)
+                    raise
+
+            self._set_comments(comments)
+
+        return len(pending)
+
+    def _set_comments(self, comments):
+        unset = {}
+        try:
+            using = router.db_for_write(Feedback)
+            expired = time.monotonic() - COMMENT_TIMEOUTS * get_setting(
+                'THUMBER_BUFFER_TIMEOUT'
+            )
+            for reference, (session, comment, queued) in comments.items():
+                feedback = Feedback.objects.using(using).filter(
+                    reference=reference, session=session
+                )
+                if not feedback.set_comment(comment) and queued > expired:
+                    unset[reference] = (session, comment, queued)
+        except Exception:
+            self._requeue_comments(comments)
+            raise
+        self._requeue_comments(unset)
+
+    def _requeue_comments(self, comments):
+        if not comments:
+            return
+        with self._lock:
+            # A comment queued since is newer, so it's kept
+            self._comments = dict(comments, **self._comments)
+            self._queued()
+
+    def _queued(self):
+        # Called with the lock held, once something has been queued, so that it's flushed
+        if self._timer is None:
+            self._start_timer()
+        if not self._registered:
+            atexit.register(self.flush)
+            self._registered = True
+
+    def _start_timer(self):
+        self._timer = threading.Timer(
+            get_setting('THUMBER_BUFFER_TIMEOUT'), self._flush_from_timer
+        )
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer runs in its own thread, so close the database connections it opened
+            connections.close_all()
+
+
+feedback_buffer = FeedbackBuffer()
@@ -0,0 +1,66 @@
+from django.conf import settings
+
+# Default values for all of thumber's optional settings, these can be overridden in the project's settings module
+DEFAULTS = {
+    # Either 'sync' to save each Feedback as it is submitted, or 'buffered' to queue new Feedback in-process and write
+    # it in batches
+    'THUMBER_WRITE_MODE': 'sync',
+    # The number of queued Feedback objects that triggers a flush when in buffered mode
+    'THUMBER_BUFFER_SIZE': 100,
+    # The maximum number of seconds queued Feedback is held before being flushed when in buffered mode
+    'THUMBER_BUFFER_TIMEOUT': 5,
+    # Either 'session' to identify visitors by their session, or 'signed' to identify them with a signed cookie and form
+    # token, which avoids a session save on every page view
+    'THUMBER_IDENTITY': 'session',
+    # The name, and lifetime in seconds, of the cookie used to identify visitors in signed identity mode
+    'THUMBER_IDENTITY_COOKIE_NAME': 'thumber_id',
+    'THUMBER_IDENTITY_COOKIE_AGE': 60 * 60 * 24 * 365,
+    # The maximum number of referer paths whose view names are remembered
+    'THUMBER_RESOLVE_CACHE_SIZE': 1024,
+    # The most Feedback the admin changelist will count, beyond which it's reached by following the "older" link
+    'THUMBER_ADMIN_COUNT_LIMIT': 10000,
+    # The cache, and number of seconds, that responses from the satisfaction statistics endpoint are cached for
+    'THUMBER_STATS_CACHE': 'default',
+    'THUMBER_STATS_CACHE_TIMEOUT': 60,
+    # Whether to count submissions and time the stages of handling them, in this process's metrics registry
+    'THUMBER_METRICS': False,
+    # The number of submissions to a view allowed from each visitor, and from each IP address, in any period of
+    # THUMBER_THROTTLE_WINDOW seconds.  None for no limit
+    'THUMBER_THROTTLE_VISITOR_LIMIT': None,
+    'THUMBER_THROTTLE_IP_LIMIT': None,
+    'THUMBER_THROTTLE_WINDOW': 60,
+    # The cache the submission counts are kept in, and the request.META key holding the client's IP address (e.g.
+    # 'HTTP_X_FORWARDED_FOR' behind a proxy)
+    'THUMBER_THROTTLE_CACHE': 'default',
+    'THUMBER_THROTTLE_IP_HEADER': 'REMOTE_ADDR',
+    # The number of trusted proxies that append to the IP header, the client's address is this many from its end
+    'THUMBER_THROTTLE_PROXY_COUNT': 1,
+    # The number of days Feedback is kept for by the thumber_prune command, if it's not given --days
+    'THUMBER_RETENTION_DAYS': None,
+    # Whether feedback forms are posted to thumber's own submission endpoint (the `thumber:submit` URL), rather than
+    # back to the page they're on
+    'THUMBER_SUBMIT_ENDPOINT': False,
+    # The database thumber's models are kept in, when thumber.routers.ThumberRouter is installed, and the database that
+    # analytic queries (the averages, statistics, exports and admin lists) are made against, e.g. a read replica.  None
+    # for the database chosen by the project's routers
+    'THUMBER_DATABASE': None,
+    'THUMBER_READ_DATABASE': None,
+    # Either 'fallback' to write submissions to a local spool file when the database can't be written to, or 'always'
+    # to only write them to the spool, for the thumber_replay command to write to the database.  None for no spool
+    'THUMBER_SPOOL_MODE': None,
+    # The spool file, the size in bytes at which it's rotated, and the most seconds between fsyncs of it (0 to fsync
+    # every submission, or None to leave writing it to disk to the operating system)
+    'THUMBER_SPOOL_PATH': None,
+    'THUMBER_SPOOL_MAX_BYTES': 64 * 1024 * 1024,
+    'THUMBER_SPOOL_FSYNC_INTERVAL': 0,
+    # Whether each session only has one vote on each view, with a new vote replacing the session's earlier one
+    'THUMBER_ONE_VOTE_PER_VIEW': False,
+}
+
+
+def get_setting(name):
+    """
+    Look up a thumber setting, falling back to the default value if the project hasn't defined it.  Settings are read
+    on every call (rather than at import) so that they can be changed in tests with `override_settings`
+    """
+    return getattr(settings, name, DEFAULTS[name])
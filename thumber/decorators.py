@@ -3,7 +3,7 @@ import types
 from django.core.exceptions import ImproperlyConfigured
 from django.views.generic import View
 
-from .views import ThumberView
+from .views import AsyncThumberView, ThumberView
 
 
 def thumber_feedback(view):
@@ -13,11 +13,17 @@ def thumber_feedback(view):
             'Only class-based views can be decorated with `thumber_feedback'
         )
 
+    # Views with async handlers get the async version of the ThumberView, since a view's handlers must either all be
+    # sync or all be async
+    thumber_view = (
+        AsyncThumberView if getattr(view, 'view_is_async', False) else ThumberView
+    )
+
     # Make a new class that inherits from the ThumberView, and the wrapped view class
     return type(
         'ThumberFeedbackView',
         (
-            ThumberView,
+            thumber_view,
             view,
         ),
         {},
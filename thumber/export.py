@@ -0,0 +1,95 @@
+import csv
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.utils import timezone
+
+# The Feedback fields that are exported, in the order they appear in CSV exports
+EXPORT_FIELDS = [
+    'id',
+    'reference',
+    'created',
+    'updated',
+    'satisfied',
+    'comment',
+    'url',
+    'view_name',
+    'view_args',
+    'session',
+]
+
+
+def today():
+    """
+    The current date, in the current time zone if time zones are in use
+    """
+    return timezone.localdate() if settings.USE_TZ else datetime.date.today()
+
+
+def start_of_day(date, tzinfo=None):
+    """
+    The (aware, if time zones are in use) datetime that the date starts at, in `tzinfo` or the current time zone
+    """
+    start = datetime.datetime.combine(date, datetime.time.min)
+    if settings.USE_TZ:
+        start = timezone.make_aware(start, tzinfo)
+    return start
+
+
+def export_values(queryset):
+    """
+    The Feedback queryset as dicts of the EXPORT_FIELDS, with the name of each Feedback's view
+    """
+    return queryset.annotate(view_name=F('view__view_name')).values(*EXPORT_FIELDS)
+
+
+def iter_chunks(queryset, chunk_size, after=None):
+    """
+    Yield lists of Feedback values (as dicts of the EXPORT_FIELDS) in the order they were last changed, then pk,
+    fetching each chunk with a keyset query (`(updated, pk) > the last row's`) so that memory use is constant, and no
+    query has to skip over rows already seen.  Given the (updated, pk) of the last row of an earlier export as `after`,
+    only Feedback that has been given, or changed (e.g. commented on), since is yielded.
+    """
+    queryset = export_values(queryset.order_by('updated', 'pk'))
+    while True:
+        chunk_queryset = queryset
+        if after is not None:
+            updated, pk = after
+            chunk_queryset = queryset.filter(
+                Q(updated__gt=updated) | Q(updated=updated, pk__gt=pk)
+            )
+        chunk = list(chunk_queryset[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        after = (chunk[-1]['updated'], chunk[-1]['id'])
+
+
+class CsvWriter:
+    def __init__(self, stream):
+        self.writer = csv.DictWriter(stream, fieldnames=EXPORT_FIELDS)
+        self.writer.writeheader()
+
+    def write(self, rows):
+        for row in rows:
+            if row['view_args'] is not None:
+                row['view_args'] = json.dumps(row['view_args'], cls=DjangoJSONEncoder)
+            self.writer.writerow(row)
+
+
+class NdjsonWriter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, rows):
+        for row in rows:
+            self.stream.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'ndjson': NdjsonWriter,
+}
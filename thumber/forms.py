@@ -1,7 +1,11 @@
+from functools import lru_cache
+
 from django import forms
 from django.urls import resolve
+from django.utils.html import format_html
+from django.utils.translation import get_language
 
-from .models import Feedback
+from .models import PERIODS, Feedback
 
 
 class ThumberForm(forms.ModelForm):
@@ -10,6 +14,11 @@ class ThumberForm(forms.ModelForm):
         fields = ['satisfied', 'comment']
 
     thumber_token = forms.CharField(initial='sync', widget=forms.HiddenInput())
+    thumber_identity = forms.CharField(required=False, widget=forms.HiddenInput())
+    thumber_reference = forms.CharField(
+        required=False, max_length=64, widget=forms.HiddenInput()
+    )
+    thumber_view = forms.CharField(required=False, widget=forms.HiddenInput())
     satisfied = forms.TypedChoiceField(
         coerce=lambda val: val == 'True',
         choices=((True, 'Yes'), (False, 'No')),
@@ -49,3 +58,103 @@ class ThumberForm(forms.ModelForm):
         if not true_first:
             choices = self.fields['satisfied'].choices
             self.fields['satisfied'].choices = (choices[1], choices[0])
+
+
+class CommentForm(forms.Form):
+    """
+    A comment on Feedback that has already been given, identified by the id (or reference) the frontend was given
+    """
+
+    id = forms.CharField(max_length=64)
+    comment = forms.CharField(required=False)
+
+    def clean_comment(self):
+        # The comment may be blank (which removes it), but it must be posted
+        if 'comment' not in self.data:
+            raise forms.ValidationError(
+                self.fields['comment'].error_messages['required'], code='required'
+            )
+        return self.cleaned_data['comment']
+
+
+# The ThumberForm's fields whose values change with each request, and so are left out of the cached widget
+PER_REQUEST_FIELDS = ('thumber_identity', 'thumber_reference', 'thumber_view')
+
+
+@lru_cache(maxsize=256)
+def get_form_class(options):
+    """
+    A ThumberForm with the view's wording options (as sorted (name, value) pairs) already applied to its fields, so that
+    they aren't applied again each time the form is built
+    """
+    form_class = type('ThumberForm', (ThumberForm,), {})
+    form_class.base_fields = ThumberForm(**dict(options)).fields
+    return form_class
+
+
+@lru_cache(maxsize=256)
+def _render_widget_fields(options, language):
+    # The language is part of the cache key, since the form is rendered in the active language
+    form = get_form_class(options)()
+    for name in PER_REQUEST_FIELDS:
+        del form.fields[name]
+    return form.as_p()
+
+
+def clear_widget_cache():
+    """
+    Forget the rendered widget fields
+    """
+    _render_widget_fields.cache_clear()
+
+
+class ThumberWidget:
+    """
+    The ThumberForm rendered as HTML.  The fields that are the same for every request are rendered once for each set of
+    options (the view's wording) and language, then cached, with the fields that change on each request appended.
+    """
+
+    def __init__(self, options, initial):
+        # The options are the view's wording, as sorted (name, value) pairs
+        self.options = options
+        self.initial = initial
+
+    def __str__(self):
+        html = _render_widget_fields(self.options, get_language())
+        for name in PER_REQUEST_FIELDS:
+            value = self.initial.get(name)
+            if value is None:
+                html += format_html(
+                    '<input type="hidden" name="{0}" id="id_{0}">', name
+                )
+            else:
+                html += format_html(
+                    '<input type="hidden" name="{0}" value="{1}" id="id_{0}">',
+                    name,
+                    value,
+                )
+        return html
+
+    def __html__(self):
+        return str(self)
+
+
+class StatsForm(forms.Form):
+    """
+    The query string options for the satisfaction statistics endpoint
+    """
+
+    period = forms.ChoiceField(
+        choices=[(period, period) for period in PERIODS], required=False
+    )
+    since = forms.DateField(required=False)
+    until = forms.DateField(required=False)
+    top = forms.IntegerField(min_value=0, max_value=100, required=False)
+    min_count = forms.IntegerField(min_value=1, required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        since, until = cleaned_data.get('since'), cleaned_data.get('until')
+        if since is not None and until is not None and since > until:
+            raise forms.ValidationError('since must not be after until')
+        return cleaned_data
@@ -0,0 +1,77 @@
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+
+from .conf import get_setting
+
+IDENTITY_SALT = 'thumber.identity'
+
+
+def get_identity_mode():
+    identity_mode = get_setting('THUMBER_IDENTITY')
+    if identity_mode not in ('session', 'signed'):
+        raise ImproperlyConfigured(
+            'THUMBER_IDENTITY must be either "session" or "signed"'
+        )
+    return identity_mode
+
+
+def new_identity():
+    return uuid.uuid4().hex
+
+
+def sign_identity(identity):
+    """
+    Sign the identity so it can be embedded in the feedback form
+    """
+    return signing.dumps(identity, salt=IDENTITY_SALT)
+
+
+def get_signed_identity(request):
+    """
+    Get the visitor's identity from the signed identity cookie, or failing that from the signed token posted with the
+    feedback form (e.g. when the browser doesn't send the cookie), returns None if neither is present (or valid).  Both
+    expire after THUMBER_IDENTITY_COOKIE_AGE seconds.
+    """
+    max_age = get_setting('THUMBER_IDENTITY_COOKIE_AGE')
+    identity = request.get_signed_cookie(
+        get_setting('THUMBER_IDENTITY_COOKIE_NAME'),
+        default=None,
+        salt=IDENTITY_SALT,
+        max_age=max_age,
+    )
+    if identity is not None:
+        return identity
+
+    token = request.POST.get('thumber_identity', None)
+    if token:
+        try:
+            return signing.loads(token, salt=IDENTITY_SALT, max_age=max_age)
+        except signing.BadSignature:
+            pass
+
+    return None
+
+
+def set_identity_cookie(response, identity):
+    response.set_signed_cookie(
+        get_setting('THUMBER_IDENTITY_COOKIE_NAME'),
+        identity,
+        salt=IDENTITY_SALT,
+        max_age=get_setting('THUMBER_IDENTITY_COOKIE_AGE'),
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite=settings.SESSION_COOKIE_SAMESITE,
+    )
+
+
+def get_identity(request):
+    """
+    The value stored as the Feedback's `session`, which identifies the visitor who gave the feedback, or None in session
+    mode if the visitor has no session cookie
+    """
+    if get_identity_mode() == 'signed':
+        return get_signed_identity(request) or new_identity()
+    return request.COOKIES.get(settings.SESSION_COOKIE_NAME)
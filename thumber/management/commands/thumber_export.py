@@ -0,0 +1,119 @@
+import datetime
+import json
+import os
+
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date, parse_datetime
+
+from thumber.export import WRITERS, iter_chunks, start_of_day
+from thumber.models import Feedback
+
+
+def date_argument(value):
+    date = parse_date(value)
+    if date is None:
+        raise ValueError('Not a date: {0}'.format(value))
+    return date
+
+
+def read_cursor(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as cursor_file:
+        cursor = json.load(cursor_file)
+    return parse_datetime(cursor['last_updated']), cursor['last_id']
+
+
+def write_cursor(path, last_row):
+    # Write to a temporary file and rename it, so the cursor is never left half written.  The full precision of the
+    # updated time is kept, so that the next export doesn't repeat (or skip) any Feedback
+    temp_path = '{0}.tmp'.format(path)
+    with open(temp_path, 'w') as cursor_file:
+        json.dump(
+            {
+                'last_updated': last_row['updated'].isoformat(),
+                'last_id': last_row['id'],
+            },
+            cursor_file,
+        )
+    os.replace(temp_path, path)
+
+
+class Command(BaseCommand):
+    help = (
+        'Export Feedback as CSV or newline delimited JSON, reading it in chunks so that memory use is constant '
+        'however much Feedback there is'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(WRITERS), default='csv')
+        parser.add_argument(
+            '--since',
+            type=date_argument,
+            help='Only export Feedback given on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--until',
+            type=date_argument,
+            help='Only export Feedback given on or before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--view-name',
+            action='append',
+            dest='view_names',
+            help='Only export Feedback for this view, can be given more than once',
+        )
+        parser.add_argument(
+            '--cursor',
+            help='A file holding when the last Feedback exported was changed, and its id.  Only Feedback given or '
+            'changed after it is exported, and the file is updated as the export progresses, so the next export '
+            'carries on where this one finished',
+        )
+        parser.add_argument(
+            '--output', help='The file to write the export to, defaults to stdout'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='The number of Feedback to read with each query',
+        )
+        parser.add_argument(
+            '--database',
+            default=None,
+            help='The database to export from, defaults to THUMBER_READ_DATABASE, or else the database Feedback is '
+            'read from',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Feedback.objects.db_manager(options['database']).for_analytics()
+        if options['since'] is not None:
+            queryset = queryset.filter(created__gte=start_of_day(options['since']))
+        if options['until'] is not None:
+            until = options['until'] + datetime.timedelta(days=1)
+            queryset = queryset.filter(created__lt=start_of_day(until))
+        if options['view_names']:
+            queryset = queryset.filter(view__view_name__in=options['view_names'])
+
+        cursor_path = options['cursor']
+        after = read_cursor(cursor_path) if cursor_path else None
+
+        if options['output']:
+            stream = open(options['output'], 'w', newline='')
+        else:
+            stream = self.stdout
+
+        exported = 0
+        try:
+            writer = WRITERS[options['format']](stream)
+            for chunk in iter_chunks(queryset, options['chunk_size'], after=after):
+                writer.write(chunk)
+                exported += len(chunk)
+                if cursor_path:
+                    stream.flush()
+                    write_cursor(cursor_path, chunk[-1])
+        finally:
+            if options['output']:
+                stream.close()
+
+        self.stderr.write('Exported {0} Feedback'.format(exported))
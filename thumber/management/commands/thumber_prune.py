@@ -0,0 +1,133 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.db.models import Max, Min
+
+from thumber.conf import get_setting
+from thumber.export import NdjsonWriter, export_values, start_of_day, today
+from thumber.models import Feedback, FeedbackSessionSketch
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete (and optionally archive) Feedback older than the retention period, in batches of consecutive ids so '
+        'that no transaction holds locks on, or logs, more than a batch of rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help='Delete Feedback given more than this many days ago, defaults to THUMBER_RETENTION_DAYS',
+        )
+        parser.add_argument(
+            '--archive',
+            help='A file to append the deleted Feedback to (as newline delimited JSON), before it is deleted',
+        )
+        parser.add_argument(
+            '--discard-counts',
+            action='store_true',
+            help='Also remove the deleted Feedback from the daily rollups, and the session sketches of the days it was '
+            'given.  By default they keep counting it, so historical averages survive pruning',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='The range of ids deleted in each batch',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='The number of seconds to pause between batches',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how much Feedback would be deleted, without deleting it',
+        )
+        parser.add_argument(
+            '--database',
+            default=None,
+            help='The database to prune, defaults to the database Feedback is written to',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = get_setting('THUMBER_RETENTION_DAYS')
+        if days is None or days < 0:
+            raise CommandError('Give --days, or set THUMBER_RETENTION_DAYS')
+
+        using = options['database'] or router.db_for_write(Feedback)
+        cutoff = start_of_day(today() - datetime.timedelta(days=days))
+        expired = Feedback.objects.using(using).filter(created__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(
+                'Would delete {0} Feedback given before {1}'.format(
+                    expired.count(), cutoff.date()
+                )
+            )
+            return
+
+        bounds = expired.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            self.stdout.write('No Feedback given before {0}'.format(cutoff.date()))
+            return
+
+        archive = None
+        if options['archive']:
+            archive = open(options['archive'], 'a')
+
+        deleted = 0
+        try:
+            writer = NdjsonWriter(archive) if archive else None
+            start = bounds['first']
+            while start <= bounds['last']:
+                batch = expired.filter(
+                    pk__gte=start, pk__lt=start + options['batch_size']
+                )
+                deleted += self.prune_batch(
+                    batch, using, writer, archive, options['discard_counts']
+                )
+                start += options['batch_size']
+                if options['sleep'] and start <= bounds['last']:
+                    time.sleep(options['sleep'])
+        finally:
+            if archive:
+                archive.close()
+
+        if options['discard_counts']:
+            # Sessions can't be taken out of a sketch, but every day before the cutoff has been pruned in full
+            FeedbackSessionSketch.objects.using(using).filter(
+                day__lt=cutoff.date()
+            ).delete()
+
+        self.stdout.write(
+            'Deleted {0} Feedback given before {1}'.format(deleted, cutoff.date())
+        )
+
+    def prune_batch(self, batch, using, writer, archive, discard_counts):
+        with transaction.atomic(using=using):
+            # Unless the counts are discarded, the rollups keep counting the deleted Feedback
+            keep_counts = not discard_counts
+            if writer is None:
+                return batch.delete(keep_counts=keep_counts)[0]
+
+            rows = list(export_values(batch.order_by('pk')))
+            if not rows:
+                return 0
+
+            # The archive is written out before the batch is deleted, so nothing is deleted without being archived
+            writer.write(rows)
+            archive.flush()
+
+            Feedback.objects.using(using).filter(
+                pk__in=[row['id'] for row in rows]
+            ).delete(keep_counts=keep_counts)
+            return len(rows)
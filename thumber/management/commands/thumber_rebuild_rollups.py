@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from thumber.models import FeedbackDailyRollup, FeedbackSessionSketch
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily feedback rollups, and the session sketches, from the Feedback table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=None,
+            help='The database to rebuild the rollups in, defaults to the database '
+            'Feedback is written to',
+        )
+
+    def handle(self, *args, **options):
+        rollups = FeedbackDailyRollup.objects.db_manager(options['database'])
+        count = rollups.rebuild()
+        self.stdout.write('Rebuilt {0} daily feedback rollups'.format(count))
+
+        sketches = FeedbackSessionSketch.objects.db_manager(options['database'])
+        count = sketches.rebuild()
+        self.stdout.write('Rebuilt {0} session sketch registers'.format(count))
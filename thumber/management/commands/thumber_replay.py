@@ -0,0 +1,66 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from thumber.conf import get_setting
+from thumber.spool import feedback_spool, read_segment, replay
+
+
+class Command(BaseCommand):
+    help = (
+        'Write the Feedback, and comments, in the spool to the database.  Feedback that has already been written is '
+        'skipped, so the spool can safely be replayed again if the command is interrupted'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='The number of Feedback written with each bulk insert',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the spool\'s segments once they have been replayed, rather than deleting them',
+        )
+        parser.add_argument(
+            '--database',
+            default=None,
+            help='The database to write to, defaults to the database Feedback is written to',
+        )
+
+    def handle(self, *args, **options):
+        if not get_setting('THUMBER_SPOOL_PATH'):
+            raise CommandError('Set THUMBER_SPOOL_PATH to the spool to replay')
+
+        # Everything spooled so far is moved into a segment, so that the spool file being written to is never replayed
+        feedback_spool.rotate()
+
+        segments = feedback_spool.segments()
+        feedback_count = comment_count = 0
+        for segment in segments:
+            records, skipped = read_segment(segment)
+            if skipped:
+                self.stderr.write(
+                    'Skipped {0} unreadable records in {1}'.format(skipped, segment)
+                )
+
+            written = replay(
+                records, using=options['database'], batch_size=options['batch_size']
+            )
+            feedback_count += written[0]
+            comment_count += written[1]
+
+            if not options['keep']:
+                try:
+                    os.remove(segment)
+                except FileNotFoundError:
+                    # Replayed at the same time by another process
+                    pass
+
+        self.stdout.write(
+            'Replayed {0} Feedback and {1} comments from {2} spool segments'.format(
+                feedback_count, comment_count, len(segments)
+            )
+        )
@@ -0,0 +1,210 @@
+"""
+An in-process registry of counters and histograms about feedback handling, which can be rendered in the Prometheus
+text exposition format.  Metrics are only recorded when THUMBER_METRICS is True.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from django.dispatch import receiver
+
+from .conf import get_setting
+from .signals import (
+    feedback_commented,
+    feedback_failed,
+    feedback_submitted,
+    stage_timed,
+)
+
+# The stages of feedback handling that are timed
+STAGES = ('post', 'template', 'resolve')
+
+# The upper bounds, in seconds, of the buckets that stage durations are counted in
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def metrics_enabled():
+    return get_setting('THUMBER_METRICS')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'),
+        )
+        for name, value in labels
+    )
+    return '{{{0}}}'.format(
+        ','.join('{0}="{1}"'.format(name, value) for name, value in escaped)
+    )
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def render(self):
+        lines = [
+            '# HELP {0} {1}'.format(self.name, self.documentation),
+            '# TYPE {0} {1}'.format(self.name, self.type),
+        ]
+        for name, labels, value in self.samples():
+            lines.append(
+                '{0}{1} {2}'.format(name, _format_labels(labels), _format_value(value))
+            )
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name + '_total', list(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def get_count(self, **labels):
+        counts, _ = self._values.get(self._key(labels), ((), 0))
+        return sum(counts)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self._values.items()
+            )
+        for key, (counts, total) in values:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield self.name + '_bucket', labels + [
+                    ('le', _format_value(bound))
+                ], cumulative
+            yield self.name + '_sum', labels, total
+            yield self.name + '_count', labels, cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def reset(self):
+        for metric in self._metrics:
+            metric.reset()
+
+    def render(self):
+        return ''.join(metric.render() + '\n' for metric in self._metrics)
+
+
+registry = MetricsRegistry()
+
+submissions = registry.register(
+    Counter(
+        'thumber_submissions',
+        'Feedback submitted, by view and satisfaction',
+        ['view_name', 'satisfied'],
+    )
+)
+comments = registry.register(Counter('thumber_comments', 'Comments added to Feedback'))
+errors = registry.register(
+    Counter('thumber_errors', 'Feedback submissions that failed, by stage', ['stage'])
+)
+stage_seconds = registry.register(
+    Histogram(
+        'thumber_stage_seconds',
+        'Time taken by each stage of handling feedback',
+        ['stage'],
+    )
+)
+
+
+@contextmanager
+def timed(stage):
+    """
+    Time the enclosed block as the given stage, if metrics are enabled or anything is listening for stage timings,
+    otherwise this does nothing
+    """
+    if not (metrics_enabled() or stage_timed.has_listeners()):
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        if metrics_enabled():
+            stage_seconds.observe(duration, stage=stage)
+        stage_timed.send(sender=None, stage=stage, duration=duration)
+
+
+@receiver(feedback_submitted, dispatch_uid='thumber_metrics_feedback_submitted')
+def _feedback_submitted(sender, feedback, **kwargs):
+    if metrics_enabled():
+        submissions.inc(view_name=feedback.view_name, satisfied=feedback.satisfied)
+
+
+@receiver(feedback_commented, dispatch_uid='thumber_metrics_feedback_commented')
+def _feedback_commented(sender, **kwargs):
+    if metrics_enabled():
+        comments.inc()
+
+
+@receiver(feedback_failed, dispatch_uid='thumber_metrics_feedback_failed')
+def _feedback_failed(sender, stage, **kwargs):
+    if metrics_enabled():
+        errors.inc(stage=stage)
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0002_rename_contentfeedback'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='reference',
+            field=models.CharField(
+                editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+    ]
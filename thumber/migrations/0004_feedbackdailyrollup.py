@@ -0,0 +1,60 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:01
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def build_rollups(apps, schema_editor):
+    Feedback = apps.get_model('thumber', 'Feedback')
+    FeedbackDailyRollup = apps.get_model('thumber', 'FeedbackDailyRollup')
+    db_alias = schema_editor.connection.alias
+
+    has_comment = Q(comment__isnull=False) & ~Q(comment='')
+    totals = (
+        Feedback.objects.using(db_alias)
+        .annotate(day=TruncDate('created'))
+        .values('view_name', 'day')
+        .annotate(
+            yes_count=Count('pk', filter=Q(satisfied=True)),
+            no_count=Count('pk', filter=Q(satisfied=False)),
+            comment_count=Count('pk', filter=has_comment),
+        )
+        .order_by()
+    )
+    FeedbackDailyRollup.objects.using(db_alias).bulk_create(
+        FeedbackDailyRollup(**values) for values in totals.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0003_feedback_reference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackDailyRollup',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('view_name', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('yes_count', models.IntegerField(default=0)),
+                ('no_count', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('-day', 'view_name'),
+                'unique_together': {('view_name', 'day')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:02
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created_to_updated(apps, schema_editor):
+    Feedback = apps.get_model('thumber', 'Feedback')
+    db_alias = schema_editor.connection.alias
+    Feedback.objects.using(db_alias).update(updated=F('created'))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0004_feedbackdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created_to_updated, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='feedback',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['created'], name='thumber_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(
+                fields=['view_name', 'created'], name='thumber_view_created_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['session'], name='thumber_session_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0005_feedback_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(
+                fields=['satisfied', 'created'], name='thumber_satisfied_created_idx'
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:30
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0006_feedback_satisfied_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackView',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('view_name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        # Feedback stops storing the view name in 0009, which is only possible to reverse if it's nullable
+        migrations.AlterField(
+            model_name='feedback',
+            name='view_name',
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='view',
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='feedback',
+                to='thumber.feedbackview',
+            ),
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='view_arguments',
+            field=models.JSONField(
+                encoder=django.core.serializers.json.DjangoJSONEncoder, null=True
+            ),
+        ),
+    ]
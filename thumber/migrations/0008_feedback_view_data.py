@@ -0,0 +1,109 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:31
+
+import ast
+
+from django.db import migrations, transaction
+
+# The number of Feedback rows converted in each transaction
+BATCH_SIZE = 1000
+
+
+def parse_view_args(view_args):
+    """
+    The "(args, kwargs)" repr that view_args used to be stored as, as {"args": [...], "kwargs": {...}}.  Anything that
+    can't be parsed is kept as it was, as a JSON string
+    """
+    if view_args is None:
+        return None
+    try:
+        args, kwargs = ast.literal_eval(view_args)
+        return {'args': list(args), 'kwargs': dict(kwargs)}
+    except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+        return view_args
+
+
+def format_view_args(view_arguments):
+    if view_arguments is None or isinstance(view_arguments, str):
+        return view_arguments
+    return str((tuple(view_arguments['args']), view_arguments['kwargs']))
+
+
+def batches(queryset):
+    """
+    The queryset in pk ordered lists of BATCH_SIZE rows, each found with a keyset query
+    """
+    after = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=after).order_by('pk')[:BATCH_SIZE])
+        if not batch:
+            return
+        yield batch
+        after = batch[-1].pk
+
+
+def normalise_views(apps, schema_editor):
+    Feedback = apps.get_model('thumber', 'Feedback')
+    FeedbackView = apps.get_model('thumber', 'FeedbackView')
+    db_alias = schema_editor.connection.alias
+
+    # The view names are found a batch at a time too, ordered on the name alone so that the DISTINCT isn't over the
+    # model's default ordering (the created time) as well
+    view_names = (
+        Feedback.objects.using(db_alias)
+        .order_by('view_name')
+        .values_list('view_name', flat=True)
+        .distinct()
+    )
+    after = None
+    while True:
+        batch = view_names if after is None else view_names.filter(view_name__gt=after)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            break
+        FeedbackView.objects.using(db_alias).bulk_create(
+            [FeedbackView(view_name=view_name) for view_name in batch],
+            ignore_conflicts=True,
+        )
+        after = batch[-1]
+    views = dict(FeedbackView.objects.using(db_alias).values_list('view_name', 'pk'))
+
+    queryset = Feedback.objects.using(db_alias).only('view_name', 'view_args')
+    for batch in batches(queryset):
+        for feedback in batch:
+            feedback.view_id = views[feedback.view_name]
+            feedback.view_arguments = parse_view_args(feedback.view_args)
+        with transaction.atomic(using=db_alias):
+            Feedback.objects.using(db_alias).bulk_update(
+                batch, ['view', 'view_arguments']
+            )
+
+
+def denormalise_views(apps, schema_editor):
+    Feedback = apps.get_model('thumber', 'Feedback')
+    FeedbackView = apps.get_model('thumber', 'FeedbackView')
+    db_alias = schema_editor.connection.alias
+
+    views = dict(FeedbackView.objects.using(db_alias).values_list('pk', 'view_name'))
+
+    queryset = Feedback.objects.using(db_alias).only('view', 'view_arguments')
+    for batch in batches(queryset):
+        for feedback in batch:
+            feedback.view_name = views[feedback.view_id]
+            feedback.view_args = format_view_args(feedback.view_arguments)
+        with transaction.atomic(using=db_alias):
+            Feedback.objects.using(db_alias).bulk_update(
+                batch, ['view_name', 'view_args']
+            )
+
+
+class Migration(migrations.Migration):
+    # Each batch is converted in a transaction of its own, rather than locking the whole table in one
+    atomic = False
+
+    dependencies = [
+        ('thumber', '0007_feedbackview'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalise_views, denormalise_views),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 06:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0008_feedback_view_data'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='feedback',
+            name='thumber_view_created_idx',
+        ),
+        migrations.RemoveField(
+            model_name='feedback',
+            name='view_name',
+        ),
+        migrations.RemoveField(
+            model_name='feedback',
+            name='view_args',
+        ),
+        migrations.RenameField(
+            model_name='feedback',
+            old_name='view_arguments',
+            new_name='view_args',
+        ),
+        migrations.AlterField(
+            model_name='feedback',
+            name='view',
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name='feedback',
+                to='thumber.feedbackview',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(
+                fields=['view', 'created'], name='thumber_view_created_idx'
+            ),
+        ),
+    ]
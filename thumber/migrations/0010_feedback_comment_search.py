@@ -0,0 +1,70 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:40
+
+from django.db import migrations
+
+# The text search configuration, and SQLite full-text table, that thumber.search uses
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'thumber_feedback_fts'
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Index the comments for full-text search: with an expression GIN index on PostgreSQL, or an FTS5 table kept in sync
+    by triggers on SQLite.  Other databases fall back to scanning the comments.
+
+    SQLite recreates a table to alter it, which drops its triggers, so any later migration that alters the Feedback
+    table must recreate them
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX thumber_comment_search_idx ON thumber_feedback '
+            'USING GIN (to_tsvector(\'{0}\', COALESCE(comment, \'\')))'.format(
+                SEARCH_CONFIG
+            )
+        )
+    elif connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        for sql in (
+            'CREATE VIRTUAL TABLE {0} USING fts5('
+            'comment, content=\'thumber_feedback\', content_rowid=\'id\')',
+            'CREATE TRIGGER {0}_insert AFTER INSERT ON thumber_feedback BEGIN '
+            'INSERT INTO {0} (rowid, comment) VALUES (new.id, new.comment); END',
+            'CREATE TRIGGER {0}_delete AFTER DELETE ON thumber_feedback BEGIN '
+            'INSERT INTO {0} ({0}, rowid, comment) VALUES (\'delete\', old.id, old.comment); END',
+            'CREATE TRIGGER {0}_update AFTER UPDATE OF comment ON thumber_feedback BEGIN '
+            'INSERT INTO {0} ({0}, rowid, comment) VALUES (\'delete\', old.id, old.comment); '
+            'INSERT INTO {0} (rowid, comment) VALUES (new.id, new.comment); END',
+            # Index the comments already given
+            'INSERT INTO {0} ({0}) VALUES (\'rebuild\')',
+        ):
+            schema_editor.execute(sql.format(FTS_TABLE))
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS thumber_comment_search_idx')
+    elif connection.vendor == 'sqlite':
+        for sql in (
+            'DROP TRIGGER IF EXISTS {0}_insert',
+            'DROP TRIGGER IF EXISTS {0}_delete',
+            'DROP TRIGGER IF EXISTS {0}_update',
+            'DROP TABLE IF EXISTS {0}',
+        ):
+            schema_editor.execute(sql.format(FTS_TABLE))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0009_remove_feedback_view_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+from thumber import hll
+
+
+def build_sketches(apps, schema_editor):
+    Feedback = apps.get_model('thumber', 'Feedback')
+    FeedbackSessionSketch = apps.get_model('thumber', 'FeedbackSessionSketch')
+    db_alias = schema_editor.connection.alias
+
+    sketches = {}
+    feedback = (
+        Feedback.objects.using(db_alias)
+        .values_list('view_id', 'created', 'session')
+        .order_by()
+    )
+    for view_id, created, session in feedback.iterator():
+        if timezone.is_aware(created):
+            created = timezone.localtime(created)
+        register, rank = hll.register_and_rank(session)
+        ranks = sketches.setdefault((view_id, created.date()), {})
+        ranks[register] = max(ranks.get(register, 0), rank)
+
+    FeedbackSessionSketch.objects.using(db_alias).bulk_create(
+        FeedbackSessionSketch(view_id=view_id, day=day, register=register, rank=rank)
+        for (view_id, day), ranks in sketches.items()
+        for register, rank in ranks.items()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0010_feedback_comment_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedbackSessionSketch',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name='ID',
+                    ),
+                ),
+                ('day', models.DateField()),
+                ('register', models.SmallIntegerField()),
+                ('rank', models.SmallIntegerField()),
+                (
+                    'view',
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.PROTECT,
+                        to='thumber.feedbackview',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ('-day', 'view', 'register'),
+                'unique_together': {('view', 'day', 'register')},
+            },
+        ),
+        migrations.RunPython(build_sketches, migrations.RunPython.noop),
+    ]
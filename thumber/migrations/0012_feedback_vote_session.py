@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:40
+
+import importlib
+
+from django.db import migrations, models
+
+search = importlib.import_module('thumber.migrations.0010_feedback_comment_search')
+
+
+def recreate_sqlite_search_index(apps, schema_editor):
+    # SQLite recreates the Feedback table to alter it, which drops the triggers that keep the search index in sync
+    if schema_editor.connection.vendor == 'sqlite':
+        search.drop_search_index(apps, schema_editor)
+        search.create_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0011_feedbacksessionsketch'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_sqlite_search_index),
+        migrations.AddField(
+            model_name='feedback',
+            name='vote_session',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='feedback',
+            constraint=models.UniqueConstraint(
+                fields=('view', 'vote_session'), name='thumber_one_vote_per_view'
+            ),
+        ),
+        migrations.RunPython(recreate_sqlite_search_index, migrations.RunPython.noop),
+    ]
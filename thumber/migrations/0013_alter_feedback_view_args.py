@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:22
+
+import importlib
+
+from django.db import migrations, models
+
+import thumber.models
+
+search = importlib.import_module('thumber.migrations.0010_feedback_comment_search')
+
+
+def recreate_sqlite_search_index(apps, schema_editor):
+    # SQLite recreates the Feedback table to alter it, which drops the triggers that keep the search index in sync
+    if schema_editor.connection.vendor == 'sqlite':
+        search.drop_search_index(apps, schema_editor)
+        search.create_search_index(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0012_feedback_vote_session'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recreate_sqlite_search_index),
+        migrations.AlterField(
+            model_name='feedback',
+            name='view_args',
+            field=models.JSONField(encoder=thumber.models.ViewArgsEncoder, null=True),
+        ),
+        migrations.RunPython(recreate_sqlite_search_index, migrations.RunPython.noop),
+    ]
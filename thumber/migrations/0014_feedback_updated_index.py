@@ -0,0 +1,16 @@
+# Generated by Django 4.2.30 on 2026-10-18 07:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('thumber', '0013_alter_feedback_view_args'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['updated', 'id'], name='thumber_updated_id_idx'),
+        ),
+    ]
@@ -1,30 +1,639 @@
 from __future__ import unicode_literals
 
-from django.db import models
-from django.db.models import Avg, Case, Count, IntegerField, Value, When
+import datetime
+import uuid
 
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import (
+    Avg,
+    BooleanField,
+    Case,
+    Count,
+    F,
+    FloatField,
+    IntegerField,
+    Max,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Greatest, Trunc, TruncDate, TruncHour
+from django.utils import timezone
 
-class FeedbackQuerySet(models.QuerySet):
-    def average_for_views(self):
+from . import hll
+from .conf import get_setting
+from .export import start_of_day
+from .search import search_comments
+
+# The Feedback fields that a session's new vote on a view replaces its earlier vote's with
+VOTE_FIELDS = ['satisfied', 'comment', 'url', 'view_args', 'reference', 'updated']
+
+# The Feedback fields that decide what it counts towards in the daily rollups
+ROLLUP_FIELDS = {'view', 'view_id', 'created', 'satisfied', 'comment'}
+
+# The periods that satisfaction can be bucketed by.  Hourly buckets can only be calculated from the Feedback table, the
+# others can be answered from the daily rollups
+PERIODS = ('hour', 'day', 'week')
+
+
+def _truncate(field_name, period, tzinfo=None):
+    if period == 'hour':
+        return TruncHour(field_name, tzinfo=tzinfo)
+    return Trunc(field_name, period, output_field=models.DateField(), tzinfo=tzinfo)
+
+
+def _truncate_date(field_name):
+    # The day in the project's time zone, see _local_date
+    return TruncDate(field_name, tzinfo=timezone.get_default_timezone())
+
+
+def _lowest_averages(averages, limit, min_count):
+    return averages.filter(count__gte=min_count).order_by(
+        'average', '-count', 'view_name'
+    )[:limit]
+
+
+class ViewArgsEncoder(DjangoJSONEncoder):
+    """
+    Encodes view arguments, falling back to the str() of anything that JSON can't represent (e.g. the value given by a
+    custom URL converter, or an extra argument given to path())
+    """
+
+    def default(self, o):
+        try:
+            return super().default(o)
+        except TypeError:
+            return str(o)
+
+
+class AnalyticsQuerySetMixin:
+    def for_analytics(self):
+        """
+        This queryset made against THUMBER_READ_DATABASE (e.g. a read replica), if it's set and the queryset hasn't been
+        given a database of its own
+        """
+        alias = get_setting('THUMBER_READ_DATABASE')
+        if alias is not None and self._db is None:
+            return self.using(alias)
+        return self
+
+
+def _check_period(period):
+    if period not in PERIODS:
+        raise ValueError(
+            'period must be one of {0}, not "{1}"'.format(', '.join(PERIODS), period)
+        )
+
+
+class _ConcurrentVote(Exception):
+    pass
+
+
+class FeedbackQuerySet(AnalyticsQuerySetMixin, models.QuerySet):
+    def bulk_create(
+        self,
+        objs,
+        batch_size=None,
+        ignore_conflicts=False,
+        update_conflicts=False,
+        update_fields=None,
+        unique_fields=None,
+        keep_counts=False,
+    ):
+        """
+        Create the Feedback objects, and add them to the daily rollups and session sketches, unless `keep_counts` is
+        True (e.g. to change them before they're recorded).  Conflicting rows aren't inserted, so which of the objects
+        count can't be known, and `keep_counts` must be True to ignore or update conflicts.
+        """
+        if (ignore_conflicts or update_conflicts) and not keep_counts:
+            raise ValueError(
+                'Feedback can only be bulk created with ignore_conflicts or update_conflicts when keep_counts is True'
+            )
+
+        objs = list(objs)
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using, savepoint=False):
+            Feedback.resolve_views(objs, using=using)
+            created = super().bulk_create(
+                objs,
+                batch_size=batch_size,
+                ignore_conflicts=ignore_conflicts,
+                update_conflicts=update_conflicts,
+                update_fields=update_fields,
+                unique_fields=unique_fields,
+            )
+            if not keep_counts:
+                FeedbackDailyRollup.objects.using(using).record(objs)
+                FeedbackSessionSketch.objects.using(using).record(objs)
+
+        return created
+
+    def bulk_update(self, objs, fields, batch_size=None, keep_counts=False):
+        """
+        Update the fields of the Feedback objects.  Each batch is written with `update`, which adjusts the daily rollups
+        by the changes to what the Feedback counts towards, unless `keep_counts` is True.
+        """
+        objs = list(objs)
+        using = self._db or router.db_for_write(self.model)
+        Feedback.resolve_views(objs, using=using)
+        if keep_counts:
+            # The base manager's queryset updates the Feedback without adjusting the rollups
+            return Feedback._base_manager.using(using).bulk_update(
+                objs, fields, batch_size=batch_size
+            )
+        return super().bulk_update(objs, fields, batch_size=batch_size)
+
+    def average_for_views(self, since=None, until=None):
+        """
+        The average satisfaction, and number of votes, for each view; optionally limited to feedback given between the
+        `since` and `until` dates (inclusive).  An unfiltered queryset is answered from the daily rollups rather than
+        by aggregating every Feedback row.
+        """
+        queryset = self.for_analytics()
+        if not self.query.where and not self.query.is_sliced:
+            return FeedbackDailyRollup.objects.using(queryset.db).average_for_views(
+                since=since, until=until
+            )
+
+        queryset = self._between(since, until)
+
+        return (
+            queryset.annotate(view_name=F('view__view_name'))
+            .values('view_name')
+            .annotate(**self._satisfaction_aggregates())
+            .order_by('view_name')
+        )
+
+    def satisfaction_by_period(self, period='day', since=None, until=None):
+        """
+        The average satisfaction, and number of votes, for each view in each hour, day or week (the `period`) between
+        the `since` and `until` dates (inclusive).  The feedback is bucketed in the database, and daily or weekly
+        buckets for an unfiltered queryset are answered from the daily rollups.
+        """
+        _check_period(period)
+        queryset = self.for_analytics()
+        if period != 'hour' and not self.query.where and not self.query.is_sliced:
+            rollups = FeedbackDailyRollup.objects.using(queryset.db)
+            return rollups.satisfaction_by_period(
+                period=period, since=since, until=until
+            )
+
+        queryset = self._between(since, until)
+
+        return (
+            queryset.annotate(
+                view_name=F('view__view_name'),
+                period=_truncate('created', period, timezone.get_default_timezone()),
+            )
+            .values('view_name', 'period')
+            .annotate(**self._satisfaction_aggregates())
+            .order_by('period', 'view_name')
+        )
+
+    def worst_views(self, since=None, until=None, limit=10, min_count=1):
+        """
+        The `limit` views with the lowest average satisfaction between the `since` and `until` dates (inclusive),
+        ignoring views with fewer than `min_count` votes
+        """
+        averages = self.average_for_views(since=since, until=until)
+        return _lowest_averages(averages, limit, min_count)
+
+    def distinct_sessions(self, since=None, until=None):
+        """
+        The number of distinct sessions that gave feedback on each view between the `since` and `until` dates
+        (inclusive).  An unfiltered queryset is answered with estimates from the session sketches, rather than counting
+        the distinct sessions in the Feedback table.
+        """
+        queryset = self.for_analytics()
+        if not self.query.where and not self.query.is_sliced:
+            sketches = FeedbackSessionSketch.objects.using(queryset.db)
+            return sketches.distinct_sessions(since=since, until=until)
+
+        queryset = self._between(since, until)
+
+        return (
+            queryset.annotate(view_name=F('view__view_name'))
+            .values('view_name')
+            .annotate(sessions=Count('session', distinct=True))
+            .order_by('view_name')
+        )
+
+    def _between(self, since, until):
+        # Filtered on when the days start (in TIME_ZONE, as the rollups are), rather than on the date of created, so
+        # that the indexes on created can be used
+        queryset = self.for_analytics()
+        tzinfo = timezone.get_default_timezone()
+        if since is not None:
+            queryset = queryset.filter(created__gte=start_of_day(since, tzinfo))
+        if until is not None:
+            next_day = until + datetime.timedelta(days=1)
+            queryset = queryset.filter(created__lt=start_of_day(next_day, tzinfo))
+        return queryset
+
+    @staticmethod
+    def _satisfaction_aggregates():
         case = Case(
             When(satisfied=True, then=Value(1)),
             When(satisfied=False, then=Value(0)),
             output_field=IntegerField(),
         )
+        return {'average': Avg(case), 'count': Count('id')}
 
-        return (
-            self.values('view_name')
-            .annotate(average=Avg(case), count=Count('view_name'))
-            .order_by('view_name')
+    def search(self, query):
+        """
+        The Feedback whose comments contain all the words in the query, found with a full-text index where the database
+        has one
+        """
+        return search_comments(self, query)
+
+    def save_once(self, feedback):
+        """
+        Save new Feedback, unless Feedback with the same reference has already been saved for the same session (e.g.
+        the form was submitted twice), returns the pk of the saved, or previously saved, Feedback
+        """
+        using = self._db or router.db_for_write(self.model)
+        try:
+            with transaction.atomic(using=using):
+                feedback.save(using=using)
+            return feedback.pk
+        except IntegrityError:
+            existing = (
+                self.using(using)
+                .filter(reference=feedback.reference, session=feedback.session)
+                .values_list('pk', flat=True)
+                .first()
+            )
+            if existing is None:
+                # The reference was used by another session, so this Feedback needs a reference of its own
+                feedback.reference = uuid.uuid4().hex
+                feedback.save(using=using)
+                return feedback.pk
+            return existing
+
+    async def asave_once(self, feedback):
+        return await sync_to_async(self.save_once)(feedback)
+
+    def save_vote(self, feedback):
+        """
+        Save new Feedback as its session's vote on its view, replacing the session's earlier vote on the view if there
+        is one, returns the pk of the Feedback
+        """
+        try:
+            self.upsert_votes([feedback])
+        except IntegrityError:
+            # The reference was used by another session, so this Feedback needs a reference of its own
+            feedback.reference = uuid.uuid4().hex
+            self.upsert_votes([feedback])
+        return feedback.pk
+
+    async def asave_vote(self, feedback):
+        return await sync_to_async(self.save_vote)(feedback)
+
+    def upsert_votes(self, feedback_list):
+        """
+        Save new Feedback as each session's vote on its view, with a single INSERT ... ON CONFLICT DO UPDATE that
+        replaces any earlier vote by the same session on the same view (only the last of a session's votes on a view in
+        the list is saved).  The rollups are adjusted by the difference between the earlier votes and the new ones, and
+        Feedback that was given a `created` time keeps it.
+
+        The upsert can't return the rows it replaced (nor, on every database, the pks of the rows it wrote), so the
+        earlier votes are read, and locked, before it, and the pks of first votes are read after it.  A revote is
+        saved with the SELECT ... FOR UPDATE, the upsert and the rollup and sketch writes.
+        """
+        using = self._db or router.db_for_write(self.model)
+        Feedback.resolve_views(feedback_list, using=using)
+        votes = {}
+        for feedback in feedback_list:
+            feedback.vote_session = feedback.session
+            votes[(feedback.view_id, feedback.vote_session)] = feedback
+        given = {key: feedback.created for key, feedback in votes.items()}
+
+        for _ in range(3):
+            try:
+                with transaction.atomic(using=using):
+                    self._upsert_votes(votes, given, using)
+                return
+            except _ConcurrentVote:
+                # Another process saved the session's first vote on the view in the meantime, so it's replaced as an
+                # earlier vote on the next attempt
+                for key, feedback in votes.items():
+                    feedback.created = given[key]
+        raise IntegrityError('Votes were repeatedly saved by another process')
+
+    def _upsert_votes(self, votes, given, using):
+        queryset = self.using(using).order_by()
+        keys = Q()
+        for view_id, vote_session in votes:
+            keys |= Q(view_id=view_id, vote_session=vote_session)
+        earlier = (
+            queryset.filter(keys)
+            .select_for_update()
+            .values_list(
+                'view_id', 'vote_session', 'pk', 'created', 'satisfied', 'comment'
+            )
+        )
+        previous = {(row[0], row[1]): row[2:] for row in earlier}
+
+        unique_fields = None
+        if connections[using].features.supports_update_conflicts_with_target:
+            unique_fields = ['view', 'vote_session']
+        queryset.bulk_create(
+            votes.values(),
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=VOTE_FIELDS,
+            keep_counts=True,
+        )
+
+        # The pks aren't returned when rows may have been updated rather than inserted, so the first votes are read
+        # back, which also finds any that another process saved in the meantime
+        first = Q()
+        for view_id, vote_session in votes.keys() - previous.keys():
+            first |= Q(view_id=view_id, vote_session=vote_session)
+        saved = {}
+        if first:
+            saved = queryset.filter(first).values_list(
+                'view_id', 'vote_session', 'pk', 'created'
+            )
+            saved = {(row[0], row[1]): row[2:] for row in saved}
+
+        counts = {}
+        restore = []
+        for key, feedback in votes.items():
+            feedback._state.adding = False
+            feedback._state.db = using
+            if key in previous:
+                # The earlier vote is replaced, so it's taken out of the rollups, and its created time is kept
+                feedback.pk, created, satisfied, comment = previous[key]
+                rollup_key = (
+                    feedback.view_name,
+                    _local_date(created),
+                    satisfied,
+                    bool(comment),
+                )
+                counts[rollup_key] = counts.get(rollup_key, 0) - 1
+                feedback.created = created
+            else:
+                feedback.pk, created = saved[key]
+                if created != feedback.created:
+                    raise _ConcurrentVote()
+                if given[key] is not None:
+                    feedback.created = given[key]
+                    restore.append(feedback)
+
+            rollup_key = feedback.get_rollup_key()
+            counts[rollup_key] = counts.get(rollup_key, 0) + 1
+            feedback._rollup_state = feedback._get_rollup_state()
+
+        if restore:
+            # The rollups are adjusted for the votes below, so the created times are put back without changing them
+            queryset.bulk_update(restore, ['created'], keep_counts=True)
+        FeedbackDailyRollup.objects.using(using).add_counts(counts)
+        FeedbackSessionSketch.objects.using(using).record(votes.values())
+
+    def set_comment(self, comment):
+        """
+        Set the comment on the Feedback in this queryset, which should be filtered to a single Feedback (e.g. on its
+        pk, or reference), returns the number of Feedback updated.
+
+        Only the comment and updated columns are written, with a single conditional UPDATE.  Where the Feedback gains
+        (or loses) a comment its daily rollup is adjusted with a second UPDATE.
+        """
+        using = self._db or router.db_for_write(self.model)
+        queryset = self.using(using)
+        blank = Q(comment__isnull=True) | Q(comment='')
+        changes = queryset.filter(blank) if comment else queryset.exclude(blank)
+        now = timezone.now()
+
+        with transaction.atomic(using=using, savepoint=False):
+            updated = changes.update(comment=comment, updated=now, keep_counts=True)
+            if not updated:
+                # Replacing one comment with another (or blank with blank), so the rollups are unchanged
+                return queryset.update(comment=comment, updated=now, keep_counts=True)
+
+            feedback = queryset.order_by().annotate(
+                view_name=F('view__view_name'), day=_truncate_date('created')
+            )
+            FeedbackDailyRollup.objects.using(using).filter(
+                view_name=Subquery(feedback.values('view_name')[:1]),
+                day=Subquery(feedback.values('day')[:1]),
+            ).update(comment_count=F('comment_count') + (1 if comment else -1))
+
+        return updated
+
+    async def aset_comment(self, comment):
+        return await sync_to_async(self.set_comment)(comment)
+
+    def update(self, keep_counts=False, **kwargs):
+        """
+        Update the Feedback in this queryset.  When the update changes what the Feedback counts towards in the daily
+        rollups (its view, when it was given, whether it was satisfied, or its comment) the Feedback is read, and
+        locked, before it's updated and read again after, and the rollups are adjusted by the difference, unless
+        `keep_counts` is True.
+        """
+        if keep_counts or not ROLLUP_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using, savepoint=False):
+            before = self._get_rollup_keys(using)
+            updated = super().update(**kwargs)
+
+            pks = list(before)
+            after = {}
+            batch_size = connections[using].ops.bulk_batch_size(['pk'], pks) or 1
+            for start in range(0, len(pks), batch_size):
+                batch = self.model.objects.filter(
+                    pk__in=pks[start : start + batch_size]
+                )
+                after.update(batch._get_rollup_keys(using))
+
+            counts = {}
+            _count_rollup_keys(counts, before.values(), -1)
+            _count_rollup_keys(counts, after.values(), 1)
+            FeedbackDailyRollup.objects.using(using).add_counts(counts)
+
+        return updated
+
+    def delete(self, keep_counts=False):
+        """
+        Delete the Feedback in this queryset, and take it out of the daily rollups, unless `keep_counts` is True (e.g.
+        to delete old Feedback but keep the historical averages).  The Feedback is read, and locked, before it's
+        deleted, to find what it counted towards.  Sessions can't be taken out of the session sketches, so they keep
+        counting the deleted Feedback.
+        """
+        if keep_counts:
+            return super().delete()
+
+        using = self._db or router.db_for_write(self.model)
+        with transaction.atomic(using=using, savepoint=False):
+            counts = {}
+            _count_rollup_keys(counts, self._get_rollup_keys(using).values(), -1)
+            deleted = super().delete()
+            FeedbackDailyRollup.objects.using(using).add_counts(counts)
+
+        return deleted
+
+    def _get_rollup_keys(self, using):
+        # The rollup key of each Feedback in the queryset, by pk, with the rows locked until the end of the transaction
+        blank = Q(comment__isnull=True) | Q(comment='')
+        rows = (
+            self.using(using)
+            .order_by()
+            .select_for_update()
+            .annotate(
+                has_comment=Case(
+                    When(blank, then=Value(False)),
+                    default=Value(True),
+                    output_field=BooleanField(),
+                )
+            )
+            .values_list('pk', 'view_id', 'created', 'satisfied', 'has_comment')
         )
+        views = FeedbackView.objects.db_manager(using)
+        return {
+            pk: (views.get_name(view_id), _local_date(created), satisfied, has_comment)
+            for pk, view_id, created, satisfied, has_comment in rows
+        }
 
 
 class FeedbackManager(models.Manager):
     def get_queryset(self):
         return FeedbackQuerySet(self.model, using=self._db)
 
-    def average_for_views(self):
-        return self.get_queryset().average_for_views()
+    def for_analytics(self):
+        return self.get_queryset().for_analytics()
+
+    def average_for_views(self, since=None, until=None):
+        return self.get_queryset().average_for_views(since=since, until=until)
+
+    def satisfaction_by_period(self, period='day', since=None, until=None):
+        return self.get_queryset().satisfaction_by_period(
+            period=period, since=since, until=until
+        )
+
+    def worst_views(self, since=None, until=None, limit=10, min_count=1):
+        return self.get_queryset().worst_views(
+            since=since, until=until, limit=limit, min_count=min_count
+        )
+
+    def distinct_sessions(self, since=None, until=None):
+        return self.get_queryset().distinct_sessions(since=since, until=until)
+
+    def search(self, query):
+        return self.get_queryset().search(query)
+
+    def save_once(self, feedback):
+        return self.get_queryset().save_once(feedback)
+
+    def save_vote(self, feedback):
+        return self.get_queryset().save_vote(feedback)
+
+    def upsert_votes(self, feedback_list):
+        return self.get_queryset().upsert_votes(feedback_list)
+
+    async def asave_once(self, feedback):
+        return await self.get_queryset().asave_once(feedback)
+
+    async def asave_vote(self, feedback):
+        return await self.get_queryset().asave_vote(feedback)
+
+
+# The FeedbackView objects (by name) and view names (by id) known to exist in each database
+_view_cache = {}
+
+
+class FeedbackViewManager(models.Manager):
+    def get_for_names(self, view_names):
+        """
+        A dict of the FeedbackView for each of the view names, creating any that don't exist yet.  Views are cached
+        once the transaction that found (or created) them commits, since they are never changed or deleted.
+        """
+        using = self._db or router.db_for_write(self.model)
+        cache = _view_cache.setdefault(using, {'by_name': {}, 'by_id': {}})
+
+        views = {}
+        missing = set()
+        for view_name in view_names:
+            if view_name in cache['by_name']:
+                views[view_name] = cache['by_name'][view_name]
+            else:
+                missing.add(view_name)
+        if not missing:
+            return views
+
+        found = {
+            view.view_name: view
+            for view in self.using(using).filter(view_name__in=missing)
+        }
+        if len(found) < len(missing):
+            self.using(using).bulk_create(
+                [self.model(view_name=view_name) for view_name in missing - set(found)],
+                ignore_conflicts=True,
+            )
+            found = {
+                view.view_name: view
+                for view in self.using(using).filter(view_name__in=missing)
+            }
+
+        transaction.on_commit(
+            lambda: self._remember(cache, found.values()), using=using
+        )
+        views.update(found)
+        return views
+
+    def get_name(self, pk):
+        """
+        The name of the view with the pk
+        """
+        using = self._db or router.db_for_read(self.model)
+        cache = _view_cache.setdefault(using, {'by_name': {}, 'by_id': {}})
+        if pk in cache['by_id']:
+            return cache['by_id'][pk].view_name
+
+        view = self.using(using).get(pk=pk)
+        transaction.on_commit(lambda: self._remember(cache, [view]), using=using)
+        return view.view_name
+
+    @staticmethod
+    def _remember(cache, views):
+        for view in views:
+            cache['by_name'][view.view_name] = view
+            cache['by_id'][view.pk] = view
+
+    def clear_cache(self):
+        _view_cache.clear()
+
+
+class FeedbackView(models.Model):
+    """
+    The name of a view that Feedback has been given on, so that each Feedback row only stores a small id
+    """
+
+    id = models.SmallAutoField(primary_key=True)
+    view_name = models.CharField(max_length=255, unique=True)
+
+    objects = FeedbackViewManager()
+
+    def __str__(self):
+        return self.view_name
+
+
+def _local_date(created):
+    # The day in the project's time zone (TIME_ZONE) rather than the active one, which may be a visitor's, so that
+    # Feedback is always counted on the same day
+    if timezone.is_aware(created):
+        created = timezone.localtime(created, timezone.get_default_timezone())
+    return created.date()
+
+
+def _count_rollup_keys(counts, rollup_keys, count):
+    for rollup_key in rollup_keys:
+        counts[rollup_key] = counts.get(rollup_key, 0) + count
 
 
 class Feedback(models.Model):
@@ -32,21 +641,462 @@ class Feedback(models.Model):
     Basic model for storing user-submitted feedback audit data
     """
 
-    created = models.DateTimeField(auto_now=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     satisfied = models.BooleanField()
     comment = models.TextField(null=True, blank=True)
 
     url = models.URLField()
-    view_name = models.CharField(max_length=255)
-    view_args = models.TextField(null=True)
+    # Indexed along with created, below
+    view = models.ForeignKey(
+        FeedbackView, on_delete=models.PROTECT, related_name='feedback', db_index=False
+    )
+    # The positional and keyword arguments the view was called with, as {"args": [...], "kwargs": {...}}
+    view_args = models.JSONField(null=True, encoder=ViewArgsEncoder)
     session = models.CharField(max_length=64)
+    reference = models.CharField(max_length=64, unique=True, null=True, editable=False)
+    # The session, for Feedback saved as the session's only vote on the view (see THUMBER_ONE_VOTE_PER_VIEW)
+    vote_session = models.CharField(max_length=64, null=True, editable=False)
 
     objects = FeedbackManager()
 
+    # A view name that has been set, but not yet looked up as a FeedbackView
+    _pending_view_name = None
+
     def __str__(self):
         tick_cross = '✓' if self.satisfied else '✘'
         return '{0} - {1}'.format(tick_cross, self.created)
 
+    @property
+    def view_name(self):
+        if self._pending_view_name is not None:
+            return self._pending_view_name
+        if self.view_id is None:
+            return None
+        if Feedback.view.is_cached(self):
+            return self.view.view_name
+        return FeedbackView.objects.db_manager(self._state.db).get_name(self.view_id)
+
+    @view_name.setter
+    def view_name(self, view_name):
+        # The FeedbackView is looked up when the Feedback is saved
+        self._pending_view_name = view_name
+
+    @classmethod
+    def resolve_views(cls, feedback_list, using=None):
+        """
+        Set the FeedbackView of each Feedback whose view name has been set, looking them all up together
+        """
+        pending = [
+            feedback
+            for feedback in feedback_list
+            if feedback._pending_view_name is not None
+        ]
+        if not pending:
+            return
+
+        views = FeedbackView.objects.db_manager(using).get_for_names(
+            {feedback._pending_view_name for feedback in pending}
+        )
+        for feedback in pending:
+            feedback.view = views[feedback._pending_view_name]
+            feedback._pending_view_name = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row contributed to the rollups, so that saving changes to it can adjust them
+        if {'created', 'satisfied', 'comment', 'view_id'}.issubset(field_names):
+            instance._rollup_state = instance._get_rollup_state()
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        previous = None if adding else getattr(self, '_rollup_state', None)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+
+        with transaction.atomic(using=using, savepoint=False):
+            if not adding and previous is None:
+                # Loaded without all of the fields the rollups need (e.g. with `only` or `defer`), so what it counted
+                # towards is read from the database
+                previous = self._rollup_state = self._read_rollup_state(using)
+            Feedback.resolve_views([self], using=using)
+            super().save(*args, **kwargs)
+            current = self._get_rollup_state()
+            if previous != current:
+                rollups = FeedbackDailyRollup.objects.using(using)
+                if previous is not None:
+                    rollups.add(self._get_saved_rollup_key(using), -1)
+                rollups.add(self.get_rollup_key(), 1)
+            if adding:
+                FeedbackSessionSketch.objects.using(using).record([self])
+
+        self._rollup_state = current
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        rollup_key = self._get_saved_rollup_key(using)
+
+        with transaction.atomic(using=using, savepoint=False):
+            deleted = super().delete(*args, **kwargs)
+            if deleted[0]:
+                FeedbackDailyRollup.objects.using(using).add(rollup_key, -1)
+
+        return deleted
+
+    def _get_rollup_state(self):
+        return (self.view_id, self.created, self.satisfied, bool(self.comment))
+
+    def _read_rollup_state(self, using):
+        # The saved row's rollup state, with the row locked until the end of the transaction, or None if it isn't saved
+        row = (
+            Feedback._base_manager.db_manager(using)
+            .select_for_update()
+            .filter(pk=self.pk)
+            .values_list('view_id', 'created', 'satisfied', 'comment')
+            .first()
+        )
+        if row is None:
+            return None
+        view_id, created, satisfied, comment = row
+        return (view_id, created, satisfied, bool(comment))
+
+    def _get_saved_rollup_key(self, using):
+        # What this Feedback counted towards in the rollups when it was loaded, or last saved
+        if getattr(self, '_rollup_state', None) is None:
+            return self.get_rollup_key()
+        view_id, created, satisfied, has_comment = self._rollup_state
+        view_name = FeedbackView.objects.db_manager(using).get_name(view_id)
+        return (view_name, _local_date(created), satisfied, has_comment)
+
+    def get_rollup_key(self):
+        """
+        The (view_name, day, satisfied, has_comment) tuple that identifies what this Feedback counts towards in the
+        daily rollups
+        """
+        return (
+            self.view_name,
+            _local_date(self.created),
+            self.satisfied,
+            bool(self.comment),
+        )
+
     class Meta:
         ordering = ('-created',)
         verbose_name_plural = 'Feedback'
+        indexes = [
+            models.Index(fields=['created'], name='thumber_created_idx'),
+            models.Index(fields=['view', 'created'], name='thumber_view_created_idx'),
+            models.Index(fields=['session'], name='thumber_session_idx'),
+            models.Index(
+                fields=['satisfied', 'created'], name='thumber_satisfied_created_idx'
+            ),
+            # For exporting Feedback in the order it was changed, see thumber.export.iter_chunks
+            models.Index(fields=['updated', 'id'], name='thumber_updated_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['view', 'vote_session'], name='thumber_one_vote_per_view'
+            ),
+        ]
+
+
+class FeedbackDailyRollupQuerySet(AnalyticsQuerySetMixin, models.QuerySet):
+    def add(self, rollup_key, count):
+        """
+        Add `count` (which may be negative) pieces of Feedback matching the rollup key to the day's counts
+        """
+        self.add_counts({rollup_key: count})
+
+    def add_counts(self, counts):
+        """
+        Apply a dict of {rollup_key: count} to the rollups, using a single UPDATE per view and day, and only creating
+        rows for days that don't yet have one
+        """
+        totals = {}
+        for (view_name, day, satisfied, has_comment), count in counts.items():
+            yes, no, comments = totals.get((view_name, day), (0, 0, 0))
+            if satisfied:
+                yes += count
+            else:
+                no += count
+            if has_comment:
+                comments += count
+            totals[(view_name, day)] = (yes, no, comments)
+
+        using = self._db or router.db_for_write(self.model)
+        for (view_name, day), (yes, no, comments) in totals.items():
+            if yes == no == comments == 0:
+                continue
+
+            updated = (
+                self.using(using)
+                .filter(view_name=view_name, day=day)
+                .update(
+                    yes_count=F('yes_count') + yes,
+                    no_count=F('no_count') + no,
+                    comment_count=F('comment_count') + comments,
+                )
+            )
+            if updated:
+                continue
+
+            try:
+                with transaction.atomic(using=using):
+                    self.using(using).create(
+                        view_name=view_name,
+                        day=day,
+                        yes_count=yes,
+                        no_count=no,
+                        comment_count=comments,
+                    )
+            except IntegrityError:
+                # Another process created the day's row in the meantime, so it can be updated after all
+                self.using(using).filter(view_name=view_name, day=day).update(
+                    yes_count=F('yes_count') + yes,
+                    no_count=F('no_count') + no,
+                    comment_count=F('comment_count') + comments,
+                )
+
+    def record(self, feedback_list):
+        """
+        Add newly created Feedback objects to the rollups
+        """
+        counts = {}
+        for feedback in feedback_list:
+            rollup_key = feedback.get_rollup_key()
+            counts[rollup_key] = counts.get(rollup_key, 0) + 1
+        self.add_counts(counts)
+
+    def rebuild(self):
+        """
+        Replace all of the rollups with totals calculated from the Feedback table, returns the number of rollups
+        """
+        using = self._db or router.db_for_write(self.model)
+        has_comment = Q(comment__isnull=False) & ~Q(comment='')
+        totals = (
+            Feedback.objects.using(using)
+            .annotate(view_name=F('view__view_name'), day=_truncate_date('created'))
+            .values('view_name', 'day')
+            .annotate(
+                yes_count=Count('pk', filter=Q(satisfied=True)),
+                no_count=Count('pk', filter=Q(satisfied=False)),
+                comment_count=Count('pk', filter=has_comment),
+            )
+            .order_by()
+        )
+
+        with transaction.atomic(using=using):
+            self.using(using).delete()
+            rollups = self.using(using).bulk_create(
+                FeedbackDailyRollup(**values) for values in totals.iterator()
+            )
+
+        return len(rollups)
+
+    def average_for_views(self, since=None, until=None):
+        return (
+            self._between(since, until)
+            .values('view_name')
+            .annotate(**self._satisfaction_aggregates())
+            .filter(count__gt=0)
+            .order_by('view_name')
+        )
+
+    def satisfaction_by_period(self, period='day', since=None, until=None):
+        _check_period(period)
+        if period == 'hour':
+            raise ValueError('The daily rollups can\'t be bucketed by hour')
+
+        return (
+            self._between(since, until)
+            .annotate(period=_truncate('day', period))
+            .values('view_name', 'period')
+            .annotate(**self._satisfaction_aggregates())
+            .filter(count__gt=0)
+            .order_by('period', 'view_name')
+        )
+
+    def worst_views(self, since=None, until=None, limit=10, min_count=1):
+        averages = self.average_for_views(since=since, until=until)
+        return _lowest_averages(averages, limit, min_count)
+
+    def _between(self, since, until):
+        queryset = self.for_analytics()
+        if since is not None:
+            queryset = queryset.filter(day__gte=since)
+        if until is not None:
+            queryset = queryset.filter(day__lte=until)
+        return queryset
+
+    @staticmethod
+    def _satisfaction_aggregates():
+        total = F('yes_count') + F('no_count')
+        return {
+            'average': Cast(Sum('yes_count'), FloatField())
+            / Cast(Sum(total), FloatField()),
+            'count': Sum(total),
+        }
+
+
+class FeedbackDailyRollup(models.Model):
+    """
+    Running per-view, per-day totals of Feedback, kept up to date as Feedback is saved so that aggregate statistics
+    don't need to scan the Feedback table
+    """
+
+    view_name = models.CharField(max_length=255)
+    day = models.DateField()
+    yes_count = models.IntegerField(default=0)
+    no_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+
+    objects = FeedbackDailyRollupQuerySet.as_manager()
+
+    def __str__(self):
+        return '{0} - {1}'.format(self.view_name, self.day)
+
+    class Meta:
+        ordering = ('-day', 'view_name')
+        unique_together = ('view_name', 'day')
+
+
+class FeedbackSessionSketchQuerySet(AnalyticsQuerySetMixin, models.QuerySet):
+    def add_ranks(self, view_id, day, ranks):
+        """
+        Raise the registers of a view's sketch for the day to at least the given ranks, a dict of {register: rank}.
+        Registers are only stored once a session has hashed to them, so an UPDATE is made for each distinct rank, and
+        rows are only inserted for registers it didn't find.
+        """
+        using = self._db or router.db_for_write(self.model)
+        by_rank = {}
+        for register, rank in ranks.items():
+            by_rank.setdefault(rank, []).append(register)
+
+        for rank, registers in by_rank.items():
+            sketch = self.using(using).filter(
+                view_id=view_id, day=day, register__in=registers
+            )
+            if sketch.update(rank=Greatest('rank', Value(rank))) == len(registers):
+                continue
+
+            self.using(using).bulk_create(
+                [
+                    FeedbackSessionSketch(
+                        view_id=view_id, day=day, register=register, rank=rank
+                    )
+                    for register in registers
+                ],
+                ignore_conflicts=True,
+            )
+            # Registers that existed, or were created by another process in the meantime, may still hold a lower rank
+            sketch.update(rank=Greatest('rank', Value(rank)))
+
+    def record(self, feedback_list):
+        """
+        Add the sessions of newly created Feedback objects to the sketches
+        """
+        for (view_id, day), ranks in self._ranks(
+            (feedback.view_id, feedback.created, feedback.session)
+            for feedback in feedback_list
+        ).items():
+            self.add_ranks(view_id, day, ranks)
+
+    def rebuild(self):
+        """
+        Replace all of the sketches with ones calculated from the Feedback table, returns the number of registers
+        stored
+        """
+        using = self._db or router.db_for_write(self.model)
+        feedback = (
+            Feedback.objects.using(using)
+            .values_list('view_id', 'created', 'session')
+            .order_by()
+        )
+        sketches = self._ranks(feedback.iterator())
+
+        with transaction.atomic(using=using):
+            self.using(using).delete()
+            registers = self.using(using).bulk_create(
+                FeedbackSessionSketch(
+                    view_id=view_id, day=day, register=register, rank=rank
+                )
+                for (view_id, day), ranks in sketches.items()
+                for register, rank in ranks.items()
+            )
+
+        return len(registers)
+
+    def distinct_sessions(self, since=None, until=None):
+        """
+        The estimated number of distinct sessions that gave feedback on each view between the `since` and `until` dates
+        (inclusive), found by merging the views' daily sketches
+        """
+        registers = (
+            self._between(since, until)
+            .values('view__view_name', 'register')
+            .annotate(rank=Max('rank'))
+            .order_by()
+        )
+        sketches = {}
+        for row in registers:
+            sketches.setdefault(row['view__view_name'], {})[row['register']] = row[
+                'rank'
+            ]
+
+        return [
+            {'view_name': view_name, 'sessions': hll.estimate(ranks)}
+            for view_name, ranks in sorted(sketches.items())
+        ]
+
+    def total_distinct_sessions(self, since=None, until=None):
+        """
+        The estimated number of distinct sessions that gave feedback on any view between the `since` and `until` dates
+        (inclusive)
+        """
+        registers = (
+            self._between(since, until)
+            .values('register')
+            .annotate(rank=Max('rank'))
+            .order_by()
+        )
+        return hll.estimate({row['register']: row['rank'] for row in registers})
+
+    def _between(self, since, until):
+        queryset = self.for_analytics()
+        if since is not None:
+            queryset = queryset.filter(day__gte=since)
+        if until is not None:
+            queryset = queryset.filter(day__lte=until)
+        return queryset
+
+    @staticmethod
+    def _ranks(rows):
+        # The highest rank of each register, for each view and day, from (view_id, created, session) tuples
+        sketches = {}
+        for view_id, created, session in rows:
+            register, rank = hll.register_and_rank(session)
+            ranks = sketches.setdefault((view_id, _local_date(created)), {})
+            ranks[register] = max(ranks.get(register, 0), rank)
+        return sketches
+
+
+class FeedbackSessionSketch(models.Model):
+    """
+    A HyperLogLog sketch of the sessions that gave feedback on a view each day, stored as one row per register that a
+    session has hashed to.  Sketches for any range of days are merged by taking the highest rank of each register.
+    """
+
+    view = models.ForeignKey(FeedbackView, on_delete=models.PROTECT, db_index=False)
+    day = models.DateField()
+    register = models.SmallIntegerField()
+    rank = models.SmallIntegerField()
+
+    objects = FeedbackSessionSketchQuerySet.as_manager()
+
+    def __str__(self):
+        return '{0} - {1} - {2}'.format(self.view, self.day, self.register)
+
+    class Meta:
+        ordering = ('-day', 'view', 'register')
+        unique_together = ('view', 'day', 'register')
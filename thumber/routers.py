@@ -0,0 +1,38 @@
+from .conf import get_setting
+
+
+def _is_thumber_model(model):
+    return model._meta.app_label == 'thumber'
+
+
+class ThumberRouter:
+    """
+    Keeps thumber's models in the THUMBER_DATABASE database, away from the project's own models, e.g.
+
+        DATABASE_ROUTERS = ['thumber.routers.ThumberRouter']
+
+    All of thumber's own queries use this database, apart from its analytic queries, which go to THUMBER_READ_DATABASE
+    if it is set (e.g. to a read replica).  When THUMBER_DATABASE isn't set, the router leaves the decision to the
+    project's other routers, or the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _is_thumber_model(model):
+            return get_setting('THUMBER_DATABASE')
+        return None
+
+    def db_for_write(self, model, **hints):
+        if _is_thumber_model(model):
+            return get_setting('THUMBER_DATABASE')
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if _is_thumber_model(obj1) and _is_thumber_model(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        database = get_setting('THUMBER_DATABASE')
+        if app_label != 'thumber' or database is None:
+            return None
+        return db == database
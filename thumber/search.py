@@ -0,0 +1,63 @@
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+# Must match the index created by the 0010_feedback_comment_search migration
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'thumber_feedback_fts'
+
+
+def _has_fts_table(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM sqlite_master WHERE type = %s AND name = %s',
+            ['table', FTS_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def _fts_query(words):
+    # Each word is quoted, so that it's matched as a word rather than parsed as FTS5 query syntax
+    return ' '.join('"{0}"'.format(word.replace('"', '""')) for word in words)
+
+
+def search_comments(queryset, query):
+    """
+    The Feedback in the queryset whose comments contain all the words in the query, using the full-text index on
+    PostgreSQL or SQLite, or else scanning the comments
+    """
+    words = query.split()
+    if not words:
+        return queryset.none()
+
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        # Only imported on PostgreSQL, since it needs psycopg
+        from django.contrib.postgres.search import SearchQuery, SearchVectorField
+        from django.db.models import Func, Value
+        from django.db.models.functions import Coalesce
+
+        # The same expression as the GIN index, so the index is used
+        vector = Func(
+            Value(SEARCH_CONFIG),
+            Coalesce('comment', Value('')),
+            function='to_tsvector',
+            output_field=SearchVectorField(),
+        )
+        return queryset.alias(comment_vector=vector).filter(
+            comment_vector=SearchQuery(
+                ' '.join(words), config=SEARCH_CONFIG, search_type='plain'
+            )
+        )
+
+    if connection.vendor == 'sqlite' and _has_fts_table(connection):
+        matches = RawSQL(
+            'SELECT rowid FROM {0} WHERE {0} MATCH %s'.format(FTS_TABLE),
+            [_fts_query(words)],
+        )
+        return queryset.filter(pk__in=matches)
+
+    condition = Q()
+    for word in words:
+        condition &= Q(comment__icontains=word)
+    return queryset.filter(condition)
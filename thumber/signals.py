@@ -0,0 +1,17 @@
+from django.dispatch import Signal
+
+# Sent when new Feedback is submitted, with the `request` and the `feedback` (which, in buffered mode, won't have been
+# written to the database yet)
+feedback_submitted = Signal()
+
+# Sent when a comment is added to Feedback, with the `request`, the `feedback_id` (the pk, or reference in buffered
+# mode), and the `comment`
+feedback_commented = Signal()
+
+# Sent when a submission can't be handled, with the `request`, the `stage` that failed, and the `exception` (which is
+# None where the submission was rejected, e.g. a comment for Feedback that can't be found)
+feedback_failed = Signal()
+
+# Sent after each instrumented stage of handling feedback (see thumber.metrics.STAGES), with the `stage` and its
+# `duration` in seconds.  Stages are only timed while this signal has receivers, or metrics are enabled
+stage_timed = Signal()
@@ -0,0 +1,319 @@
+"""
+An append-only local spool of feedback, as newline delimited JSON, which feedback is written to when the database
+can't be (or, with THUMBER_SPOOL_MODE = 'always', instead of the database), and which the thumber_replay management
+command writes to the database later.
+
+Every process appends to the same file, THUMBER_SPOOL_PATH, holding an exclusive lock on it while it writes.  Once the
+file reaches THUMBER_SPOOL_MAX_BYTES it's renamed to a segment (the path with a timestamp suffix) and a new file is
+started, and thumber_replay ingests the segments in order, deleting each once it has been written to the database.
+"""
+
+import datetime
+import glob
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .conf import get_setting
+from .models import (
+    Feedback,
+    FeedbackDailyRollup,
+    FeedbackSessionSketch,
+    ViewArgsEncoder,
+)
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Without file locks (e.g. on Windows) the spool is only safe to share between the threads of a single process
+    fcntl = None
+
+SPOOL_MODES = (None, 'fallback', 'always')
+
+# The suffix of spool segments, the time the file was rotated and the id of the process that rotated it
+_SEGMENT_SUFFIX = re.compile(r'\.\d{20}-\d+$')
+
+
+def get_spool_mode():
+    spool_mode = get_setting('THUMBER_SPOOL_MODE')
+    if spool_mode not in SPOOL_MODES:
+        raise ImproperlyConfigured(
+            'THUMBER_SPOOL_MODE must be None, "fallback" or "always"'
+        )
+    if spool_mode is not None and not get_setting('THUMBER_SPOOL_PATH'):
+        raise ImproperlyConfigured(
+            'THUMBER_SPOOL_PATH must be set when THUMBER_SPOOL_MODE is'
+        )
+    return spool_mode
+
+
+def _same_file(spool_file, path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(spool_file.fileno())
+    return (stat.st_dev, stat.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+class FeedbackSpool:
+    """
+    Appends feedback, and comments on it, to the spool file.  Each record is written with a single `write` while the
+    file is locked, and fsynced according to THUMBER_SPOOL_FSYNC_INTERVAL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_sync = None
+
+    def add(self, feedback):
+        """
+        Spool new (unsaved) Feedback, returns its reference, which identifies it until it's been replayed
+        """
+        created = feedback.created or timezone.now()
+        self.append(
+            {
+                'type': 'feedback',
+                'reference': feedback.reference,
+                'created': created.isoformat(),
+                'satisfied': feedback.satisfied,
+                'comment': feedback.comment,
+                'url': feedback.url,
+                'view_name': feedback.view_name,
+                'view_args': feedback.view_args,
+                'session': feedback.session,
+            }
+        )
+        return feedback.reference
+
+    def set_comment(self, feedback_id, session, comment):
+        """
+        Spool a comment on Feedback, identified by its pk, or its reference if it was spooled or buffered
+        """
+        self.append(
+            {
+                'type': 'comment',
+                'id': feedback_id,
+                'session': session,
+                'comment': comment,
+            }
+        )
+
+    def append(self, record):
+        line = json.dumps(record, cls=ViewArgsEncoder, separators=(',', ':'))
+        path = get_setting('THUMBER_SPOOL_PATH')
+
+        with self._lock, self._open(path) as spool_file:
+            if spool_file.seek(0, os.SEEK_END):
+                # A record left incomplete (e.g. by a process that was killed while writing it) is ended, so that it
+                # doesn't run into this one
+                spool_file.seek(-1, os.SEEK_END)
+                if spool_file.read(1) != b'\n':
+                    line = '\n' + line
+            spool_file.write(line.encode('utf-8') + b'\n')
+            spool_file.flush()
+            self._sync(spool_file)
+            if spool_file.tell() >= get_setting('THUMBER_SPOOL_MAX_BYTES'):
+                self._rotate(path)
+
+    def rotate(self):
+        """
+        Start a new spool file, so that everything spooled so far is in a segment that can be replayed
+        """
+        path = get_setting('THUMBER_SPOOL_PATH')
+        if not os.path.exists(path):
+            return
+
+        with self._lock, self._open(path) as spool_file:
+            if spool_file.seek(0, os.SEEK_END):
+                self._rotate(path)
+
+    def segments(self):
+        """
+        The paths of the spool's segments, oldest first
+        """
+        path = get_setting('THUMBER_SPOOL_PATH')
+        return sorted(
+            segment
+            for segment in glob.glob(glob.escape(path) + '.*')
+            if _SEGMENT_SUFFIX.search(segment[len(path) :])
+        )
+
+    @contextmanager
+    def _open(self, path):
+        # The file is opened, and locked, until it's the one at the path, since another process may rotate it between
+        # the two
+        while True:
+            spool_file = open(path, 'a+b')
+            try:
+                if fcntl is not None:
+                    fcntl.flock(spool_file.fileno(), fcntl.LOCK_EX)
+                if _same_file(spool_file, path):
+                    break
+            except BaseException:
+                spool_file.close()
+                raise
+            spool_file.close()
+
+        try:
+            yield spool_file
+        finally:
+            # Closing the file releases the lock
+            spool_file.close()
+
+    def _sync(self, spool_file):
+        interval = get_setting('THUMBER_SPOOL_FSYNC_INTERVAL')
+        if interval is None:
+            return
+
+        now = time.monotonic()
+        if self._last_sync is None or now - self._last_sync >= interval:
+            os.fsync(spool_file.fileno())
+            self._last_sync = now
+
+    @staticmethod
+    def _rotate(path):
+        suffix = '{0:%Y%m%d%H%M%S%f}-{1}'.format(datetime.datetime.now(), os.getpid())
+        os.rename(path, '{0}.{1}'.format(path, suffix))
+
+
+def read_segment(segment):
+    """
+    The records in a spool segment, and the number of lines that were skipped because they couldn't be read (e.g. a
+    record that was only partly written when the process writing it was killed)
+    """
+    records = []
+    skipped = 0
+    with open(segment, 'rb') as segment_file:
+        for line in segment_file:
+            try:
+                if not line.endswith(b'\n'):
+                    raise ValueError('Incomplete record')
+                records.append(json.loads(line.decode('utf-8')))
+            except ValueError:
+                skipped += 1
+    return records, skipped
+
+
+def replay(records, using=None, batch_size=500):
+    """
+    Write spooled records to the database, in the order they were spooled, returns the number of Feedback and comments
+    written.  Feedback is written in batches, each with a single `bulk_create`, and Feedback that has already been
+    written (e.g. by an earlier replay of the same records) is skipped, so records can safely be replayed again.
+    """
+    using = using or router.db_for_write(Feedback)
+    feedback_count = comment_count = 0
+    pending = []
+
+    for record in records:
+        if record.get('type') == 'feedback':
+            pending.append(record)
+            if len(pending) >= batch_size:
+                feedback_count += _replay_feedback(pending, using)
+                pending = []
+        elif record.get('type') == 'comment':
+            # The comment may be on Feedback that's still pending
+            feedback_count += _replay_feedback(pending, using)
+            pending = []
+            comment_count += _replay_comment(record, using)
+
+    feedback_count += _replay_feedback(pending, using)
+    return feedback_count, comment_count
+
+
+def _replay_feedback(records, using):
+    feedback_list = {}
+    for record in records:
+        feedback = Feedback(
+            created=parse_datetime(record['created']),
+            satisfied=record['satisfied'],
+            comment=record['comment'],
+            url=record['url'],
+            view_args=record['view_args'],
+            session=record['session'],
+            reference=record['reference'],
+        )
+        feedback.view_name = record['view_name']
+        feedback_list.setdefault(feedback.reference, feedback)
+    if not feedback_list:
+        return 0
+
+    feedback = Feedback.objects.using(using)
+    if get_setting('THUMBER_ONE_VOTE_PER_VIEW'):
+        with transaction.atomic(using=using):
+            new = _newer_votes(list(feedback_list.values()), using)
+            # Adjusts the rollups and sketches itself
+            feedback.upsert_votes(new)
+        return len(new)
+
+    with transaction.atomic(using=using):
+        written = set(
+            feedback.filter(reference__in=list(feedback_list)).values_list(
+                'reference', flat=True
+            )
+        )
+        new = [f for f in feedback_list.values() if f.reference not in written]
+        created = [f.created for f in new]
+        feedback.bulk_create(new, keep_counts=True)
+
+        # Saving sets the time the Feedback was created to now, so it's put back to when the Feedback was given
+        if any(f.pk is None for f in new):
+            pks = dict(
+                feedback.filter(reference__in=[f.reference for f in new]).values_list(
+                    'reference', 'pk'
+                )
+            )
+            for f in new:
+                f.pk = pks[f.reference]
+        for f, given in zip(new, created):
+            f.created = given
+        # The new Feedback is recorded in the rollups below, once its created times are put back
+        feedback.bulk_update(new, ['created'], keep_counts=True)
+
+        FeedbackDailyRollup.objects.using(using).record(new)
+        FeedbackSessionSketch.objects.using(using).record(new)
+
+    return len(new)
+
+
+def _newer_votes(feedback_list, using):
+    # A session's vote on a view only replaces the one in the database if it was given after that was last changed,
+    # so that replaying records again doesn't undo the votes that have been given since
+    Feedback.resolve_views(feedback_list, using=using)
+    keys = Q()
+    for f in feedback_list:
+        keys |= Q(view_id=f.view_id, vote_session=f.session)
+    saved = Feedback.objects.using(using).filter(keys)
+    updated = {
+        (view_id, vote_session): changed
+        for view_id, vote_session, changed in saved.values_list(
+            'view_id', 'vote_session', 'updated'
+        )
+    }
+    return [
+        f
+        for f in feedback_list
+        if (f.view_id, f.session) not in updated
+        or updated[(f.view_id, f.session)] < f.created
+    ]
+
+
+def _replay_comment(record, using):
+    feedback_id = str(record['id'])
+    lookup = (
+        {'pk': feedback_id} if feedback_id.isdigit() else {'reference': feedback_id}
+    )
+    feedback = Feedback.objects.using(using).filter(session=record['session'], **lookup)
+    return 1 if feedback.set_comment(record['comment']) else 0
+
+
+feedback_spool = FeedbackSpool()
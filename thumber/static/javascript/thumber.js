@@ -1,116 +1,235 @@
-var thumber = (function ($) {
-
-    var form = $('.thumber-form'),
-        radio_input = $('.thumber-form input[type=radio]'),
-        radio_label = $('label[for=' + $(radio_input[0]).attr('id') + '], label[for=' + $(radio_input[1]).attr('id') + ']'),
-        textarea_input = $('.thumber-form textarea'),
-        textarea_label = $('label[for=' + textarea_input.attr('id') + ']'),
-        submit = $('.thumber-form input[type=submit]'),
-        thanks_holder = $('.thumber-success'),
-        error_holder = $('.thumber-error'),
-        success = null,
-        error = null,
-        radio, textarea, id;
-
-    radio = radio_input.add(radio_label);
-    textarea = textarea_input.add(textarea_label);
-
-    thanks_holder.hide();
-    error_holder.hide();
-    textarea.hide();
-    submit.hide();
-
-    radio_input.on('change', handleForm);
-    form.on('submit', handleForm);
-
-    function handleForm(event) {
-
-        var data = {
-            'thumber_token': 'ajax',
-            'csrfmiddlewaretoken': $('input[name="csrfmiddlewaretoken"]', form).val()
-        };
-
-        switch($(event.currentTarget).val()) {
-            case 'False':
-                data.satisfied = 'False';
-                $.when(feedbackRequest(data))
-                    .done(function (response) {
-                        id = response.id;
-                        radio.hide()
-                        textarea.show();
-                        submit.show();
-                    })
-                    .fail(function () {
-                        handleError();
-                    });
-                break;
-            case 'True':
-                data.satisfied = 'True';
-                $.when(feedbackRequest(data))
-                    .done(function () {
-                        form.hide();
-                        handleSuccess();
-                    })
-                    .fail(function () {
-                        handleError();
-                    });
-                break;
-            default:
-                event.preventDefault();
-                data.id = id;
-                data.comment = textarea_input.val();
-
-                $.when(feedbackRequest(data))
-                    .done(function () {
-                        form.hide();
-                        handleSuccess();
-                    })
-                    .fail(function () {
-                        handleError();
-                    });
+var thumber = (function () {
+
+    var success = null,
+        error = null;
+
+    // Forms are found when they're used, by listening on the document, so the script can be loaded with defer or async,
+    // and works for any number of widgets on the page
+    document.addEventListener('change', function (event) {
+        var form = closestForm(event.target);
+        if (form !== null && event.target.type === 'radio') {
+            vote(form, event.target.value);
+        }
+    });
+
+    document.addEventListener('submit', function (event) {
+        var form = closestForm(event.target);
+        if (form !== null) {
+            event.preventDefault();
+            comment(form);
+        }
+    });
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', setUp);
+    } else {
+        setUp();
+    }
+
+    function setUp() {
+        var forms = document.querySelectorAll('.thumber-form'),
+            ind;
+
+        for (ind = 0; ind < forms.length; ind++) {
+            // Only the radio buttons are shown, until a negative vote asks for a comment
+            hide(sibling(forms[ind], 'thumber-success'));
+            hide(sibling(forms[ind], 'thumber-error'));
+            toggle(commentElements(forms[ind]), false);
+        }
+    }
+
+    function vote(form, satisfied) {
+        var data = formData(form);
+        data.satisfied = satisfied;
+
+        // The vote is sent so that it isn't lost if the visitor navigates away straight after giving it
+        feedbackRequest(form, data, true, function (response) {
+            if (satisfied === 'False') {
+                form.thumberId = response && response.id;
+                toggle(radioElements(form), false);
+                toggle(commentElements(form), true);
+            } else {
+                hide(form);
+                handleSuccess(form);
+            }
+        });
+    }
+
+    function comment(form) {
+        var data = formData(form),
+            textarea = form.querySelector('textarea');
+
+        data.id = form.thumberId || '';
+        data.comment = textarea ? textarea.value : '';
+        feedbackRequest(form, data, false, function () {
+            hide(form);
+            handleSuccess(form);
+        });
+    }
+
+    function formData(form) {
+        var data = {'thumber_token': 'ajax'},
+            names = ['csrfmiddlewaretoken', 'thumber_identity', 'thumber_reference', 'thumber_view'],
+            input, ind;
+
+        for (ind = 0; ind < names.length; ind++) {
+            input = form.querySelector('input[name="' + names[ind] + '"]');
+            if (input !== null) {
+                data[names[ind]] = input.value;
+            }
+        }
+        return data;
+    }
+
+    function encode(data) {
+        var pairs = [],
+            name;
+
+        for (name in data) {
+            if (data.hasOwnProperty(name)) {
+                pairs.push(encodeURIComponent(name) + '=' + encodeURIComponent(data[name]));
+            }
+        }
+        return pairs.join('&');
+    }
+
+    function feedbackRequest(form, data, keepalive, done) {
+        var url = form.getAttribute('action') || window.location.href,
+            body = encode(data),
+            type = 'application/x-www-form-urlencoded',
+            xhr;
+
+        function fail() {
+            handleError(form);
+        }
+
+        if (window.fetch) {
+            window.fetch(url, {
+                method: 'POST',
+                body: body,
+                headers: {'Content-Type': type, 'Accept': 'application/json'},
+                credentials: 'same-origin',
+                keepalive: keepalive
+            }).then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status);
+                }
+                return response.json();
+            }).then(done, fail);
+        } else if (keepalive && data.satisfied === 'True' && navigator.sendBeacon &&
+                   navigator.sendBeacon(url, new Blob([body], {type: type}))) {
+            // A positive vote doesn't need the response, so it can be queued as a beacon
+            done(null);
+        } else {
+            xhr = new XMLHttpRequest();
+            xhr.open('POST', url);
+            xhr.setRequestHeader('Content-Type', type);
+            xhr.setRequestHeader('Accept', 'application/json');
+            xhr.onload = function () {
+                if (xhr.status >= 200 && xhr.status < 300) {
+                    done(JSON.parse(xhr.responseText));
+                } else {
+                    fail();
+                }
+            };
+            xhr.onerror = fail;
+            xhr.send(body);
         }
     }
 
-    function handleSuccess() {
+    function closestForm(element) {
+        while (element && element !== document) {
+            if (element.nodeName === 'FORM') {
+                return (' ' + element.className + ' ').indexOf(' thumber-form ') !== -1 ? element : null;
+            }
+            element = element.parentNode;
+        }
+        return null;
+    }
+
+    function sibling(form, className) {
+        // The thank you and error messages follow the form they belong to
+        var element = form.nextElementSibling;
+        while (element !== null) {
+            if ((' ' + element.className + ' ').indexOf(' ' + className + ' ') !== -1) {
+                return element;
+            }
+            element = element.nextElementSibling;
+        }
+        return null;
+    }
+
+    function labelled(form, inputs) {
+        var elements = [],
+            label, ind;
+
+        for (ind = 0; ind < inputs.length; ind++) {
+            elements.push(inputs[ind]);
+            label = form.querySelector('label[for="' + inputs[ind].id + '"]');
+            if (label !== null) {
+                elements.push(label);
+            }
+        }
+        return elements;
+    }
+
+    function radioElements(form) {
+        return labelled(form, form.querySelectorAll('input[type=radio]'));
+    }
+
+    function commentElements(form) {
+        return labelled(form, form.querySelectorAll('textarea, input[type=submit]'));
+    }
+
+    function toggle(elements, visible) {
+        var ind;
+
+        for (ind = 0; ind < elements.length; ind++) {
+            elements[ind].style.display = visible ? '' : 'none';
+        }
+    }
+
+    function hide(element) {
+        if (element !== null) {
+            element.style.display = 'none';
+        }
+    }
+
+    function show(element) {
+        // The thank you and error messages may have been left out of a customised template
+        if (element !== null) {
+            element.style.display = '';
+        }
+    }
+
+    function handleSuccess(form) {
         if (success !== null) {
-            success();
+            success(form);
         } else {
-            thanks_holder.show();
+            show(sibling(form, 'thumber-success'));
         }
     }
 
-    function handleError() {
+    function handleError(form) {
         if (error !== null) {
-            error();
+            error(form);
         } else {
-            form.hide();
-            error_holder.show();
+            hide(form);
+            show(sibling(form, 'thumber-error'));
         }
     }
 
     function setSuccessHandler(func) {
-        success = func
+        success = func;
     }
 
     function setErrorHandler(func) {
-        error = func
-    }
-
-    function feedbackRequest(data) {
-
-        var feedback = $.ajax({
-            url: form.attr('action'),
-            type: 'POST',
-            dataType: 'json',
-            data: data
-        });
-
-        return feedback;
+        error = func;
     }
 
     return {
         setSuccessHandler: setSuccessHandler,
-        setErrorHandler: setErrorHandler,
-    }
+        setErrorHandler: setErrorHandler
+    };
 
-}(jQuery));
+}());
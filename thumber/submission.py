@@ -0,0 +1,47 @@
+import json
+
+from django.core import signing
+
+from .models import ViewArgsEncoder
+
+VIEW_SALT = 'thumber.view'
+
+
+class ViewSerializer(signing.JSONSerializer):
+    # URL converters can give view arguments (e.g. UUIDs) that the standard JSON encoder can't
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'), cls=ViewArgsEncoder).encode(
+            'latin-1'
+        )
+
+
+def sign_view(request):
+    """
+    Sign the page's URL, and the name and arguments of its view, so that feedback posted to the submission endpoint can
+    be recorded against them without resolving the referer
+    """
+    match = request.resolver_match
+    return signing.dumps(
+        [request.build_absolute_uri(), match.view_name, match.args, match.kwargs],
+        salt=VIEW_SALT,
+        serializer=ViewSerializer,
+        compress=True,
+    )
+
+
+def get_signed_view(request):
+    """
+    The page's url, view name, and view arguments (as {"args": [...], "kwargs": {...}}) from the signed token posted
+    with the feedback form, returns None if it's missing or invalid
+    """
+    token = request.POST.get('thumber_view', None)
+    if not token:
+        return None
+
+    try:
+        url, view_name, args, kwargs = signing.loads(
+            token, salt=VIEW_SALT, serializer=ViewSerializer
+        )
+    except (signing.BadSignature, ValueError, TypeError):
+        return None
+    return url, view_name, {'args': args, 'kwargs': kwargs}
@@ -0,0 +1,91 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .conf import get_setting
+from .identity import get_identity_mode, get_signed_identity
+
+
+def _get_visitor(request):
+    # Only the cookies (or posted token) are read, so that checking the throttle never touches the session store
+    if get_identity_mode() == 'signed':
+        return get_signed_identity(request)
+    return request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+
+
+def _get_ip_address(request):
+    value = request.META.get(get_setting('THUMBER_THROTTLE_IP_HEADER'), '')
+    # Each proxy appends the address it was connected from to X-Forwarded-For, and the client can send any addresses
+    # it likes at the start, so the client's address is the one appended by the furthest of the trusted proxies
+    addresses = [address.strip() for address in value.split(',')]
+    proxies = get_setting('THUMBER_THROTTLE_PROXY_COUNT')
+    return addresses[-min(proxies, len(addresses))] or None
+
+
+def _count(cache, key, window, now):
+    """
+    Count a submission against the key, and estimate the number of submissions in the sliding window ending now, by
+    weighting the previous fixed window's count by how much of it overlaps the sliding window
+    """
+    current = int(now // window)
+    current_key = '{0}:{1}'.format(key, current)
+    previous_key = '{0}:{1}'.format(key, current - 1)
+
+    cache.add(current_key, 0, timeout=window * 2)
+    try:
+        count = cache.incr(current_key)
+    except ValueError:
+        # The key expired between being added and incremented
+        cache.set(current_key, 1, timeout=window * 2)
+        count = 1
+
+    previous = cache.get(previous_key, 0)
+    overlap = 1 - (now % window) / window
+    return previous * overlap + count
+
+
+def _get_limits(request, view_name):
+    """
+    The (cache key, limit) of each limit the submission counts towards
+    """
+    limits = []
+    for scope, setting, get_value in [
+        ('visitor', 'THUMBER_THROTTLE_VISITOR_LIMIT', _get_visitor),
+        ('ip', 'THUMBER_THROTTLE_IP_LIMIT', _get_ip_address),
+    ]:
+        limit = get_setting(setting)
+        if limit is None:
+            continue
+        value = get_value(request)
+        if value is None:
+            continue
+
+        digest = hashlib.sha256('{0}|{1}'.format(value, view_name).encode()).hexdigest()
+        limits.append(('thumber:throttle:{0}:{1}'.format(scope, digest[:32]), limit))
+    return limits
+
+
+def _get_wait(window, now):
+    return max(int(window - now % window), 1)
+
+
+def get_throttle_wait(request, view_name):
+    """
+    Count a feedback submission to the view against its visitor's and IP address's limits, returns the number of
+    seconds until another submission could be accepted if either limit has been exceeded, otherwise None
+    """
+    limits = _get_limits(request, view_name)
+    if not limits:
+        return None
+
+    cache = caches[get_setting('THUMBER_THROTTLE_CACHE')]
+    window = get_setting('THUMBER_THROTTLE_WINDOW')
+    now = time.time()
+    throttled = False
+    for key, limit in limits:
+        if _count(cache, key, window, now) > limit:
+            throttled = True
+
+    return _get_wait(window, now) if throttled else None
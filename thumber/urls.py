@@ -0,0 +1,12 @@
+from django.urls import re_path
+
+from . import views
+
+app_name = 'thumber'
+
+
+urlpatterns = [
+    re_path(r'^submit$', views.FeedbackSubmitView.as_view(), name='submit'),
+    re_path(r'^stats$', views.SatisfactionStatsView.as_view(), name='stats'),
+    re_path(r'^metrics$', views.MetricsView.as_view(), name='metrics'),
+]
@@ -1,18 +1,180 @@
+import datetime
+import hashlib
 import os
+import uuid
+from functools import lru_cache
 from itertools import chain
 from urllib.parse import urlparse
 
-from django.conf import settings
-from django.http import HttpResponseNotAllowed, JsonResponse
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import Error
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.dispatch import receiver
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseNotAllowed,
+    HttpResponseRedirect,
+    JsonResponse,
+)
 from django.template.loader import get_template, select_template
-from django.urls import resolve
+from django.urls import Resolver404, get_urlconf, resolve, reverse
+from django.utils.autoreload import file_changed
+from django.utils.cache import patch_cache_control
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import url_has_allowed_host_and_scheme, urlencode
+from django.views.generic import View
 from six import string_types
 
-from .forms import ThumberForm
-from .models import Feedback
+from .buffer import feedback_buffer
+from .conf import get_setting
+from .export import today
+from .forms import (
+    CommentForm,
+    StatsForm,
+    ThumberForm,
+    ThumberWidget,
+    clear_widget_cache,
+    get_form_class,
+)
+from .identity import (
+    get_identity,
+    get_identity_mode,
+    get_signed_identity,
+    new_identity,
+    set_identity_cookie,
+    sign_identity,
+)
+from .metrics import metrics_enabled, registry, timed
+from .models import Feedback, FeedbackDailyRollup
+from .signals import feedback_commented, feedback_failed, feedback_submitted
+from .spool import feedback_spool, get_spool_mode
+from .submission import get_signed_view, sign_view
+from .throttling import get_throttle_wait
 
+# The number of days of statistics returned for each period, if the request doesn't give a start date
+DEFAULT_STATS_DAYS = {'hour': 2, 'day': 30, 'week': 7 * 26}
+
+# The largest PK a Feedback can have in any database, larger ids aren't looked up as SQLite would fail to convert them
+MAX_FEEDBACK_PK = BaseDatabaseOperations.integer_field_ranges['AutoField'][1]
+
+
+# The number of views whose feedback template names, and resolved templates, are remembered
+TEMPLATE_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _get_feedback_template_names(view_name):
+    templates = []
+    view_components = view_name.split(':')
+    templates.append(
+        os.path.join(*chain(['thumber'], view_components, ['feedback.html']))
+    )
+    if len(view_components) > 1:
+        for ind in range(1, len(view_components)):
+            # arbitrary namespaces can be used with a view, so iterate over all options building up paths to
+            # possible templates
+            template = os.path.join(
+                *chain(['thumber'], view_components[:-ind], ['feedback.html'])
+            )
+            templates.append(template)
+
+    # Add in the standard thumber feedback template as the fallback if no custom templates are found
+    templates.append(os.path.join('thumber', 'feedback.html'))
+
+    return tuple(templates)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _select_template(template_names, using=None):
+    return select_template(template_names, using=using)
+
+
+def clear_template_caches():
+    """
+    Forget the feedback template names and resolved templates cached for each view
+    """
+    _get_feedback_template_names.cache_clear()
+    _select_template.cache_clear()
+    clear_widget_cache()
+
+
+@receiver(file_changed, dispatch_uid='thumber_template_caches_file_changed')
+def _file_changed(sender, file_path, **kwargs):
+    # The autoreloader has noticed a change (e.g. to a template) in DEBUG, so the cached templates may be stale
+    clear_template_caches()
+    clear_resolve_cache()
+
+
+def _resolve_view_name(path, urlconf):
+    try:
+        return resolve(path, urlconf=urlconf).view_name
+    except Resolver404:
+        return None
+
+
+@lru_cache(maxsize=1)
+def _get_view_name_resolver():
+    # Built on first use, so the cache size can come from the settings
+    return lru_cache(maxsize=get_setting('THUMBER_RESOLVE_CACHE_SIZE'))(
+        _resolve_view_name
+    )
+
+
+def clear_resolve_cache():
+    """
+    Forget the view names cached for each referring path
+    """
+    _get_view_name_resolver.cache_clear()
+
+
+@receiver(setting_changed, dispatch_uid='thumber_template_caches_setting_changed')
+def _setting_changed(sender, setting, **kwargs):
+    if setting in ('TEMPLATES', 'FORM_RENDERER', 'LANGUAGE_CODE'):
+        clear_template_caches()
+    elif setting in ('ROOT_URLCONF', 'THUMBER_RESOLVE_CACHE_SIZE'):
+        clear_resolve_cache()
+
+
+# The view attributes (or `get_` methods) that change the widget's wording, the first six of which configure the form
+WORDING_ATTRIBUTES = (
+    'satisfied_wording',
+    'yes_wording',
+    'no_wording',
+    'comment_wording',
+    'comment_placeholder',
+    'first_option_yes',
+    'submit_wording',
+    'thanks_message',
+    'error_message',
+)
+FORM_OPTIONS = WORDING_ATTRIBUTES[:6]
+
+# Marks wording that has to be looked up on each request, since the view works it out with a method or property
+DYNAMIC = object()
+
+
+class _InvalidForm(Exception):
+    def __init__(self, form):
+        super().__init__('The feedback form is not valid')
+        self.form = form
+
+
+class _NoIdentity(Exception):
+    pass
+
+
+class BaseThumberView:
+    """
+    The behaviour shared by the synchronous ThumberView, and the AsyncThumberView used for views with async handlers
+    """
+
+    # The form options, as sorted (name, value) pairs, if they're the same for every request
+    _thumber_options = None
 
-class ThumberView:
     _satisfied_wording = 'Was this service useful?'
     _yes_wording = 'Yes, thanks'
     _no_wording = 'Not really'
@@ -23,30 +185,91 @@ class ThumberView:
     _error_message = 'Sorry, something went wrong'
     _first_option_yes = True
 
-    def get(self, request, *args, **kwargs):
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if issubclass(cls, View):
+            # The class made by the thumber_feedback decorator (or a subclass of it), so the wording that is fixed can
+            # be worked out now, rather than on every request
+            cls._compile_wording()
+
+    @classmethod
+    def _compile_wording(cls):
+        """
+        Set each fixed piece of wording as a plain class attribute, replacing the properties that look it up, and the
+        form options too if they're all fixed.  Wording given by `get_` methods (or properties) is still looked up per
+        request
+        """
+        options = []
+        for name in WORDING_ATTRIBUTES:
+            value = cls._get_fixed_wording(name)
+            if value is DYNAMIC:
+                setattr(cls, name, BaseThumberView.__dict__[name])
+            else:
+                setattr(cls, name, value)
+            if name in FORM_OPTIONS:
+                options.append((name, value))
+
+        cls._thumber_compiled = frozenset(WORDING_ATTRIBUTES)
+        if all(value is not DYNAMIC for _, value in options):
+            cls._thumber_options = tuple(sorted(options))
+        else:
+            cls._thumber_options = None
+
+    @classmethod
+    def _get_fixed_wording(cls, name):
+        # Follows the lookups made by the wording properties, finding the first definition that isn't a compiled one
+        for klass in cls.__mro__:
+            attrs = vars(klass)
+            if name not in attrs or name in attrs.get('_thumber_compiled', ()):
+                continue
+            if klass is BaseThumberView:
+                if hasattr(cls, 'get_' + name):
+                    return DYNAMIC
+                continue
+
+            value = attrs[name]
+            if hasattr(type(value), '__get__'):
+                return DYNAMIC
+            return value
+        return getattr(cls, '_' + name)
+
+    def _get_thumber_options(self):
+        if self._thumber_options is not None:
+            return self._thumber_options
+        return tuple(sorted((name, getattr(self, name)) for name in FORM_OPTIONS))
+
+    def _start_visit(self, request):
+        """
+        Identify the visitor viewing the page, returns True if they're new and need the identity cookie setting
+        """
+        if get_identity_mode() == 'signed':
+            # The visitor is identified by a signed cookie (and a signed token in the form), so the session store is
+            # never touched
+            self.thumber_identity = get_signed_identity(request)
+            if self.thumber_identity is not None:
+                return False
+
+            self.thumber_identity = new_identity()
+            return True
+
         # Need to set something in the session to ensure that the user gets a session cookie
-        self.request.session['thumber'] = None
-        return super().get(request, *args, **kwargs)
+        request.session['thumber'] = None
+        return False
 
     def get_template_names(self):
-        templates = []
-        view_components = self.request.resolver_match.view_name.split(':')
-        templates.append(
-            os.path.join(*chain(['thumber'], view_components, ['feedback.html']))
-        )
-        if len(view_components) > 1:
-            for ind in range(1, len(view_components)):
-                # arbitrary namespaces can be used with a view, so iterate over all options building up paths to
-                # possible templates
-                template = os.path.join(
-                    *chain(['thumber'], view_components[:-ind], ['feedback.html'])
-                )
-                templates.append(template)
-
-        # Add in the standard thumber feedback template as the fallback if no custom templates are found
-        templates.append(os.path.join('thumber', 'feedback.html'))
+        # The candidates only depend on the view name, so are built once per view and cached
+        return list(_get_feedback_template_names(self.request.resolver_match.view_name))
 
-        return templates
+    def render_to_response(self, context, **response_kwargs):
+        response = super().render_to_response(context, **response_kwargs)
+        template = getattr(response, 'template_name', None)
+        if isinstance(template, (list, tuple)):
+            # Resolve the candidate templates now, using the cache, rather than leaving the response to look them up
+            with timed('template'):
+                response.template_name = _select_template(
+                    tuple(template), using=response.using
+                )
+        return response
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -56,19 +279,26 @@ class ThumberView:
         if (
             self.request.method == 'POST'
             and self.request.POST.get('thumber_token', None) == 'sync'
-        ):
-            # feedback has been given via non AJAX request, add the 'thank you' message to the context
+        ) or self.request.GET.get('thumber', None) == 'thanks':
+            # feedback has been given via non AJAX request (posted to this view, or to the submission endpoint, which
+            # redirects back here), add the 'thank you' message to the context
             context['thanks_message'] = self.thanks_message
         else:
-            options = {
-                'satisfied_wording': self.satisfied_wording,
-                'yes_wording': self.yes_wording,
-                'no_wording': self.no_wording,
-                'comment_wording': self.comment_wording,
-                'comment_placeholder': self.comment_placeholder,
-                'first_option_yes': self.first_option_yes,
-            }
-            context['thumber_form'] = ThumberForm(**options)
+            options = self._get_thumber_options()
+            # A reference for the feedback is generated up front, so that repeated submissions of the form can be
+            # recognised
+            initial = {'thumber_reference': uuid.uuid4().hex}
+            if getattr(self, 'thumber_identity', None) is not None:
+                initial['thumber_identity'] = sign_identity(self.thumber_identity)
+            if get_setting('THUMBER_SUBMIT_ENDPOINT'):
+                # The form is posted to the submission endpoint, along with the view it was given on
+                initial['thumber_view'] = sign_view(self.request)
+                context['thumber_action'] = reverse('thumber:submit')
+            # The widget is rendered from a cache, so the form itself is only built if a template uses it
+            context['thumber_widget'] = ThumberWidget(options, initial)
+            context['thumber_form'] = SimpleLazyObject(
+                lambda: get_form_class(options)(initial=initial)
+            )
             context.update(options)
             context['submit_wording'] = self.submit_wording
             context['thanks_message'] = self.thanks_message
@@ -83,58 +313,240 @@ class ThumberView:
         """
         template = super().get_template_names()
 
-        if isinstance(template, (list, tuple)):
-            return select_template(template)
-        elif isinstance(template, string_types):
-            return get_template(template)
-        else:
-            return template
-
-    def post(self, request, *args, **kwargs):
-        if request.POST.get('thumber_token', None) is not None:
-            pk = request.POST.get('id', None)
-            if pk is None or pk == '':
-                # No PK, this means we need to create a new Feedback object
-                http_referer = self.request.META.get('HTTP_REFERER')
-                sessionid = self.request.COOKIES[settings.SESSION_COOKIE_NAME]
-                user_feedback = ThumberForm(data=request.POST).save(commit=False)
-                user_feedback.url = http_referer
-                user_feedback.view_name = self._get_view_from_url(http_referer)
-                user_feedback.session = sessionid
-                user_feedback.view_args = (
-                    request.resolver_match.args,
-                    request.resolver_match.kwargs,
-                )
+        with timed('template'):
+            if isinstance(template, (list, tuple)):
+                return _select_template(tuple(template))
+            elif isinstance(template, string_types):
+                return get_template(template)
             else:
-                # PK given, so this Feedback already exists and just needs the comment adding
-                user_feedback = Feedback.objects.get(pk=pk)
-                user_feedback.comment = request.POST['comment']
+                return template
+
+    def _is_feedback(self, request):
+        return request.POST.get('thumber_token', None) is not None
+
+    def _get_write_mode(self):
+        write_mode = get_setting('THUMBER_WRITE_MODE')
+        if write_mode not in ('sync', 'buffered'):
+            raise ImproperlyConfigured(
+                'THUMBER_WRITE_MODE must be either "sync" or "buffered"'
+            )
+        return write_mode
+
+    def _throttled(self, request, wait):
+        # Too many submissions, which are turned away before any database work is done
+        feedback_failed.send(
+            sender=type(self), request=request, stage='throttle', exception=None
+        )
+        response = JsonResponse({'success': False}, status=429)
+        response['Retry-After'] = str(wait)
+        return response
+
+    def _failed(self, request, exc):
+        feedback_failed.send(
+            sender=type(self), request=request, stage='post', exception=exc
+        )
+
+    def _database_failed(self, request, exc):
+        # The database couldn't be written to, so the submission is spooled instead
+        feedback_failed.send(
+            sender=type(self), request=request, stage='database', exception=exc
+        )
+
+    def _invalid(self, request, form):
+        feedback_failed.send(
+            sender=type(self), request=request, stage='form', exception=None
+        )
+        return JsonResponse(
+            {'success': False, 'errors': form.errors.get_json_data()}, status=400
+        )
+
+    def _not_found(self, request):
+        feedback_failed.send(
+            sender=type(self), request=request, stage='comment', exception=None
+        )
+        return JsonResponse({'success': False}, status=404)
+
+    def _succeeded(self, feedback_id):
+        # AJAX submission, inform frontend the frontend the POST was successful, and give the id back so it can be
+        # updated in a separate request
+        return JsonResponse({'success': True, 'id': feedback_id})
+
+    def _method_not_allowed(self):
+        methods = [
+            m.upper()
+            for m in self.http_method_names
+            if hasattr(self, m) and m.upper() != 'POST'
+        ]
+        return HttpResponseNotAllowed(methods)
+
+    def _handle_feedback(self, request, view_name):
+        """
+        Handle posted feedback (or a comment on it) for the view, after throttling submissions.  Returns the response,
+        or None for a non-AJAX post that has been handled, which is answered with the page
+        """
+        wait = get_throttle_wait(request, view_name)
+        if wait is not None:
+            return self._throttled(request, wait)
+
+        with timed('post'):
+            try:
+                feedback_id = self._save_feedback(request)
+            except _InvalidForm as exc:
+                return self._invalid(request, exc.form)
+            except _NoIdentity:
+                # In session mode, without a session cookie, e.g. posted to the submission endpoint from a page that
+                # never started a session, so the visitor can't be identified
+                return JsonResponse({'success': False}, status=400)
+            except Exception as exc:
+                self._failed(request, exc)
+                raise
+
+        if feedback_id is None:
+            return self._not_found(request)
 
-            user_feedback.save()
+        if request.POST.get('thumber_token', None) == 'sync':
+            return None
+        return self._succeeded(feedback_id)
 
-            if request.POST.get('thumber_token', None) == 'sync':
-                # Non-AJAX post, we've now done the processing, so return super's GET response
-                return self.get(request)
+    def _save_feedback(self, request):
+        """
+        Save new Feedback, or add a comment to existing Feedback, from the posted form.  Returns the id of the Feedback,
+        or None if the Feedback to comment on can't be found.  Depending on THUMBER_SPOOL_MODE, the Feedback or comment
+        is written to the spool instead, either always or when the database can't be written to.
+        """
+        write_mode = self._get_write_mode()
+        spool_mode = get_spool_mode()
+        sessionid = get_identity(request)
+        if sessionid is None:
+            raise _NoIdentity()
+
+        pk = request.POST.get('id', None)
+        if pk is None or pk == '':
+            # No PK, this means we need to create a new Feedback object
+            user_feedback = self._build_feedback(request, sessionid)
+            if spool_mode == 'always':
+                feedback_id = feedback_spool.add(user_feedback)
             else:
-                # AJAX submission, inform frontend the frontend the POST was successful, and give the id back so it
-                # can be updated in a separate request
-                return JsonResponse({'success': True, 'id': user_feedback.id})
-        else:
+                try:
+                    if write_mode == 'buffered':
+                        feedback_buffer.add(user_feedback)
+                        feedback_id = user_feedback.reference
+                    elif get_setting('THUMBER_ONE_VOTE_PER_VIEW'):
+                        feedback_id = Feedback.objects.save_vote(user_feedback)
+                    else:
+                        feedback_id = Feedback.objects.save_once(user_feedback)
+                except Error as exc:
+                    if spool_mode is None:
+                        raise
+                    self._database_failed(request, exc)
+                    feedback_id = feedback_spool.add(user_feedback)
+
+            feedback_submitted.send(
+                sender=type(self), request=request, feedback=user_feedback
+            )
+            return feedback_id
+
+        # PK (or reference when buffered) given, so this Feedback already exists and just needs the comment adding,
+        # which is only allowed from the session that gave the feedback
+        form = CommentForm(data=request.POST)
+        if not form.is_valid():
+            raise _InvalidForm(form)
+        pk, comment = form.cleaned_data['id'], form.cleaned_data['comment']
+        lookup = self._get_comment_lookup(pk, write_mode)
+        if lookup is None:
+            return None
+
+        if spool_mode == 'always':
+            feedback_spool.set_comment(pk, sessionid, comment)
+        elif write_mode != 'buffered' or not feedback_buffer.set_comment(
+            pk, sessionid, comment
+        ):
+            feedback = Feedback.objects.filter(session=sessionid, **lookup)
             try:
-                return super().post(request, *args, **kwargs)
-            except AttributeError:
-                methods = [
-                    m.upper()
-                    for m in self.http_method_names
-                    if hasattr(self, m) and m.upper() != 'POST'
-                ]
-                return HttpResponseNotAllowed(methods)
+                found = feedback.set_comment(comment)
+            except Error as exc:
+                if spool_mode is None:
+                    raise
+                self._database_failed(request, exc)
+                found = False
+            else:
+                if not found and write_mode == 'buffered':
+                    # The Feedback may be queued by another process, so the comment is set once it has been written
+                    feedback_buffer.add_comment(pk, sessionid, comment)
+                    found = True
+                # Feedback identified by its reference may be spooled, waiting to be replayed
+                elif not found and (spool_mode is None or 'reference' not in lookup):
+                    return None
+            if not found:
+                feedback_spool.set_comment(pk, sessionid, comment)
+
+        feedback_commented.send(
+            sender=type(self), request=request, feedback_id=pk, comment=comment
+        )
+        return pk
+
+    def _build_feedback(self, request, sessionid):
+        """
+        The new (unsaved) Feedback from the posted form, given by the identified visitor, which raises _InvalidForm if
+        the form isn't valid.  The form's reference is kept, so that a repeated submission is saved once, or a new one
+        is made if the form had none.
+        """
+        form = ThumberForm(data=request.POST)
+        if not form.is_valid():
+            raise _InvalidForm(form)
+
+        url, view_name, view_args = self._get_origin(request)
+        user_feedback = form.save(commit=False)
+        user_feedback.url = url
+        user_feedback.view_name = view_name
+        user_feedback.view_args = view_args
+        user_feedback.session = sessionid
+        user_feedback.reference = (
+            form.cleaned_data['thumber_reference'] or uuid.uuid4().hex
+        )
+        return user_feedback
+
+    def _get_origin(self, request):
+        """
+        The url, view name and view arguments of the page the feedback was given on
+        """
+        http_referer = self.request.META.get('HTTP_REFERER')
+        if not http_referer:
+            # Without a referer, the feedback must be about the page the form was posted to
+            http_referer = request.build_absolute_uri(request.path)
+        view_args = {
+            'args': list(request.resolver_match.args),
+            'kwargs': request.resolver_match.kwargs,
+        }
+        return http_referer, self._get_view_from_url(http_referer), view_args
+
+    def _get_comment_lookup(self, pk, write_mode):
+        """
+        How to find the Feedback being commented on, from the id the frontend was given, or None if the id can't be
+        valid.  Buffered Feedback is identified by its reference, since it has no PK until the buffer is flushed
+        """
+        if write_mode == 'buffered':
+            return {'reference': pk}
+        elif pk.isdecimal() and int(pk) <= MAX_FEEDBACK_PK:
+            return {'pk': int(pk)}
+        elif get_spool_mode() is not None:
+            # Feedback that was spooled is identified by its reference
+            return {'reference': pk}
+        return None
 
     def _get_view_from_url(self, url):
-        url_data = urlparse(url)
-        host = url_data.netloc
-        path = url_data.path
-        viewname = resolve(path).view_name
+        """
+        The name of the view the url (normally the referer) is for, using a cache of previously resolved paths.  Falls
+        back to the view that is handling this request, if the url is for another host or can't be resolved
+        """
+        viewname = None
+        if url_has_allowed_host_and_scheme(url, {self.request.get_host()}):
+            path = urlparse(url).path
+            with timed('resolve'):
+                viewname = _get_view_name_resolver()(path, get_urlconf())
+
+        if viewname is None:
+            viewname = self.request.resolver_match.view_name
         return viewname
 
     @property
@@ -208,3 +620,187 @@ class ThumberView:
         elif hasattr(super(), 'first_option_yes'):
             return super().first_option_yes
         return self._first_option_yes
+
+
+class ThumberView(BaseThumberView):
+    def get(self, request, *args, **kwargs):
+        set_cookie = self._start_visit(request)
+        response = super().get(request, *args, **kwargs)
+        if set_cookie:
+            set_identity_cookie(response, self.thumber_identity)
+        return response
+
+    def post(self, request, *args, **kwargs):
+        if not self._is_feedback(request):
+            try:
+                return super().post(request, *args, **kwargs)
+            except AttributeError:
+                return self._method_not_allowed()
+
+        return self._post_feedback(request, request.resolver_match.view_name)
+
+    def _post_feedback(self, request, view_name):
+        response = self._handle_feedback(request, view_name)
+        if response is None:
+            return self._sync_response(request)
+        return response
+
+    def _sync_response(self, request):
+        # Non-AJAX post, we've now done the processing, so return super's GET response
+        return self.get(request)
+
+
+class AsyncThumberView(BaseThumberView):
+    """
+    ThumberView for views with async handlers, which handles feedback in a thread, so the event loop isn't blocked
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if get_identity_mode() == 'signed':
+            set_cookie = self._start_visit(request)
+        else:
+            # Loading the session may need the database (or other storage)
+            set_cookie = await sync_to_async(self._start_visit)(request)
+
+        response = await super().get(request, *args, **kwargs)
+        if set_cookie:
+            set_identity_cookie(response, self.thumber_identity)
+        return response
+
+    async def post(self, request, *args, **kwargs):
+        if not self._is_feedback(request):
+            try:
+                handler = super().post
+            except AttributeError:
+                return self._method_not_allowed()
+            return await handler(request, *args, **kwargs)
+
+        # The database (and cache) work is done in a thread, with the same code as ThumberView
+        response = await sync_to_async(self._handle_feedback)(
+            request, request.resolver_match.view_name
+        )
+        if response is None:
+            # Non-AJAX post, we've now done the processing, so return super's GET response
+            return await self.get(request)
+        return response
+
+
+class FeedbackSubmitView(ThumberView, View):
+    """
+    A standalone endpoint that feedback forms are posted to when THUMBER_SUBMIT_ENDPOINT is enabled, so that feedback
+    is saved without dispatching to (and re-rendering) the page's own view.  The page is identified by the signed
+    `thumber_view` token in the form, rather than by resolving the referer.
+    """
+
+    http_method_names = ['post']
+
+    def post(self, request, *args, **kwargs):
+        self.origin = get_signed_view(request)
+        if self.origin is None:
+            return JsonResponse({'success': False}, status=400)
+        return self._post_feedback(request, self.origin[1])
+
+    def _get_origin(self, request):
+        return self.origin
+
+    def _sync_response(self, request):
+        # Back to the page the feedback was given on, which shows the thank you message
+        url = self.origin[0]
+        if not url_has_allowed_host_and_scheme(
+            url, {request.get_host()}, require_https=request.is_secure()
+        ):
+            url = '/'
+        separator = '&' if '?' in url else '?'
+        return HttpResponseRedirect(
+            url + separator + urlencode({'thumber': 'thanks'}), status=303
+        )
+
+
+class SatisfactionStatsView(View):
+    """
+    JSON statistics on the satisfaction with each view, bucketed by hour, day or week, along with the worst views over
+    the same dates.  Only staff can see the statistics, and responses are cached for THUMBER_STATS_CACHE_TIMEOUT
+    seconds so that dashboards can poll frequently.
+    """
+
+    def get(self, request, *args, **kwargs):
+        user = getattr(request, 'user', None)
+        if user is None or not (user.is_active and user.is_staff):
+            return JsonResponse({'success': False}, status=403)
+
+        form = StatsForm(data=request.GET)
+        if not form.is_valid():
+            return JsonResponse(
+                {'success': False, 'errors': form.errors.get_json_data()}, status=400
+            )
+
+        options = form.cleaned_data
+        options['period'] = options['period'] or 'day'
+        options['until'] = options['until'] or today()
+        if options['since'] is None:
+            days = DEFAULT_STATS_DAYS[options['period']]
+            options['since'] = options['until'] - datetime.timedelta(days=days - 1)
+        if options['top'] is None:
+            options['top'] = 5
+        options['min_count'] = options['min_count'] or 1
+        options['view_names'] = sorted(set(request.GET.getlist('view_name')))
+
+        cache = caches[get_setting('THUMBER_STATS_CACHE')]
+        timeout = get_setting('THUMBER_STATS_CACHE_TIMEOUT')
+        key = self._get_cache_key(options)
+        stats = cache.get(key) if timeout else None
+        if stats is None:
+            stats = self.get_stats(**options)
+            if timeout:
+                cache.set(key, stats, timeout)
+
+        response = JsonResponse(stats)
+        patch_cache_control(response, private=True, max_age=timeout)
+        return response
+
+    def get_stats(self, period, since, until, top, min_count, view_names):
+        # Daily and weekly statistics come from the rollups, only hourly statistics need the Feedback table
+        rollups = FeedbackDailyRollup.objects
+        if view_names:
+            rollups = rollups.filter(view_name__in=view_names)
+        feedback = rollups
+        if period == 'hour':
+            feedback = Feedback.objects.all()
+            if view_names:
+                feedback = feedback.filter(view__view_name__in=view_names)
+
+        buckets = feedback.satisfaction_by_period(
+            period=period, since=since, until=until
+        )
+        worst = rollups.worst_views(
+            since=since, until=until, limit=top, min_count=min_count
+        )
+
+        return {
+            'period': period,
+            'since': since,
+            'until': until,
+            'buckets': list(buckets),
+            'worst': list(worst),
+        }
+
+    @staticmethod
+    def _get_cache_key(options):
+        values = [options[name] for name in sorted(options)]
+        return 'thumber:stats:{0}'.format(
+            hashlib.md5(repr(values).encode()).hexdigest()
+        )
+
+
+class MetricsView(View):
+    """
+    The metrics recorded by this process, in the Prometheus text exposition format.  Not found unless THUMBER_METRICS
+    is True.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not metrics_enabled():
+            raise Http404('Metrics are not enabled')
+        return HttpResponse(
+            registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8'
+        )